@@ -1,11 +1,14 @@
 import datetime
 
 from sqlalchemy import (
+    BigInteger,
     Boolean,
     Column,
+    Date,
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
@@ -17,6 +20,7 @@ Base = declarative_base()
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (Index("ix_users_last_active", "last_active"),)
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(50), nullable=True)
     email = Column(String(100), nullable=True, index=True)
@@ -83,6 +87,10 @@ class Activity(Base):
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        Index("ix_messages_chat_timestamp_id", "chat_id", "timestamp", "id"),
+        Index("ix_messages_sender_chat_timestamp", "sender_id", "chat_id", "timestamp"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     sender_id = Column(Integer, ForeignKey("users.id"))
     chat_id = Column(Integer)
@@ -113,6 +121,9 @@ class DeletedUser(Base):
 
 class IndMessage(Base):
     __tablename__ = "ind_messages"
+    __table_args__ = (
+        Index("ix_ind_messages_chat_timestamp_id", "ind_chat_id", "timestamp", "id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     content = Column(Text, nullable=False)
     timestamp = Column(Integer)
@@ -279,3 +290,69 @@ class CommunityThreadReplyUpvote(Base):
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'))
     reply_id = Column(Integer, ForeignKey('community_thread_replies.id'))
+
+
+class Watermark(Base):
+    __tablename__ = 'admin_watermarks'
+    name = Column(String(64), primary_key=True)
+    position = Column(BigInteger, nullable=True)
+    marked_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, nullable=True)
+
+
+class DailyRollup(Base):
+    __tablename__ = 'analytics_daily_rollups'
+    day = Column(Date, primary_key=True)
+    active_users = Column(Integer, nullable=False, default=0)
+    new_users = Column(Integer, nullable=False, default=0)
+    group_messages = Column(Integer, nullable=False, default=0)
+    direct_messages = Column(Integer, nullable=False, default=0)
+    activities_created = Column(Integer, nullable=False, default=0)
+    reports = Column(Integer, nullable=False, default=0)
+    forum_posts = Column(Integer, nullable=False, default=0)
+    refreshed_at = Column(DateTime, nullable=True)
+
+
+class NotificationJob(Base):
+    __tablename__ = 'admin_notification_jobs'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    title = Column(String(100), nullable=False)
+    body = Column(Text, nullable=False)
+    data = Column(Text, nullable=True)
+    filters = Column(Text, nullable=True)
+    status = Column(String(20), nullable=False, default='queued', index=True)
+    total = Column(Integer, nullable=False, default=0)
+    cursor_user_id = Column(Integer, nullable=False, default=0)
+    sent = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    errors = Column(Text, nullable=True)
+    last_error = Column(Text, nullable=True)
+    lease_owner = Column(String(100), nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    created_by = Column(String(100), nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.now)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class ConvertKitSyncState(Base):
+    __tablename__ = 'admin_convertkit_sync_state'
+    email = Column(String(100), primary_key=True)
+    user_id = Column(Integer, nullable=True, index=True)
+    subscriber_id = Column(BigInteger, nullable=True)
+    language = Column(String(4), nullable=True)
+    content_hash = Column(String(40), nullable=False)
+    synced_at = Column(DateTime, nullable=True)
+
+
+class UserContentCounter(Base):
+    __tablename__ = 'admin_user_content_counters'
+    user_id = Column(Integer, primary_key=True, autoincrement=False)
+    messages = Column(Integer, nullable=False, default=0)
+    direct_messages = Column(Integer, nullable=False, default=0)
+    reports_received = Column(Integer, nullable=False, default=0)
+    threads = Column(Integer, nullable=False, default=0)
+    replies = Column(Integer, nullable=False, default=0)
+    activities_hosted = Column(Integer, nullable=False, default=0)
+    activities_joined = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=True)
@@ -0,0 +1,88 @@
+"""Helpers for tables owned by the dashboard itself"""
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import inspect
+
+from core.models import Base
+
+_lock = threading.Lock()
+_ensured = set()
+
+
+def ensure_tables(engine, models) -> None:
+    """Create dashboard-owned tables if missing, once per engine and process"""
+    pending = [
+        model.__table__
+        for model in models
+        if (id(engine), model.__tablename__) not in _ensured
+    ]
+    if not pending:
+        return
+
+    with _lock:
+        Base.metadata.create_all(bind=engine, tables=pending, checkfirst=True)
+        for table in pending:
+            _ensured.add((id(engine), table.name))
+
+
+_columns_lock = threading.Lock()
+_columns: Dict[Tuple[int, str], List[str]] = {}
+
+
+def get_table_columns(engine, table_name: str) -> List[str]:
+    """Column names of a table, introspected once per engine and process"""
+    key = (id(engine), table_name)
+    columns = _columns.get(key)
+    if columns is not None:
+        return columns
+
+    with _columns_lock:
+        columns = _columns.get(key)
+        if columns is None:
+            columns = [column["name"] for column in inspect(engine).get_columns(table_name)]
+            _columns[key] = columns
+        return columns
+
+
+def invalidate_table_columns(engine=None, table_name: Optional[str] = None) -> None:
+    """Forget cached columns (after a migration); no arguments clears everything"""
+    with _columns_lock:
+        for key in list(_columns):
+            if (engine is None or key[0] == id(engine)) and (
+                table_name is None or key[1] == table_name
+            ):
+                del _columns[key]
+
+
+# Indexes the dashboard's read paths rely on, on tables owned by the app.
+# These are created explicitly (python -m core.schema), never on startup.
+QUERY_INDEXES = {
+    "users": ["ix_users_last_active"],
+    "messages": ["ix_messages_chat_timestamp_id", "ix_messages_sender_chat_timestamp"],
+    "ind_messages": ["ix_ind_messages_chat_timestamp_id"],
+}
+
+
+def ensure_indexes(engine, indexes: Dict[str, List[str]] = None) -> List[str]:
+    """Create the named model indexes missing from the database; returns their names"""
+    inspector = inspect(engine)
+    created = []
+
+    for table_name, names in (indexes or QUERY_INDEXES).items():
+        table = Base.metadata.tables[table_name]
+        existing = {index["name"] for index in inspector.get_indexes(table_name)}
+        for index in table.indexes:
+            if index.name in names and index.name not in existing:
+                index.create(bind=engine)
+                created.append(index.name)
+
+    return created
+
+
+if __name__ == "__main__":
+    from services.database_service import DatabaseService
+
+    names = ensure_indexes(DatabaseService().engine)
+    print(f"Created indexes: {', '.join(names)}" if names else "All indexes present")
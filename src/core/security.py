@@ -3,7 +3,7 @@ import logging
 import re
 from datetime import datetime
 from functools import wraps
-from typing import Any, Optional
+from typing import Any, List, Optional, Tuple
 
 import bleach
 import streamlit as st
@@ -54,6 +54,25 @@ class SecurityValidator:
         except ValueError:
             return False
 
+    def parse_user_ids(self, raw: str) -> Tuple[List[int], List[str]]:
+        """Split a pasted list of user IDs (commas, spaces or newlines).
+
+        Returns the valid IDs, de-duplicated in input order, and the
+        tokens that are not valid IDs.
+        """
+        ids, invalid, seen = [], [], set()
+        for token in re.split(r"[\s,;]+", raw or ""):
+            if not token:
+                continue
+            if not self.validate_user_id(token):
+                invalid.append(token)
+                continue
+            user_id = int(token)
+            if user_id not in seen:
+                seen.add(user_id)
+                ids.append(user_id)
+        return ids, invalid
+
     def validate_email(self, email: str) -> bool:
         """Validate email format"""
         if not email:
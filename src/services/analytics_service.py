@@ -2,14 +2,28 @@
 
 import streamlit as st
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 
-from sqlalchemy import and_, func
+from sqlalchemy import and_
 
-from core.models import Activity, IndMessage, Message, User, UserReport
+from core.models import Activity, IndMessage, Message, User
 from services.database_service import DatabaseService
+from services.rollup_service import RollupService
+from services.stats_engine import STATS_TIMEOUT_SECONDS, StatsEngine
+from utils.concurrency import fan_out
 from utils.error_handler import ErrorHandler
-from utils.exceptions import DatabaseError
+from utils.exceptions import DatabaseError, ValidationError
+from utils.time_buckets import (
+    GRANULARITIES,
+    as_datetime,
+    bucket_key,
+    bucket_start,
+    count_by_bucket,
+    iter_buckets,
+)
+
+DEFAULT_ANALYTICS_DAYS = 90
+MAX_ANALYTICS_BUCKETS = 5000
 
 
 class AnalyticsService:
@@ -17,121 +31,164 @@ class AnalyticsService:
 
     def __init__(self):
         self.db_service = DatabaseService()
+        self.rollup_service = RollupService()
+        self.stats_engine = StatsEngine(self.db_service)
 
     @st.cache_data(ttl=300)
     @ErrorHandler.handle_database_error
     def get_platform_stats(_self) -> Dict:
         """Get basic platform statistics - cached for 5 minutes"""
-        with _self.db_service.get_session() as db:
-            total_users = db.query(User).filter(User.reg_complete == True).count()
-            active_users = (
-                db.query(User)
-                .filter(User.last_active >= datetime.now() - timedelta(days=30))
-                .count()
-            )
+        since_30d = datetime.now() - timedelta(days=30)
+
+        # One level of fan-out: the stats statements run beside the counters
+        stats_tasks = _self.stats_engine.tasks(
+            {
+                User: {
+                    "total_users": User.reg_complete == True,
+                    "active_users": User.last_active >= since_30d,
+                    "new_users_30d": and_(
+                        User.reg_complete == True,
+                        User.created_at >= since_30d,
+                    ),
+                }
+            }
+        )
+        results, failures = fan_out(
+            {**stats_tasks, "counters": _self.rollup_service.get_platform_counters},
+            timeout=STATS_TIMEOUT_SECONDS,
+            fail_fast=True,
+        )
+        if failures:
+            raise next(iter(failures.values()))
+
+        users = StatsEngine.merge(results, stats_tasks)
+        counters = results["counters"]
+        return {
+            "total_users": users["total_users"],
+            "active_users": users["active_users"],
+            "new_users_30d": users["new_users_30d"],
+            "messages_today": counters["messages_today"],
+            "new_reports": counters["reports_total"],
+        }
 
-            new_users_30d = (
-                db.query(User)
-                .filter(
-                    User.reg_complete == True,
-                    User.created_at >= datetime.now() - timedelta(days=30)
-                )
-                .count()
+    @ErrorHandler.handle_database_error
+    def get_activity_analytics(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        granularity: str = "day",
+    ) -> List[Dict]:
+        """Get activity analytics bucketed by hour, day, week or month.
+
+        `start` is inclusive and `end` exclusive; both default to the last
+        90 days including today. Day, week and month buckets are summed from
+        the daily rollups, and days before the rollups begin are counted
+        live; hourly buckets use one grouped query per table. Buckets
+        without data are zero-filled.
+        """
+        start, end = self._resolve_range(start, end, granularity)
+        buckets = iter_buckets(start, end, granularity)
+        if len(buckets) > MAX_ANALYTICS_BUCKETS:
+            raise ValidationError(
+                f"Date range too large for '{granularity}' granularity "
+                f"({len(buckets)} buckets, max {MAX_ANALYTICS_BUCKETS})"
             )
 
-            today_start = int(
-                datetime.now()
-                .replace(hour=0, minute=0, second=0, microsecond=0)
-                .timestamp()
+        if granularity == "hour":
+            counts = self._count_live(start, end, granularity)
+        else:
+            counts = self._count_from_rollups(start, end, granularity)
+
+        result = []
+        for bucket in buckets:
+            key = bucket_key(bucket, granularity)
+            result.append(
+                {
+                    "date": key,
+                    "active_users": counts["active_users"].get(key, 0),
+                    "new_users": counts["new_users"].get(key, 0),
+                    "messages": counts["messages"].get(key, 0),
+                    "activities": counts["activities"].get(key, 0),
+                    "day_name": bucket.strftime("%A"),
+                }
             )
-            messages_today = (
-                db.query(Message).filter(Message.timestamp >= today_start).count()
+
+        return result
+
+    def _count_live(
+        self, start: datetime, end: datetime, granularity: str
+    ) -> Dict[str, Dict[str, int]]:
+        with self.db_service.get_session() as db:
+            messages = count_by_bucket(
+                db, Message.timestamp, start, end, granularity, unix=True
             )
-            messages_today += (
-                db.query(IndMessage).filter(IndMessage.timestamp >= today_start).count()
+            ind_messages = count_by_bucket(
+                db, IndMessage.timestamp, start, end, granularity, unix=True
             )
 
-            new_reports = db.query(UserReport).count()
-
             return {
-                "total_users": total_users,
-                "active_users": active_users,
-                "new_users_30d": new_users_30d,
-                "messages_today": messages_today,
-                "new_reports": new_reports,
+                "active_users": count_by_bucket(
+                    db, User.last_active, start, end, granularity
+                ),
+                "new_users": count_by_bucket(
+                    db, User.created_at, start, end, granularity
+                ),
+                "messages": {
+                    key: messages.get(key, 0) + ind_messages.get(key, 0)
+                    for key in set(messages) | set(ind_messages)
+                },
+                "activities": count_by_bucket(
+                    db, Activity.created_at, start, end, granularity
+                ),
             }
 
-    @ErrorHandler.handle_database_error
-    def get_activity_analytics(self) -> List[Dict]:
-        """Get real activity analytics data from database"""
-        with self.db_service.get_session() as db:
-            result = []
-
-            for i in range(90):
-                date = datetime.now() - timedelta(days=89 - i)
-                day_start = date.replace(hour=0, minute=0, second=0, microsecond=0)
-                day_end = day_start + timedelta(days=1)
-
-                day_start_ts = int(day_start.timestamp())
-                day_end_ts = int(day_end.timestamp())
-
-                active_users = (
-                    db.query(User)
-                    .filter(
-                        and_(User.last_active >= day_start, User.last_active < day_end)
-                    )
-                    .count()
-                )
-
-                new_users = (
-                    db.query(User)
-                    .filter(
-                        and_(User.created_at >= day_start, User.created_at < day_end)
-                    )
-                    .count()
-                )
-
-                messages_count = (
-                    db.query(Message)
-                    .filter(
-                        and_(
-                            Message.timestamp >= day_start_ts,
-                            Message.timestamp < day_end_ts,
-                        )
-                    )
-                    .count()
-                )
-                messages_count += (
-                    db.query(IndMessage)
-                    .filter(
-                        and_(
-                            IndMessage.timestamp >= day_start_ts,
-                            IndMessage.timestamp < day_end_ts,
-                        )
-                    )
-                    .count()
-                )
-
-                activities_count = (
-                    db.query(Activity)
-                    .filter(
-                        and_(
-                            Activity.created_at >= day_start,
-                            Activity.created_at < day_end
-                        )
-                    )
-                    .count()
-                )
-
-                result.append(
-                    {
-                        "date": date.strftime("%Y-%m-%d"),
-                        "active_users": active_users,
-                        "new_users": new_users,
-                        "messages": messages_count,
-                        "activities": activities_count,
-                        "day_name": date.strftime("%A"),
-                    }
-                )
-
-            return result
+    def _count_from_rollups(
+        self, start: datetime, end: datetime, granularity: str
+    ) -> Dict[str, Dict[str, int]]:
+        end_day = end.date()
+        if end > as_datetime(end_day):
+            end_day += timedelta(days=1)
+        rows = self.rollup_service.get_daily_rollups(start.date(), end_day)
+
+        # Days the backfill has not reached yet are counted live
+        counts = {"active_users": {}, "new_users": {}, "messages": {}, "activities": {}}
+        first_day = self.rollup_service.get_first_day()
+        if first_day is None or start < as_datetime(first_day):
+            live_end = min(end, as_datetime(first_day)) if first_day else end
+            counts = self._count_live(start, live_end, granularity)
+
+        for row in rows:
+            bucket = bucket_start(as_datetime(row["day"]), granularity)
+            key = bucket_key(bucket, granularity)
+            values = {
+                "active_users": row["active_users"],
+                "new_users": row["new_users"],
+                "messages": row["group_messages"] + row["direct_messages"],
+                "activities": row["activities_created"],
+            }
+            for metric, value in values.items():
+                counts[metric][key] = counts[metric].get(key, 0) + value
+
+        return counts
+
+    def _resolve_range(
+        self, start: Optional[datetime], end: Optional[datetime], granularity: str
+    ) -> Tuple[datetime, datetime]:
+        if granularity not in GRANULARITIES:
+            raise ValidationError(
+                f"Invalid granularity '{granularity}'. Must be one of: {', '.join(GRANULARITIES)}"
+            )
+
+        today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        end = as_datetime(end) if end else today_start + timedelta(days=1)
+        start = (
+            as_datetime(start)
+            if start
+            else today_start - timedelta(days=DEFAULT_ANALYTICS_DAYS - 1)
+        )
+
+        if start >= end:
+            raise ValidationError("Start date must be before end date")
+
+        return bucket_start(start, granularity), end
+
@@ -2,7 +2,8 @@ from datetime import datetime
 from typing import Dict, List, Optional
 
 from dotenv import load_dotenv
-from sqlalchemy import desc, or_
+from sqlalchemy import and_, desc, or_
+from sqlalchemy.orm import aliased
 
 from core.models import (
     Activity,
@@ -16,15 +17,27 @@ from core.models import (
 )
 from core.security import AuditLogger, audit_log
 from services.database_service import DatabaseService
+from services.grouped_counts import count_by
+from services.search_index import (
+    SEARCH_SYNC_MAX_BATCHES,
+    MessageSearchIndex,
+    get_search_index,
+)
+from services.stats_engine import StatsEngine
 from utils.error_handler import ErrorHandler
 from utils.exceptions import ValidationError
 
 load_dotenv()
 
+MESSAGE_PAGE_SIZE = 50
+MAX_MESSAGE_PAGE_SIZE = 500
+
 
 class ChatModerationService:
     def __init__(self):
         self.db_service = DatabaseService()
+        self.stats_engine = StatsEngine(self.db_service)
+        self.search_index = get_search_index(MessageSearchIndex, self.db_service)
 
     def get_db_session(self):
         return self.db_service.get_session()
@@ -44,7 +57,9 @@ class ChatModerationService:
 
         try:
             with self.get_db_session() as db:
-                query = db.query(ChatMeta).options()
+                query = db.query(ChatMeta, Activity.city).outerjoin(
+                    Activity, Activity.id == ChatMeta.activity_id
+                )
 
                 if search:
                     query = query.filter(
@@ -55,39 +70,27 @@ class ChatModerationService:
                         )
                     )
 
-                chats = (
+                rows = (
                     query.order_by(desc(ChatMeta.last_timestamp))
                     .limit(limit)
                     .offset(offset)
                     .all()
                 )
 
-                result = []
-                for chat in chats:
-                    activity = None
-                    if chat.activity_id:
-                        activity = (
-                            db.query(Activity)
-                            .filter(Activity.id == chat.activity_id)
-                            .first()
-                        )
-
-                    member_count = (
-                        db.query(ChatUserActivity)
-                        .filter(ChatUserActivity.chat_id == chat.id, ChatUserActivity.active == True)
-                        .count()
-                    )
-
-                    message_count = (
-                        db.query(Message).filter(Message.chat_id == chat.id).count()
-                    )
+                chat_ids = [chat.id for chat, _ in rows]
+                member_counts = count_by(
+                    db, ChatUserActivity.chat_id, chat_ids, ChatUserActivity.active == True
+                )
+                message_counts = count_by(db, Message.chat_id, chat_ids)
 
+                result = []
+                for chat, activity_city in rows:
                     result.append(
                         {
                             "id": chat.id,
                             "activity_id": chat.activity_id,
                             "activity_name": chat.activity_name,
-                            "activity_city": activity.city if activity else None,
+                            "activity_city": activity_city,
                             "last_sender_name": chat.last_sender_name,
                             "last_message": (
                                 chat.last_message[:100] + "..."
@@ -97,8 +100,8 @@ class ChatModerationService:
                             "last_timestamp": datetime.fromtimestamp(chat.last_timestamp)
                             if chat.last_timestamp
                             else None,
-                            "member_count": member_count,
-                            "message_count": message_count,
+                            "member_count": member_counts.get(chat.id, 0),
+                            "message_count": message_counts.get(chat.id, 0),
                         }
                     )
 
@@ -115,7 +118,17 @@ class ChatModerationService:
         self, limit: int = 50, offset: int = 0, search: str = None
     ) -> List[Dict]:
         with self.get_db_session() as db:
-            query = db.query(IndChats)
+            owner = aliased(User)
+            receiver = aliased(User)
+            query = (
+                db.query(
+                    IndChats,
+                    owner.name.label("owner_name"),
+                    receiver.name.label("receiver_name"),
+                )
+                .outerjoin(owner, owner.id == IndChats.activity_owner_id)
+                .outerjoin(receiver, receiver.id == IndChats.receiver_id)
+            )
 
             if search:
                 query = query.filter(
@@ -126,38 +139,27 @@ class ChatModerationService:
                     )
                 )
 
-            chats = (
+            rows = (
                 query.order_by(desc(IndChats.last_timestamp))
                 .limit(limit)
                 .offset(offset)
                 .all()
             )
 
-            result = []
-            for chat in chats:
-                owner = (
-                    db.query(User)
-                    .filter(User.id == chat.activity_owner_id)
-                    .first()
-                )
-                receiver = (
-                    db.query(User).filter(User.id == chat.receiver_id).first()
-                )
-
-                message_count = (
-                    db.query(IndMessage)
-                    .filter(IndMessage.ind_chat_id == chat.id)
-                    .count()
-                )
+            message_counts = count_by(
+                db, IndMessage.ind_chat_id, [chat.id for chat, _, _ in rows]
+            )
 
+            result = []
+            for chat, owner_name, receiver_name in rows:
                 result.append(
                     {
                         "id": chat.id,
                         "activity_name": chat.activity_name,
                         "owner_id": chat.activity_owner_id,
-                        "owner_name": owner.name if owner else "Unknown",
+                        "owner_name": owner_name or "Unknown",
                         "receiver_id": chat.receiver_id,
-                        "receiver_name": receiver.name if receiver else "Unknown",
+                        "receiver_name": receiver_name or "Unknown",
                         "last_sender_name": chat.last_sender_name,
                         "last_message": (
                             chat.last_message[:100] + "..."
@@ -167,7 +169,7 @@ class ChatModerationService:
                         "last_timestamp": datetime.fromtimestamp(chat.last_timestamp)
                         if chat.last_timestamp
                         else None,
-                        "message_count": message_count,
+                        "message_count": message_counts.get(chat.id, 0),
                     }
                 )
 
@@ -175,128 +177,221 @@ class ChatModerationService:
 
     @ErrorHandler.handle_database_error
     def get_chat_messages(self, chat_id: int, chat_type: str = "activity") -> List[Dict]:
+        """Get every message in a chat, oldest first; prefer get_chat_message_page"""
+        model, chat_column = self._message_model(chat_type)
+
         with self.get_db_session() as db:
-            if chat_type == "activity":
-                messages = (
-                    db.query(Message)
-                    .filter(Message.chat_id == chat_id)
-                    .order_by(Message.timestamp.asc())
-                    .all()
-                )
+            messages = (
+                db.query(model)
+                .filter(chat_column == chat_id)
+                .order_by(model.timestamp.asc(), model.id.asc())
+                .all()
+            )
+            return self._serialize_messages(db, messages, chat_type)
 
-                result = []
-                for msg in messages:
-                    user = db.query(User).filter(User.id == msg.sender_id).first()
-                    result.append(
-                        {
-                            "id": msg.id,
-                            "sender_id": msg.sender_id,
-                            "sender_name": user.name if user else "Unknown",
-                            "content": msg.content,
-                            "timestamp": datetime.fromtimestamp(msg.timestamp)
-                            if msg.timestamp
-                            else None,
-                            "is_deleted": msg.is_deleted,
-                            "is_edited": msg.is_edited,
-                            "action_type": msg.action_type,
-                        }
-                    )
-                return result
+    @ErrorHandler.handle_database_error
+    def get_chat_message_page(
+        self,
+        chat_id: int,
+        chat_type: str = "activity",
+        limit: int = MESSAGE_PAGE_SIZE,
+        before: Optional[str] = None,
+        after: Optional[str] = None,
+    ) -> Dict:
+        """Get one page of a chat's messages, keyed on (timestamp, id).
+
+        Without a cursor the newest page is returned. Pass the page's
+        `older_cursor` as `before` to load older messages, or its
+        `newer_cursor` as `after` to load newer ones. Messages are always
+        returned oldest first. Messages without a timestamp are not paged.
+        """
+        if before and after:
+            raise ValidationError("Pass either before or after, not both")
+        if not 1 <= limit <= MAX_MESSAGE_PAGE_SIZE:
+            raise ValidationError(
+                f"limit must be between 1 and {MAX_MESSAGE_PAGE_SIZE}"
+            )
 
-            else:
-                messages = (
-                    db.query(IndMessage)
-                    .filter(IndMessage.ind_chat_id == chat_id)
-                    .order_by(IndMessage.timestamp.asc())
-                    .all()
-                )
+        model, chat_column = self._message_model(chat_type)
 
-                result = []
-                for msg in messages:
-                    user = db.query(User).filter(User.id == msg.sender_id).first()
-                    result.append(
-                        {
-                            "id": msg.id,
-                            "sender_id": msg.sender_id,
-                            "sender_name": user.name if user else "Unknown",
-                            "content": msg.content,
-                            "timestamp": datetime.fromtimestamp(msg.timestamp)
-                            if msg.timestamp
-                            else None,
-                            "action_type": msg.action_type,
-                            "image_url": msg.image_url,
-                        }
+        with self.get_db_session() as db:
+            query = db.query(model).filter(
+                chat_column == chat_id, model.timestamp.isnot(None)
+            )
+
+            if after:
+                timestamp, message_id = _parse_message_cursor(after)
+                query = query.filter(
+                    or_(
+                        model.timestamp > timestamp,
+                        and_(model.timestamp == timestamp, model.id > message_id),
                     )
-                return result
+                ).order_by(model.timestamp.asc(), model.id.asc())
+            else:
+                if before:
+                    timestamp, message_id = _parse_message_cursor(before)
+                    query = query.filter(
+                        or_(
+                            model.timestamp < timestamp,
+                            and_(model.timestamp == timestamp, model.id < message_id),
+                        )
+                    )
+                query = query.order_by(model.timestamp.desc(), model.id.desc())
+
+            messages = query.limit(limit + 1).all()
+            has_more = len(messages) > limit
+            messages = messages[:limit]
+            if not after:
+                messages.reverse()
+
+            return {
+                "messages": self._serialize_messages(db, messages, chat_type),
+                "older_cursor": _message_cursor(messages[0]) if messages else before,
+                "newer_cursor": _message_cursor(messages[-1]) if messages else after,
+                "has_older": has_more if not after else True,
+                "has_newer": has_more if after else bool(before),
+            }
+
+    def _message_model(self, chat_type: str):
+        if chat_type == "activity":
+            return Message, Message.chat_id
+        return IndMessage, IndMessage.ind_chat_id
+
+    def _serialize_messages(self, db, messages, chat_type: str) -> List[Dict]:
+        sender_ids = {msg.sender_id for msg in messages if msg.sender_id}
+        sender_names = {}
+        if sender_ids:
+            sender_names = dict(
+                db.query(User.id, User.name).filter(User.id.in_(sender_ids)).all()
+            )
+
+        result = []
+        for msg in messages:
+            item = {
+                "id": msg.id,
+                "sender_id": msg.sender_id,
+                "sender_name": sender_names.get(msg.sender_id) or "Unknown",
+                "content": msg.content,
+                "timestamp": datetime.fromtimestamp(msg.timestamp)
+                if msg.timestamp
+                else None,
+            }
+            if chat_type == "activity":
+                item["is_deleted"] = msg.is_deleted
+                item["is_edited"] = msg.is_edited
+                item["action_type"] = msg.action_type
+            else:
+                item["action_type"] = msg.action_type
+                item["image_url"] = msg.image_url
+            result.append(item)
+        return result
 
     @ErrorHandler.handle_database_error
     def search_messages(self, keyword: str, limit: int = 100) -> List[Dict]:
-        if not keyword or len(keyword) < 2:
+        """Get the newest messages matching a full-text query"""
+        return self.search_message_page(keyword, limit=limit, order="newest")["results"]
+
+    @ErrorHandler.handle_database_error
+    def search_message_page(
+        self,
+        query: str,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        order: str = "relevance",
+        chat_type: Optional[str] = None,
+    ) -> Dict:
+        """Search message content through the full-text index.
+
+        Supports `"exact phrases"` and `prefix*` terms. Pass the returned
+        `next_cursor` back to get the following page. `index_complete` is
+        False while the index is still catching up with new messages.
+        """
+        if not query or len(query.strip()) < 2:
             raise ValidationError("Search keyword must be at least 2 characters")
+        if not 1 <= limit <= MAX_MESSAGE_PAGE_SIZE:
+            raise ValidationError(
+                f"limit must be between 1 and {MAX_MESSAGE_PAGE_SIZE}"
+            )
+
+        index_complete = self.search_index.sync(max_batches=SEARCH_SYNC_MAX_BATCHES)
+
+        where, params = "", ()
+        if chat_type:
+            where, params = "kind = ?", (chat_type,)
+        hits, next_cursor = self.search_index.query(
+            query, limit, cursor=cursor, order=order, where=where, params=params
+        )
 
         with self.get_db_session() as db:
-            activity_messages = (
-                db.query(Message)
-                .filter(Message.content.ilike(f"%{keyword}%"))
-                .order_by(desc(Message.timestamp))
-                .limit(limit // 2)
+            messages = self._load_search_hits(db, hits)
+
+        results = []
+        for hit in hits:
+            message = messages.get((hit["kind"], hit["message_id"]))
+            if message is None:
+                continue
+            message["snippet"] = hit["snippet"]
+            message["rank"] = hit["rank"]
+            results.append(message)
+
+        return {
+            "results": results,
+            "next_cursor": next_cursor,
+            "index_complete": index_complete,
+        }
+
+    def _load_search_hits(self, db, hits: List[Dict]) -> Dict:
+        """Current content, sender and chat name for every hit, one query per chat type"""
+        ids = {"activity": [], "individual": []}
+        for hit in hits:
+            ids[hit["kind"]].append(hit["message_id"])
+
+        loaded = {}
+        if ids["activity"]:
+            rows = (
+                db.query(Message, User.name, ChatMeta.activity_name)
+                .outerjoin(User, User.id == Message.sender_id)
+                .outerjoin(ChatMeta, ChatMeta.id == Message.chat_id)
+                .filter(Message.id.in_(ids["activity"]))
                 .all()
             )
+            for msg, sender_name, chat_name in rows:
+                loaded[("activity", msg.id)] = self._search_result(
+                    "activity", msg, msg.chat_id, sender_name, chat_name or "Unknown"
+                )
 
-            ind_messages = (
-                db.query(IndMessage)
-                .filter(IndMessage.content.ilike(f"%{keyword}%"))
-                .order_by(desc(IndMessage.timestamp))
-                .limit(limit // 2)
+        if ids["individual"]:
+            rows = (
+                db.query(IndMessage, User.name, IndChats.activity_name)
+                .outerjoin(User, User.id == IndMessage.sender_id)
+                .outerjoin(IndChats, IndChats.id == IndMessage.ind_chat_id)
+                .filter(IndMessage.id.in_(ids["individual"]))
                 .all()
             )
-
-            result = []
-
-            for msg in activity_messages:
-                user = db.query(User).filter(User.id == msg.sender_id).first()
-                chat = db.query(ChatMeta).filter(ChatMeta.id == msg.chat_id).first()
-
-                result.append(
-                    {
-                        "type": "activity",
-                        "message_id": msg.id,
-                        "chat_id": msg.chat_id,
-                        "chat_name": chat.activity_name if chat else "Unknown",
-                        "sender_id": msg.sender_id,
-                        "sender_name": user.name if user else "Unknown",
-                        "content": msg.content,
-                        "timestamp": datetime.fromtimestamp(msg.timestamp)
-                        if msg.timestamp
-                        else None,
-                    }
-                )
-
-            for msg in ind_messages:
-                user = db.query(User).filter(User.id == msg.sender_id).first()
-                chat = (
-                    db.query(IndChats)
-                    .filter(IndChats.id == msg.ind_chat_id)
-                    .first()
-                )
-
-                result.append(
-                    {
-                        "type": "individual",
-                        "message_id": msg.id,
-                        "chat_id": msg.ind_chat_id,
-                        "chat_name": chat.activity_name if chat else "Direct Message",
-                        "sender_id": msg.sender_id,
-                        "sender_name": user.name if user else "Unknown",
-                        "content": msg.content,
-                        "timestamp": datetime.fromtimestamp(msg.timestamp)
-                        if msg.timestamp
-                        else None,
-                    }
+            for msg, sender_name, chat_name in rows:
+                loaded[("individual", msg.id)] = self._search_result(
+                    "individual",
+                    msg,
+                    msg.ind_chat_id,
+                    sender_name,
+                    chat_name or "Direct Message",
                 )
 
-            result.sort(key=lambda x: x["timestamp"] or datetime.min, reverse=True)
-            return result[:limit]
+        return loaded
+
+    def _search_result(self, chat_type, msg, chat_id, sender_name, chat_name) -> Dict:
+        return {
+            "type": chat_type,
+            "message_id": msg.id,
+            "chat_id": chat_id,
+            "chat_name": chat_name,
+            "sender_id": msg.sender_id,
+            "sender_name": sender_name or "Unknown",
+            "content": msg.content,
+            "timestamp": datetime.fromtimestamp(msg.timestamp)
+            if msg.timestamp
+            else None,
+        }
 
     @audit_log("FLAG_MESSAGE")
     @ErrorHandler.handle_database_error
@@ -340,24 +435,26 @@ class ChatModerationService:
                 return st.session_state[cache_key]
 
         try:
-            with self.get_db_session() as db:
-                total_activity_chats = db.query(ChatMeta).count()
-                total_individual_chats = db.query(IndChats).count()
-                total_messages = db.query(Message).count()
-                total_ind_messages = db.query(IndMessage).count()
-
-                stats = {
-                    "total_activity_chats": total_activity_chats,
-                    "total_individual_chats": total_individual_chats,
-                    "total_activity_messages": total_messages,
-                    "total_individual_messages": total_ind_messages,
-                    "total_chats": total_activity_chats + total_individual_chats,
-                    "total_messages": total_messages + total_ind_messages,
+            counts = self.stats_engine.compute(
+                {
+                    ChatMeta: {"total_activity_chats": None},
+                    IndChats: {"total_individual_chats": None},
+                    Message: {"total_activity_messages": None},
+                    IndMessage: {"total_individual_messages": None},
                 }
+            )
 
-                st.session_state[cache_key] = stats
-                st.session_state[cache_time_key] = datetime.now().timestamp()
-                return stats
+            stats = {
+                **counts,
+                "total_chats": counts["total_activity_chats"]
+                + counts["total_individual_chats"],
+                "total_messages": counts["total_activity_messages"]
+                + counts["total_individual_messages"],
+            }
+
+            st.session_state[cache_key] = stats
+            st.session_state[cache_time_key] = datetime.now().timestamp()
+            return stats
         except Exception as e:
             if cache_key in st.session_state:
                 return st.session_state[cache_key]
@@ -370,3 +467,15 @@ class ChatModerationService:
                 "total_chats": 0,
                 "total_messages": 0,
             }
+
+
+def _message_cursor(message) -> str:
+    return f"{message.timestamp}:{message.id}"
+
+
+def _parse_message_cursor(cursor: str):
+    try:
+        timestamp, message_id = cursor.split(":")
+        return int(timestamp), int(message_id)
+    except (AttributeError, ValueError):
+        raise ValidationError(f"Invalid message cursor: {cursor!r}")
@@ -1,8 +1,9 @@
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 from dotenv import load_dotenv
-from sqlalchemy import desc, or_
+from sqlalchemy import and_, desc, func, or_, select
+from sqlalchemy.orm import aliased
 
 from core.models import (
     Community,
@@ -15,49 +16,60 @@ from core.models import (
 )
 from core.security import AuditLogger, audit_log
 from services.database_service import DatabaseService
+from services.grouped_counts import count_by
+from services.search_index import (
+    SEARCH_SYNC_MAX_BATCHES,
+    ForumSearchIndex,
+    get_search_index,
+)
+from services.stats_engine import StatsEngine
 from utils.error_handler import ErrorHandler
 from utils.exceptions import ValidationError
 
 load_dotenv()
 
+MAX_SEARCH_PAGE_SIZE = 200
+# Ranked matches get_thread_page considers when a search term is given
+MAX_THREAD_SEARCH_MATCHES = 1000
+
 
 class CommunityForumService:
     def __init__(self):
         self.db_service = DatabaseService()
+        self.stats_engine = StatsEngine(self.db_service)
+        self.search_index = get_search_index(ForumSearchIndex, self.db_service)
 
     def get_db_session(self):
         return self.db_service.get_session()
 
     @ErrorHandler.handle_database_error
     def get_forum_stats(self) -> Dict:
-        with self.get_db_session() as db:
-            total_communities = db.query(Community).count()
-            total_threads = db.query(CommunityThread).count()
-            total_replies = db.query(CommunityThreadReply).count()
-            reported_threads = (
-                db.query(CommunityThread)
-                .filter(CommunityThread.is_reported == True)
-                .count()
-            )
-            reported_replies = (
-                db.query(CommunityThreadReply)
-                .filter(CommunityThreadReply.is_reported == True)
-                .count()
-            )
-            total_members = db.query(CommunityMembership).count()
-
-            return {
-                "total_communities": total_communities,
-                "total_threads": total_threads,
-                "total_replies": total_replies,
-                "total_posts": total_threads + total_replies,
-                "reported_threads": reported_threads,
-                "reported_replies": reported_replies,
-                "total_reported": reported_threads + reported_replies,
-                "total_members": total_members,
+        stats = self.stats_engine.compute(
+            {
+                Community: {"total_communities": None},
+                CommunityThread: {
+                    "total_threads": None,
+                    "reported_threads": CommunityThread.is_reported == True,
+                },
+                CommunityThreadReply: {
+                    "total_replies": None,
+                    "reported_replies": CommunityThreadReply.is_reported == True,
+                },
+                CommunityMembership: {"total_members": None},
             }
+        )
+
+        return {
+            "total_communities": stats["total_communities"],
+            "total_threads": stats["total_threads"],
+            "total_replies": stats["total_replies"],
+            "total_posts": stats["total_threads"] + stats["total_replies"],
+            "reported_threads": stats["reported_threads"],
+            "reported_replies": stats["reported_replies"],
+            "total_reported": stats["reported_threads"] + stats["reported_replies"],
+            "total_members": stats["total_members"],
+        }
 
-    @ErrorHandler.handle_database_error
     def get_threads(
         self,
         limit: int = 50,
@@ -66,8 +78,36 @@ class CommunityForumService:
         search: Optional[str] = None,
         reported_only: bool = False,
     ) -> List[Dict]:
+        """One page of threads, most recently updated first; see get_thread_page"""
+        return self.get_thread_page(limit, offset, community_id, search, reported_only)["threads"]
+
+    @ErrorHandler.handle_database_error
+    def get_thread_page(
+        self,
+        limit: int = 50,
+        offset: int = 0,
+        community_id: Optional[int] = None,
+        search: Optional[str] = None,
+        reported_only: bool = False,
+    ) -> Dict:
+        """One page of threads with a flag for a truncated search.
+
+        A search only considers the best-ranked `MAX_THREAD_SEARCH_MATCHES`
+        full-text matches, which are then ordered by `last_updated`. When
+        there are more matches, `search_truncated` is True: newer threads
+        may be missing and the user should narrow the search.
+        """
+        search_truncated = False
         with self.get_db_session() as db:
-            query = db.query(CommunityThread)
+            query = (
+                db.query(
+                    CommunityThread,
+                    User.name.label("owner_name"),
+                    Community.name.label("community_name"),
+                )
+                .outerjoin(User, User.id == CommunityThread.owner_id)
+                .outerjoin(Community, Community.id == CommunityThread.community_id)
+            )
 
             if community_id:
                 query = query.filter(CommunityThread.community_id == community_id)
@@ -76,113 +116,223 @@ class CommunityForumService:
                 query = query.filter(CommunityThread.is_reported == True)
 
             if search:
-                query = query.filter(
-                    or_(
-                        CommunityThread.title.ilike(f"%{search}%"),
-                        CommunityThread.body.ilike(f"%{search}%"),
-                    )
-                )
+                matches, search_truncated = self._search_thread_ids(search, community_id)
+                query = query.filter(CommunityThread.id.in_(matches))
 
-            threads = (
+            rows = (
                 query.order_by(desc(CommunityThread.last_updated))
                 .limit(limit)
                 .offset(offset)
                 .all()
             )
 
-            result = []
-            for thread in threads:
-                owner = db.query(User).filter(User.id == thread.owner_id).first()
-                community = (
-                    db.query(Community)
-                    .filter(Community.id == thread.community_id)
-                    .first()
-                )
-
-                reply_count = (
-                    db.query(CommunityThreadReply)
-                    .filter(CommunityThreadReply.thread_id == thread.id)
-                    .count()
-                )
-
-                upvote_count = (
-                    db.query(CommunityThreadUpvote)
-                    .filter(CommunityThreadUpvote.thread_id == thread.id)
-                    .count()
-                )
+            thread_ids = [thread.id for thread, _, _ in rows]
+            reply_counts = count_by(db, CommunityThreadReply.thread_id, thread_ids)
+            upvote_counts = count_by(db, CommunityThreadUpvote.thread_id, thread_ids)
 
+            result = []
+            for thread, owner_name, community_name in rows:
+                body = thread.body or ""
                 result.append(
                     {
                         "id": thread.id,
                         "title": thread.title,
-                        "body": thread.body[:200] + "..."
-                        if len(thread.body) > 200
-                        else thread.body,
+                        "body": body[:200] + "..." if len(body) > 200 else body,
                         "body_full": thread.body,
                         "community_id": thread.community_id,
-                        "community_name": community.name if community else "Unknown",
+                        "community_name": community_name or "Unknown",
                         "owner_id": thread.owner_id,
-                        "owner_name": owner.name if owner else "Unknown",
+                        "owner_name": owner_name or "Unknown",
                         "created_at": thread.created_at,
                         "last_updated": thread.last_updated,
                         "is_reported": thread.is_reported,
-                        "reply_count": reply_count,
-                        "upvote_count": upvote_count,
+                        "reply_count": reply_counts.get(thread.id, 0),
+                        "upvote_count": upvote_counts.get(thread.id, 0),
                     }
                 )
 
-            return result
+            return {"threads": result, "search_truncated": search_truncated}
 
     @ErrorHandler.handle_database_error
     def get_thread_replies(self, thread_id: int) -> List[Dict]:
         with self.get_db_session() as db:
-            replies = (
-                db.query(CommunityThreadReply)
-                .filter(CommunityThreadReply.thread_id == thread_id)
-                .order_by(CommunityThreadReply.created_at.asc())
-                .all()
-            )
+            return self._load_thread_replies(db, thread_id)
 
-            result = []
-            for reply in replies:
-                owner = db.query(User).filter(User.id == reply.owner_id).first()
-
-                upvote_count = (
-                    db.query(CommunityThreadReplyUpvote)
-                    .filter(CommunityThreadReplyUpvote.reply_id == reply.id)
-                    .count()
-                )
-
-                parent_author = None
-                if reply.parent_id:
-                    parent_reply = (
-                        db.query(CommunityThreadReply)
-                        .filter(CommunityThreadReply.id == reply.parent_id)
-                        .first()
-                    )
-                    if parent_reply and parent_reply.owner_id:
-                        parent_user = (
-                            db.query(User)
-                            .filter(User.id == parent_reply.owner_id)
-                            .first()
-                        )
-                        parent_author = parent_user.name if parent_user else "Unknown"
+    @ErrorHandler.handle_database_error
+    def get_thread_reply_tree(
+        self,
+        thread_id: int,
+        parent_id: Optional[int] = None,
+        max_depth: Optional[int] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Dict:
+        """Get a thread's replies as a nested tree.
+
+        Returns the top-level replies (or the children of `parent_id`, to
+        open one branch lazily), paged by `limit`/`offset`. Only that page
+        and its descendants down to `max_depth` are read, one statement per
+        level; nodes at the cut keep `child_count` so the UI can load that
+        branch on demand. Replies whose parent chain loops back on itself
+        can never be reached from the top, so each such cycle is listed as
+        a top-level reply instead of disappearing.
+        """
+        with self.get_db_session() as db:
+            if parent_id is None:
+                level = self._top_level_reply_ids(db, thread_id)
+            else:
+                level = self._child_reply_ids(db, thread_id, [parent_id])
+
+            total = len(level)
+            page = level[offset : offset + limit] if limit else level[offset:]
+
+            page_ids = [reply_id for reply_id, _ in page]
+            seen = set(page_ids) | {parent_id}
+            children: Dict[int, List[int]] = {}
+            level_ids, depth = page_ids, 1
+            while level_ids and (max_depth is None or depth < max_depth):
+                next_ids = []
+                for reply_id, reply_parent in self._child_reply_ids(db, thread_id, level_ids):
+                    # A cycle would otherwise be walked again from the top
+                    if reply_id in seen:
+                        continue
+                    seen.add(reply_id)
+                    children.setdefault(reply_parent, []).append(reply_id)
+                    next_ids.append(reply_id)
+                level_ids, depth = next_ids, depth + 1
+
+            # Nodes at the depth limit only report how many children they have
+            cut_counts = self._count_child_replies(db, thread_id, level_ids)
+            replies = {
+                reply["id"]: reply
+                for reply in self._load_thread_replies(db, thread_id, list(seen - {parent_id}))
+            }
 
-                result.append(
-                    {
-                        "id": reply.id,
-                        "body": reply.body,
-                        "owner_id": reply.owner_id,
-                        "owner_name": owner.name if owner else "Unknown",
-                        "created_at": reply.created_at,
-                        "parent_id": reply.parent_id,
-                        "parent_author": parent_author,
-                        "is_reported": reply.is_reported,
-                        "upvote_count": upvote_count,
-                    }
-                )
+        return {
+            "replies": _assemble_reply_tree(page_ids, children, replies, cut_counts),
+            "total": total,
+            "has_more": offset + len(page) < total,
+        }
+
+    def _top_level_reply_ids(self, db, thread_id: int) -> List[Tuple[int, Optional[int]]]:
+        """(id, parent_id) of replies without a parent in the thread, oldest first.
+
+        Replies cut off from the top by a parent cycle are found with a
+        recursive CTE over ids; the oldest-id reply of each cycle is listed
+        too, and the rest of the cycle nests below it.
+        """
+        reply = CommunityThreadReply
+        parent = aliased(CommunityThreadReply)
+        roots = (
+            select(reply.id)
+            .outerjoin(parent, and_(parent.id == reply.parent_id, parent.thread_id == thread_id))
+            .where(
+                reply.thread_id == thread_id,
+                or_(parent.id.is_(None), reply.parent_id == reply.id),
+            )
+        )
+
+        reachable = roots.cte("reachable_replies", recursive=True)
+        child = aliased(CommunityThreadReply)
+        reachable = reachable.union_all(
+            select(child.id)
+            .join(reachable, child.parent_id == reachable.c.id)
+            .where(child.thread_id == thread_id, child.parent_id != child.id)
+        )
+
+        columns = (reply.id, reply.parent_id, reply.created_at)
+        top = db.query(*columns).filter(reply.id.in_(roots)).all()
+        stranded = (
+            db.query(*columns)
+            .filter(reply.thread_id == thread_id, reply.id.notin_(select(reachable.c.id)))
+            .all()
+        )
+        entries = set(_cycle_entries({row.id: row.parent_id for row in stranded}))
+        top += [row for row in stranded if row.id in entries]
+
+        top.sort(key=lambda row: (row.created_at or datetime.min, row.id))
+        return [(row.id, row.parent_id) for row in top]
+
+    def _child_reply_ids(self, db, thread_id: int, parent_ids: List[int]) -> List[Tuple[int, int]]:
+        """(id, parent_id) of the direct children of parent_ids, oldest first"""
+        reply = CommunityThreadReply
+        return (
+            db.query(reply.id, reply.parent_id)
+            .filter(
+                reply.thread_id == thread_id,
+                reply.parent_id.in_(parent_ids),
+                reply.parent_id != reply.id,
+            )
+            .order_by(reply.created_at.asc(), reply.id.asc())
+            .all()
+        )
+
+    def _count_child_replies(self, db, thread_id: int, parent_ids: List[int]) -> Dict[int, int]:
+        reply = CommunityThreadReply
+        return count_by(
+            db, reply.parent_id, parent_ids, reply.thread_id == thread_id, reply.parent_id != reply.id
+        )
+
+    def _load_thread_replies(
+        self, db, thread_id: int, reply_ids: Optional[List[int]] = None
+    ) -> List[Dict]:
+        """Replies (all, or just reply_ids) with owner, parent author and upvotes in two statements"""
+        if reply_ids is not None and not reply_ids:
+            return []
+
+        parent = aliased(CommunityThreadReply)
+        parent_owner = aliased(User)
+
+        query = (
+            db.query(
+                CommunityThreadReply,
+                User.name.label("owner_name"),
+                parent.owner_id.label("parent_owner_id"),
+                parent_owner.name.label("parent_owner_name"),
+            )
+            .outerjoin(User, User.id == CommunityThreadReply.owner_id)
+            .outerjoin(parent, parent.id == CommunityThreadReply.parent_id)
+            .outerjoin(parent_owner, parent_owner.id == parent.owner_id)
+            .filter(CommunityThreadReply.thread_id == thread_id)
+        )
+        upvotes = (
+            db.query(CommunityThreadReplyUpvote.reply_id, func.count())
+            .join(
+                CommunityThreadReply,
+                CommunityThreadReply.id == CommunityThreadReplyUpvote.reply_id,
+            )
+            .filter(CommunityThreadReply.thread_id == thread_id)
+        )
+        if reply_ids is not None:
+            query = query.filter(CommunityThreadReply.id.in_(reply_ids))
+            upvotes = upvotes.filter(CommunityThreadReply.id.in_(reply_ids))
+
+        rows = query.order_by(
+            CommunityThreadReply.created_at.asc(), CommunityThreadReply.id.asc()
+        ).all()
+        upvote_counts = dict(upvotes.group_by(CommunityThreadReplyUpvote.reply_id).all())
+
+        result = []
+        for reply, owner_name, parent_owner_id, parent_owner_name in rows:
+            parent_author = None
+            if parent_owner_id:
+                parent_author = parent_owner_name or "Unknown"
+
+            result.append(
+                {
+                    "id": reply.id,
+                    "body": reply.body,
+                    "owner_id": reply.owner_id,
+                    "owner_name": owner_name or "Unknown",
+                    "created_at": reply.created_at,
+                    "parent_id": reply.parent_id,
+                    "parent_author": parent_author,
+                    "is_reported": reply.is_reported,
+                    "upvote_count": int(upvote_counts.get(reply.id, 0)),
+                }
+            )
 
-            return result
+        return result
 
     @ErrorHandler.handle_database_error
     def get_reported_content(self) -> Dict:
@@ -248,76 +398,122 @@ class CommunityForumService:
 
     @ErrorHandler.handle_database_error
     def search_forum_content(self, keyword: str, limit: int = 50) -> List[Dict]:
-        if not keyword or len(keyword) < 2:
+        """Get the best-ranked threads and replies for a full-text query"""
+        return self.search_forum_page(keyword, limit=limit)["results"]
+
+    @ErrorHandler.handle_database_error
+    def search_forum_page(
+        self,
+        query: str,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        order: str = "relevance",
+        content_type: Optional[str] = None,
+    ) -> Dict:
+        """Search threads and replies through the full-text index.
+
+        Title matches rank above body matches. Pass the returned
+        `next_cursor` back to get the following page; `content_type`
+        restricts results to "thread" or "reply".
+        """
+        if not query or len(query.strip()) < 2:
             raise ValidationError("Search keyword must be at least 2 characters")
+        if not 1 <= limit <= MAX_SEARCH_PAGE_SIZE:
+            raise ValidationError(f"limit must be between 1 and {MAX_SEARCH_PAGE_SIZE}")
+
+        index_complete = self.search_index.sync(max_batches=SEARCH_SYNC_MAX_BATCHES)
+
+        where, params = "", ()
+        if content_type:
+            where, params = "kind = ?", (content_type,)
+        hits, next_cursor = self.search_index.query(
+            query, limit, cursor=cursor, order=order, where=where, params=params
+        )
 
         with self.get_db_session() as db:
-            threads = (
-                db.query(CommunityThread)
-                .filter(
-                    or_(
-                        CommunityThread.title.ilike(f"%{keyword}%"),
-                        CommunityThread.body.ilike(f"%{keyword}%"),
-                    )
-                )
-                .order_by(desc(CommunityThread.last_updated))
-                .limit(limit // 2)
+            items = self._load_search_hits(db, hits)
+
+        results = []
+        for hit in hits:
+            item = items.get((hit["kind"], hit["item_id"]))
+            if item is None:
+                continue
+            item["snippet"] = hit["snippet"]
+            item["rank"] = hit["rank"]
+            results.append(item)
+
+        return {
+            "results": results,
+            "next_cursor": next_cursor,
+            "index_complete": index_complete,
+        }
+
+    def _load_search_hits(self, db, hits: List[Dict]) -> Dict:
+        """Threads and replies for a page of hits, one joined query per type"""
+        thread_ids = [h["item_id"] for h in hits if h["kind"] == "thread"]
+        reply_ids = [h["item_id"] for h in hits if h["kind"] == "reply"]
+
+        loaded = {}
+        if thread_ids:
+            rows = (
+                db.query(CommunityThread, User.name, Community.name)
+                .outerjoin(User, User.id == CommunityThread.owner_id)
+                .outerjoin(Community, Community.id == CommunityThread.community_id)
+                .filter(CommunityThread.id.in_(thread_ids))
                 .all()
             )
-
-            replies = (
-                db.query(CommunityThreadReply)
-                .filter(CommunityThreadReply.body.ilike(f"%{keyword}%"))
-                .order_by(desc(CommunityThreadReply.created_at))
-                .limit(limit // 2)
+            for thread, owner_name, community_name in rows:
+                loaded[("thread", thread.id)] = {
+                    "type": "thread",
+                    "id": thread.id,
+                    "title": thread.title,
+                    "body": thread.body,
+                    "community_name": community_name or "Unknown",
+                    "owner_name": owner_name or "Unknown",
+                    "created_at": thread.created_at,
+                    "is_reported": thread.is_reported,
+                }
+
+        if reply_ids:
+            rows = (
+                db.query(CommunityThreadReply, User.name, CommunityThread.title)
+                .outerjoin(User, User.id == CommunityThreadReply.owner_id)
+                .outerjoin(
+                    CommunityThread,
+                    CommunityThread.id == CommunityThreadReply.thread_id,
+                )
+                .filter(CommunityThreadReply.id.in_(reply_ids))
                 .all()
             )
-
-            result = []
-
-            for thread in threads:
-                owner = db.query(User).filter(User.id == thread.owner_id).first()
-                community = (
-                    db.query(Community)
-                    .filter(Community.id == thread.community_id)
-                    .first()
-                )
-
-                result.append(
-                    {
-                        "type": "thread",
-                        "id": thread.id,
-                        "title": thread.title,
-                        "body": thread.body,
-                        "community_name": community.name if community else "Unknown",
-                        "owner_name": owner.name if owner else "Unknown",
-                        "created_at": thread.created_at,
-                        "is_reported": thread.is_reported,
-                    }
-                )
-
-            for reply in replies:
-                owner = db.query(User).filter(User.id == reply.owner_id).first()
-                thread = (
-                    db.query(CommunityThread)
-                    .filter(CommunityThread.id == reply.thread_id)
-                    .first()
-                )
-
-                result.append(
-                    {
-                        "type": "reply",
-                        "id": reply.id,
-                        "body": reply.body,
-                        "thread_title": thread.title if thread else "Unknown",
-                        "owner_name": owner.name if owner else "Unknown",
-                        "created_at": reply.created_at,
-                        "is_reported": reply.is_reported,
-                    }
-                )
-
-            result.sort(key=lambda x: x["created_at"] or datetime.min, reverse=True)
-            return result[:limit]
+            for reply, owner_name, thread_title in rows:
+                loaded[("reply", reply.id)] = {
+                    "type": "reply",
+                    "id": reply.id,
+                    "body": reply.body,
+                    "thread_id": reply.thread_id,
+                    "thread_title": thread_title or "Unknown",
+                    "owner_name": owner_name or "Unknown",
+                    "created_at": reply.created_at,
+                    "is_reported": reply.is_reported,
+                }
+
+        return loaded
+
+    def _search_thread_ids(
+        self, search: str, community_id: Optional[int]
+    ) -> Tuple[List[int], bool]:
+        """Best-ranked thread ids for get_thread_page's search filter, and whether more matched"""
+        self.search_index.sync(max_batches=SEARCH_SYNC_MAX_BATCHES)
+
+        where, params = "kind = 'thread'", ()
+        if community_id:
+            where, params = where + " AND community_id = ?", (community_id,)
+
+        hits = self.search_index.match(
+            search, MAX_THREAD_SEARCH_MATCHES + 1, where=where, params=params
+        )
+        truncated = len(hits) > MAX_THREAD_SEARCH_MATCHES
+        return [hit["item_id"] for hit in hits[:MAX_THREAD_SEARCH_MATCHES]], truncated
 
     @audit_log("DELETE_THREAD")
     @ErrorHandler.handle_database_error
@@ -336,6 +532,12 @@ class CommunityForumService:
                 raise ValidationError(f"Thread {thread_id} not found")
 
             thread_title = thread.title
+            reply_ids = [
+                reply_id
+                for (reply_id,) in db.query(CommunityThreadReply.id).filter(
+                    CommunityThreadReply.thread_id == thread_id
+                )
+            ]
 
             db.query(CommunityThreadReplyUpvote).filter(
                 CommunityThreadReplyUpvote.reply_id.in_(
@@ -355,6 +557,7 @@ class CommunityForumService:
 
             db.delete(thread)
             db.commit()
+            self.search_index.remove_thread(thread_id, reply_ids)
 
             AuditLogger.log_action(
                 "THREAD_DELETED",
@@ -385,6 +588,7 @@ class CommunityForumService:
 
             db.delete(reply)
             db.commit()
+            self.search_index.remove_reply(reply_id)
 
             AuditLogger.log_action(
                 "REPLY_DELETED", {"reply_id": reply_id, "reason": reason[:100]}
@@ -443,3 +647,48 @@ class CommunityForumService:
                     for r in replies[:10]
                 ],
             }
+
+
+def _cycle_entries(parents: Dict[int, int]) -> List[int]:
+    """Lowest id of each cycle in a reply -> parent map where every chain loops"""
+    entries, done = [], set()
+    for start in sorted(parents):
+        path, node = [], start
+        while node in parents and node not in done and node not in path:
+            path.append(node)
+            node = parents[node]
+        if node in path:
+            entries.append(min(path[path.index(node):]))
+        done.update(path)
+    return entries
+
+
+def _assemble_reply_tree(
+    page_ids: List[int],
+    children: Dict[int, List[int]],
+    replies: Dict[int, Dict],
+    cut_counts: Dict[int, int],
+) -> List[Dict]:
+    """Nest loaded replies under page_ids; nodes at the cut keep their child counts"""
+    result = []
+    stack = [(reply_id, 1, result) for reply_id in reversed(page_ids)]
+
+    while stack:
+        reply_id, depth, siblings = stack.pop()
+        reply = replies.get(reply_id)
+        if reply is None:
+            # Deleted between the tree and detail statements
+            continue
+
+        child_ids = children.get(reply_id, [])
+        node = {
+            **reply,
+            "depth": depth,
+            "child_count": cut_counts.get(reply_id, len(child_ids)),
+            "children": [],
+        }
+        siblings.append(node)
+        for child_id in reversed(child_ids):
+            stack.append((child_id, depth + 1, node["children"]))
+
+    return result
@@ -1,21 +1,40 @@
 import os
-from typing import Dict, List
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
 
 import requests
 from dotenv import load_dotenv
+from sqlalchemy import func, or_
 
+from core.models import ConvertKitSyncState, User, Watermark
+from core.schema import ensure_tables
 from core.security import AuditLogger, audit_log
+from services.convertkit_sync import (
+    ConvertKitClient,
+    ConvertKitSync,
+    SyncResult,
+    content_hash,
+    normalize_email,
+)
+from services.database_service import DatabaseService
+from services.watermarks import get_watermark, set_watermark
 from utils.error_handler import ErrorHandler
 from utils.exceptions import ValidationError
 
 load_dotenv()
 
+SYNC_WATERMARK = "convertkit.sync"
+SYNC_CHUNK_SIZE = 1000
+# Re-read users active shortly before the last run started; hashes drop repeats
+SYNC_OVERLAP_SECONDS = 300
+
 
 class ConvertKitService:
     def __init__(self):
         self.api_key = os.getenv("CONVERTKIT_API_KEY", "")
         self.api_secret = os.getenv("CONVERTKIT_API_SECRET", "")
         self.sequence_id = os.getenv("CONVERTKIT_SEQUENCE_ID", "")
+        self.db_service = DatabaseService()
 
     @ErrorHandler.handle_database_error
     def add_subscriber(self, email: str, first_name: str = "Added from dashboard", language: str = None) -> bool:
@@ -124,36 +143,169 @@ class ConvertKitService:
             return False
 
     @audit_log("BULK_SYNC_CONVERTKIT")
-    def bulk_sync_users(self, users: List[Dict]) -> Dict:
-        synced = 0
-        failed = 0
-
-        for user in users:
-            try:
-                email = user.get("email")
-                language = user.get("language")
-
-                if email and "privaterelay" not in email:
-                    subscriber = self.get_subscriber_by_email(email)
-
-                    if subscriber:
-                        subscriber_id = subscriber.get("id")
-                        if self.update_subscriber_language(subscriber_id, language):
-                            synced += 1
-                        else:
-                            failed += 1
-                    else:
-                        if self.add_subscriber(email, user.get("name", "User"), language):
-                            synced += 1
-                        else:
-                            failed += 1
-
-            except Exception as e:
-                failed += 1
-
-        AuditLogger.log_action(
-            "CONVERTKIT_BULK_SYNC_COMPLETE",
-            {"synced": synced, "failed": failed}
-        )
-
-        return {"synced": synced, "failed": failed}
+    def bulk_sync_users(self, users: List[Dict], on_progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+        """Create missing subscribers and fix changed languages in one diffed pass"""
+        result = self._run_sync(users, on_progress)
+        self._record_synced(result)
+
+        AuditLogger.log_action("CONVERTKIT_BULK_SYNC_COMPLETE", result.to_dict())
+
+        return result.to_dict()
+
+    @audit_log("INCREMENTAL_SYNC_CONVERTKIT")
+    def sync_changed_users(self, full: bool = False, on_progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+        """Sync registered users created or active since the last run.
+
+        Candidates whose (email, name, language) hash matches the last
+        synced one are dropped before any API call, and the rest are diffed
+        against the subscriber ids stored for them, so an incremental run
+        costs one request per changed user. The first run (or `full`) scans
+        every registered user and pulls the subscriber list instead. The
+        watermark only advances when nothing failed, so failures are
+        retried by the next run.
+        """
+        ensure_tables(self.db_service.engine, [Watermark, ConvertKitSyncState])
+        started = datetime.now()
+
+        with self.db_service.get_session() as db:
+            watermark = None if full else get_watermark(db, SYNC_WATERMARK)
+
+        changed, known, scanned, last_id = self._changed_users(watermark)
+
+        subscribers = known if watermark is not None else None
+        result = self._run_sync(changed, on_progress, subscribers)
+        self._record_synced(result)
+
+        if not result.failed:
+            with self.db_service.get_session() as db:
+                set_watermark(db, SYNC_WATERMARK, position=last_id, marked_at=started)
+                db.commit()
+
+        summary = {**result.to_dict(), "scanned": scanned, "changed": len(changed)}
+        AuditLogger.log_action("CONVERTKIT_INCREMENTAL_SYNC_COMPLETE", summary)
+
+        return summary
+
+    @ErrorHandler.handle_database_error
+    def get_sync_status(self) -> Dict:
+        """When the last incremental sync completed and how many emails are tracked"""
+        ensure_tables(self.db_service.engine, [Watermark, ConvertKitSyncState])
+
+        with self.db_service.get_session() as db:
+            watermark = get_watermark(db, SYNC_WATERMARK)
+            tracked = db.query(func.count(ConvertKitSyncState.email)).scalar()
+
+            return {
+                "last_sync": watermark.marked_at if watermark else None,
+                "last_user_id": watermark.position if watermark else None,
+                "tracked": tracked or 0,
+            }
+
+    def _run_sync(self, users, on_progress, subscribers=None) -> SyncResult:
+        if not self.api_key or not self.api_secret:
+            raise ValidationError("ConvertKit API key and secret are required for sync")
+
+        client = ConvertKitClient(self.api_key, self.api_secret, self.sequence_id)
+        try:
+            return ConvertKitSync(client).run(users, on_progress, subscribers)
+        except requests.RequestException as e:
+            AuditLogger.log_action("CONVERTKIT_REQUEST_ERROR", {"error": str(e)})
+            raise ValidationError(f"Could not load ConvertKit subscribers: {str(e)}")
+        finally:
+            client.close()
+
+    def _changed_users(self, watermark) -> Tuple[List[Dict], Dict[str, Dict], int, int]:
+        """Candidates since the watermark whose synced fields changed.
+
+        Returns (changed users, email -> known subscriber for them, number
+        of candidates scanned, highest candidate id).
+        """
+        condition = None
+        last_id = 0
+        if watermark is not None:
+            last_id = watermark.position or 0
+            condition = User.id > last_id
+            if watermark.marked_at:
+                since = watermark.marked_at - timedelta(seconds=SYNC_OVERLAP_SECONDS)
+                condition = or_(condition, User.last_active >= since)
+
+        changed, known = [], {}
+        scanned, after_id = 0, 0
+
+        while True:
+            with self.db_service.get_session() as db:
+                query = db.query(User.id, User.email, User.name, User.language).filter(
+                    User.reg_complete == True,
+                    User.email.isnot(None),
+                    User.id > after_id,
+                )
+                if condition is not None:
+                    query = query.filter(condition)
+                rows = query.order_by(User.id.asc()).limit(SYNC_CHUNK_SIZE).all()
+                if not rows:
+                    break
+
+                users = [
+                    {"id": row.id, "email": row.email, "name": row.name, "language": row.language}
+                    for row in rows
+                ]
+                states = self._load_states(db, [normalize_email(u["email"]) for u in users])
+
+            for user in users:
+                state = states.get(normalize_email(user["email"]))
+                if state is not None and state.content_hash == content_hash(user):
+                    continue
+                changed.append(user)
+                if state is not None and state.subscriber_id:
+                    # No stored first_name: the update re-sends the name with the language
+                    known[normalize_email(user["email"])] = {
+                        "id": state.subscriber_id,
+                        "fields": {"language": state.language},
+                    }
+
+            scanned += len(rows)
+            after_id = rows[-1].id
+            last_id = max(last_id, after_id)
+            if len(rows) < SYNC_CHUNK_SIZE:
+                break
+
+        return changed, known, scanned, last_id
+
+    def _load_states(self, db, emails: List[str]) -> Dict[str, ConvertKitSyncState]:
+        if not emails:
+            return {}
+        return {
+            state.email: state
+            for state in db.query(ConvertKitSyncState).filter(ConvertKitSyncState.email.in_(emails))
+        }
+
+    def _record_synced(self, result: SyncResult):
+        """Store the hash (and subscriber id) of every user that now matches ConvertKit"""
+        ensure_tables(self.db_service.engine, [ConvertKitSyncState])
+        now = datetime.now()
+
+        for start in range(0, len(result.synced), SYNC_CHUNK_SIZE):
+            chunk = result.synced[start:start + SYNC_CHUNK_SIZE]
+            with self.db_service.get_session() as db:
+                states = self._load_states(db, list({normalize_email(u.get("email")) for u, _ in chunk}))
+
+                for user, subscriber_id in chunk:
+                    email = normalize_email(user.get("email"))
+                    state = states.get(email)
+                    if state is None:
+                        state = states[email] = ConvertKitSyncState(email=email)
+                        db.add(state)
+
+                    state.user_id = user.get("id", state.user_id)
+                    state.subscriber_id = subscriber_id or state.subscriber_id
+                    state.language = user.get("language")
+                    state.content_hash = content_hash(user)
+                    state.synced_at = now
+
+                db.commit()
+
+
+if __name__ == "__main__":
+    import sys
+
+    print(ConvertKitService().sync_changed_users(full="--full" in sys.argv))
@@ -0,0 +1,314 @@
+"""Diff-based, concurrent sync of users to ConvertKit"""
+
+import hashlib
+import logging
+import os
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+CONVERTKIT_API_URL = os.getenv("CONVERTKIT_API_URL", "https://api.convertkit.com/v3")
+CONVERTKIT_CONCURRENCY = int(os.getenv("CONVERTKIT_CONCURRENCY", "4"))
+CONVERTKIT_TIMEOUT = int(os.getenv("CONVERTKIT_TIMEOUT", "10"))
+
+CREATE = "create"
+UPDATE = "update"
+
+
+def normalize_email(email: Optional[str]) -> str:
+    return (email or "").strip().lower()
+
+
+def is_syncable_email(email: str) -> bool:
+    """Apple relay addresses never reach a person, so they are not synced"""
+    return "@" in email and "privaterelay" not in email
+
+
+def first_name(user: Dict) -> str:
+    """The first_name a user is synced with"""
+    return user.get("name") or "User"
+
+
+def content_hash(user: Dict) -> str:
+    """Fingerprint of the fields a sync sends, to skip users that did not change"""
+    key = "\x1f".join(
+        (normalize_email(user.get("email")), user.get("name") or "", user.get("language") or "")
+    )
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+class ConvertKitClient:
+    """ConvertKit v3 API over a pooled session that backs off on 429 and 5xx.
+
+    Rate-limited and failed requests are retried with exponential backoff,
+    honouring `Retry-After`, before they are reported as failures.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        api_secret: str,
+        sequence_id: str,
+        base_url: str = CONVERTKIT_API_URL,
+        max_workers: int = CONVERTKIT_CONCURRENCY,
+        timeout: int = CONVERTKIT_TIMEOUT,
+        backoff_factor: float = 1,
+    ):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.sequence_id = sequence_id
+        self.base_url = base_url.rstrip("/")
+        self.max_workers = max_workers
+        self.timeout = timeout
+
+        retry = Retry(
+            total=5,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["GET", "POST", "PUT"]),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=max_workers, max_retries=retry
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Accept": "application/json"})
+
+    def _subscriber_page(self, page: int) -> Dict:
+        response = self.session.get(
+            f"{self.base_url}/subscribers",
+            params={"api_secret": self.api_secret, "page": page},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def iter_subscribers(self) -> Iterator[Dict]:
+        """Every subscriber; pages after the first are fetched concurrently"""
+        first = self._subscriber_page(1)
+        yield from first.get("subscribers") or []
+
+        total_pages = int(first.get("total_pages") or 1)
+        if total_pages <= 1:
+            return
+
+        with ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="convertkit-pages"
+        ) as executor:
+            for data in executor.map(self._subscriber_page, range(2, total_pages + 1)):
+                yield from data.get("subscribers") or []
+
+    def subscribe(self, email: str, first_name: str, language: Optional[str]) -> requests.Response:
+        data = {"api_key": self.api_key, "email": email, "first_name": first_name}
+        if language:
+            data["fields"] = {"language": language}
+        return self.session.post(
+            f"{self.base_url}/sequences/{self.sequence_id}/subscribe",
+            json=data,
+            timeout=self.timeout,
+        )
+
+    def update_subscriber(
+        self, subscriber_id, first_name: str, language: Optional[str]
+    ) -> requests.Response:
+        data = {"api_secret": self.api_secret, "first_name": first_name}
+        if language:
+            data["fields"] = {"language": language}
+        return self.session.put(
+            f"{self.base_url}/subscribers/{subscriber_id}",
+            json=data,
+            timeout=self.timeout,
+        )
+
+    def close(self):
+        self.session.close()
+
+
+class SyncPlan:
+    """What a sync has to send: only creates and changed names or languages"""
+
+    def __init__(self):
+        self.creates: List[Dict] = []
+        self.updates: List[Tuple[Dict, Dict]] = []
+        self.unchanged: List[Tuple[Dict, Dict]] = []
+        self.skipped = 0
+
+    def operations(self) -> Iterator[Tuple[str, Dict, Optional[Dict]]]:
+        for user in self.creates:
+            yield CREATE, user, None
+        for user, subscriber in self.updates:
+            yield UPDATE, user, subscriber
+
+
+def plan_sync(users: Iterable[Dict], subscribers: Dict[str, Dict]) -> SyncPlan:
+    """Diff our users against an email -> subscriber map"""
+    plan = SyncPlan()
+    seen = set()
+
+    for user in users:
+        email = normalize_email(user.get("email"))
+        if not is_syncable_email(email) or email in seen:
+            plan.skipped += 1
+            continue
+        seen.add(email)
+
+        subscriber = subscribers.get(email)
+        if subscriber is None:
+            plan.creates.append(user)
+            continue
+
+        current = (subscriber.get("fields") or {}).get("language")
+        language_changed = user.get("language") and user.get("language") != current
+        # A subscriber without a known first_name gets it sent again
+        name_changed = first_name(user) != subscriber.get("first_name")
+        if language_changed or name_changed:
+            plan.updates.append((user, subscriber))
+        else:
+            plan.unchanged.append((user, subscriber))
+
+    return plan
+
+
+class SyncResult:
+    """Outcome counters for one sync run.
+
+    `synced` lists (user, subscriber id) for every user now known to match
+    ConvertKit, unchanged ones included; the subscriber id is None when a
+    subscribe response did not carry one.
+    """
+
+    def __init__(self, plan: SyncPlan):
+        self.created = 0
+        self.updated = 0
+        self.unchanged = len(plan.unchanged)
+        self.skipped = plan.skipped
+        self.failed = 0
+        self.errors = Counter()
+        self.synced: List[Tuple[Dict, Optional[int]]] = [
+            (user, subscriber.get("id")) for user, subscriber in plan.unchanged
+        ]
+
+    def add(self, operation: str, user: Dict, error: Optional[str], subscriber_id: Optional[int]):
+        if error:
+            self.failed += 1
+            self.errors[error] += 1
+            return
+
+        if operation == CREATE:
+            self.created += 1
+        else:
+            self.updated += 1
+        self.synced.append((user, subscriber_id))
+
+    def to_dict(self) -> Dict:
+        return {
+            "synced": self.created + self.updated,
+            "created": self.created,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "errors": dict(self.errors),
+        }
+
+
+class ConvertKitSync:
+    """Pulls the subscriber list once, diffs it and sends only the changes.
+
+    Creates and updates are sent from a bounded thread pool with at most
+    `2 * max_workers` requests in flight, sharing the client's pooled
+    connections.
+    """
+
+    def __init__(self, client: ConvertKitClient):
+        self.client = client
+
+    def load_subscribers(self) -> Dict[str, Dict]:
+        return {
+            normalize_email(subscriber.get("email_address")): subscriber
+            for subscriber in self.client.iter_subscribers()
+        }
+
+    def run(
+        self,
+        users: Iterable[Dict],
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        subscribers: Optional[Dict[str, Dict]] = None,
+    ) -> SyncResult:
+        """Sync users; `on_progress(done, total)` is called from the calling thread.
+
+        `subscribers` replaces the subscriber pull with a known email map;
+        users missing from it are subscribed, which ConvertKit treats as
+        an upsert.
+        """
+        if subscribers is None:
+            subscribers = self.load_subscribers()
+        plan = plan_sync(users, subscribers)
+        result = SyncResult(plan)
+        total = len(plan.creates) + len(plan.updates)
+        done = 0
+
+        def collect(finished):
+            nonlocal done
+            for future in finished:
+                result.add(*future.result())
+                done += 1
+            if on_progress:
+                on_progress(done, total)
+
+        with ThreadPoolExecutor(
+            max_workers=self.client.max_workers, thread_name_prefix="convertkit-sync"
+        ) as executor:
+            pending = set()
+            for operation in plan.operations():
+                pending.add(executor.submit(self._send, *operation))
+                if len(pending) >= self.client.max_workers * 2:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(finished)
+
+            finished, _ = wait(pending)
+            collect(finished)
+
+        return result
+
+    def _send(
+        self, operation: str, user: Dict, subscriber: Optional[Dict]
+    ) -> Tuple[str, Dict, Optional[str], Optional[int]]:
+        try:
+            if operation == CREATE:
+                response = self.client.subscribe(
+                    normalize_email(user.get("email")), first_name(user), user.get("language")
+                )
+            else:
+                response = self.client.update_subscriber(
+                    subscriber["id"], first_name(user), user.get("language")
+                )
+        except requests.RequestException as e:
+            logger.warning(f"ConvertKit {operation} failed: {e}")
+            return operation, user, "RequestError", None
+
+        if response.status_code != 200:
+            logger.warning(
+                f"ConvertKit {operation} returned {response.status_code}: {response.text[:200]}"
+            )
+            return operation, user, f"HTTP{response.status_code}", None
+
+        if operation == UPDATE:
+            return operation, user, None, subscriber["id"]
+        return operation, user, None, _subscriber_id(response)
+
+
+def _subscriber_id(response: requests.Response) -> Optional[int]:
+    try:
+        return ((response.json().get("subscription") or {}).get("subscriber") or {}).get("id")
+    except ValueError:
+        return None
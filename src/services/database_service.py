@@ -1,7 +1,10 @@
 """Database connection and session management"""
 
+import atexit
 import os
+import threading
 from contextlib import contextmanager
+from typing import Dict, List, Tuple
 
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
@@ -11,17 +14,41 @@ from sqlalchemy.pool import QueuePool
 load_dotenv()
 
 
-class DatabaseService:
-    """Handles database connections and session management"""
+class EngineRegistry:
+    """Process-wide registry of SQLAlchemy engines keyed by connection config.
+
+    Every service and every Streamlit session that connects with the same
+    credentials shares one engine, one bounded QueuePool and (on Cloud SQL)
+    one Connector.
+    """
 
     def __init__(self):
-        db_user = os.getenv("DB_USER")
-        db_password = os.getenv("DB_PASSWORD")
-        db_name = os.getenv("DB_NAME")
-        instance_connection_name = os.getenv("INSTANCE_CONNECTION_NAME")
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple, Dict] = {}
 
-        if not all([db_user, db_password, db_name]):
-            raise ValueError("Missing required database configuration. Check your .env file.")
+    def get(self, config: Tuple) -> Dict:
+        """Return the engine entry for a config key, creating it on first use"""
+        entry = self._entries.get(config)
+        if entry is not None:
+            return entry
+
+        with self._lock:
+            entry = self._entries.get(config)
+            if entry is None:
+                entry = self._create_entry(config)
+                self._entries[config] = entry
+            return entry
+
+    def _create_entry(self, config: Tuple) -> Dict:
+        (
+            instance_connection_name,
+            db_host,
+            db_port,
+            db_user,
+            db_password,
+            db_name,
+        ) = config
+        connector = None
 
         if instance_connection_name:
             from google.cloud.sql.connector import Connector
@@ -38,26 +65,25 @@ class DatabaseService:
                     enable_iam_auth=False,
                 )
 
-            self.engine = create_engine(
+            engine = create_engine(
                 "mysql+pymysql://",
                 creator=getconn,
                 poolclass=QueuePool,
-                pool_size=10,
-                max_overflow=20,
+                pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+                max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20")),
                 pool_pre_ping=True,
                 pool_recycle=1800,
                 echo=False,
             )
+            name = f"{db_user}@{instance_connection_name}/{db_name}"
         else:
-            db_host = os.getenv("DB_HOST", "127.0.0.1")
-            db_port = os.getenv("DB_PORT", "3306")
             DATABASE_URL = f"mysql+mysqlconnector://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
 
-            self.engine = create_engine(
+            engine = create_engine(
                 DATABASE_URL,
                 poolclass=QueuePool,
-                pool_size=5,
-                max_overflow=10,
+                pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+                max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
                 pool_pre_ping=True,
                 pool_recycle=3600,
                 connect_args={
@@ -65,9 +91,80 @@ class DatabaseService:
                     'connection_timeout': 10
                 }
             )
-        self.SessionLocal = sessionmaker(
-            autocommit=False, autoflush=False, bind=self.engine
+            name = f"{db_user}@{db_host}:{db_port}/{db_name}"
+
+        return {
+            "name": name,
+            "engine": engine,
+            "session_factory": sessionmaker(
+                autocommit=False, autoflush=False, bind=engine
+            ),
+            "connector": connector,
+        }
+
+    def pool_stats(self) -> List[Dict]:
+        """Get connection pool statistics for every registered engine"""
+        stats = []
+        for entry in list(self._entries.values()):
+            pool = entry["engine"].pool
+            stats.append(
+                {
+                    "name": entry["name"],
+                    "pool_size": pool.size(),
+                    "checked_out": pool.checkedout(),
+                    "checked_in": pool.checkedin(),
+                    "overflow": pool.overflow(),
+                    "status": pool.status(),
+                }
+            )
+        return stats
+
+    def dispose_all(self):
+        """Close every pooled connection and forget all engines"""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+
+        for entry in entries:
+            entry["engine"].dispose()
+            if entry["connector"] is not None:
+                entry["connector"].close()
+
+
+engine_registry = EngineRegistry()
+atexit.register(engine_registry.dispose_all)
+
+
+class DatabaseService:
+    """Handles database connections and session management"""
+
+    def __init__(self):
+        db_user = os.getenv("DB_USER")
+        db_password = os.getenv("DB_PASSWORD")
+        db_name = os.getenv("DB_NAME")
+        instance_connection_name = os.getenv("INSTANCE_CONNECTION_NAME")
+
+        if not all([db_user, db_password, db_name]):
+            raise ValueError("Missing required database configuration. Check your .env file.")
+
+        if instance_connection_name:
+            db_host, db_port = None, None
+        else:
+            db_host = os.getenv("DB_HOST", "127.0.0.1")
+            db_port = os.getenv("DB_PORT", "3306")
+
+        entry = engine_registry.get(
+            (
+                instance_connection_name,
+                db_host,
+                db_port,
+                db_user,
+                db_password,
+                db_name,
+            )
         )
+        self.engine = entry["engine"]
+        self.SessionLocal = entry["session_factory"]
 
     @contextmanager
     def get_session(self):
@@ -77,3 +174,8 @@ class DatabaseService:
             yield session
         finally:
             session.close()
+
+    @staticmethod
+    def get_pool_stats() -> List[Dict]:
+        """Get pool statistics for all shared engines in this process"""
+        return engine_registry.pool_stats()
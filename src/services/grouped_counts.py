@@ -0,0 +1,22 @@
+"""Per-key row counts for the rows of a listing page"""
+
+from typing import Dict, List
+
+from sqlalchemy import func
+
+
+def count_by(db, key_column, keys: List[int], *filters) -> Dict[int, int]:
+    """Count rows per key for a whole page in one grouped IN query.
+
+    Keys without rows are left out, so callers read `.get(key, 0)`.
+    """
+    if not keys:
+        return {}
+
+    rows = (
+        db.query(key_column, func.count())
+        .filter(key_column.in_(keys), *filters)
+        .group_by(key_column)
+        .all()
+    )
+    return {key: int(count) for key, count in rows}
@@ -1,12 +1,36 @@
+import json
 import os
+import time
 from datetime import datetime
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional
 
 import requests
 from dotenv import load_dotenv
-from sqlalchemy import func, text
-
-from core.models import DeletedUser, Feedback, User, UserReport
+from sqlalchemy import (
+    and_,
+    case,
+    column,
+    delete,
+    func,
+    insert,
+    literal,
+    literal_column,
+    or_,
+    select,
+    table,
+)
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+from core.models import (
+    DeletedUser,
+    Feedback,
+    IndChatMembers,
+    IndChats,
+    IndMessage,
+    User,
+    UserReport,
+)
+from core.schema import get_table_columns, invalidate_table_columns
 from core.security import AuditLogger, audit_log, security_validator
 from services.database_service import DatabaseService
 from utils.error_handler import ErrorHandler
@@ -14,6 +38,16 @@ from utils.exceptions import DashboardException, DatabaseError, ValidationError
 
 load_dotenv()
 
+ADMIN_SENDER_ID = 1
+ADMIN_SENDER_NAME = "Jointly"
+BULK_MESSAGE_CHUNK = 500
+BULK_BAN_CHUNK = 200
+REPORT_PAGE_SIZE = 25
+FEEDBACK_PAGE_SIZE = 100
+FEEDBACK_SORTS = ("rating", "date")
+# Candidate columns for when feedback was left; the first non-NULL one wins
+FEEDBACK_TIMESTAMP_FIELDS = ("created_at", "timestamp", "date_created", "updated_at", "created")
+
 
 class ModerationService:
     def __init__(self, api_base_url: str = None, use_direct_db: bool = True):
@@ -40,11 +74,6 @@ class ModerationService:
         message = security_validator.sanitize_input(message)
 
         if self.use_direct_db:
-            import time
-            import json
-
-            from core.models import IndChats, IndChatMembers, IndMessage
-
             with self.get_db_session() as db:
                 sender_id = 1
                 receiver_id = int(user_id)
@@ -142,6 +171,148 @@ class ModerationService:
             except requests.RequestException as e:
                 raise DashboardException(f"API request failed: {str(e)}")
 
+    @audit_log("SEND_BULK_ADMIN_MESSAGE")
+    @ErrorHandler.handle_database_error
+    def send_bulk_message(self, user_ids: List[int], message: str,
+                          action_type: str = None, action_text: str = None,
+                          action_data: dict = None,
+                          on_progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+        """Send the same admin DM (and optional action button) to many users.
+
+        Works in chunks of `BULK_MESSAGE_CHUNK` recipients, each in one
+        transaction: existing chats are resolved with one `IN` query,
+        missing chats and memberships are created with multi-row inserts,
+        existing chats get one `UPDATE`, and all messages are inserted with
+        one `executemany`. IDs of users that do not exist are skipped.
+        """
+        if not self.use_direct_db:
+            raise ValidationError("Bulk messages require direct database access")
+        if not security_validator.validate_message_content(message):
+            raise ValidationError("Invalid message content")
+        if action_text and len(action_text) > 70:
+            raise ValidationError("Action button text must be under 70 characters")
+
+        message = security_validator.sanitize_input(message)
+        data = json.dumps(action_data) if action_data else None
+        recipients = list(dict.fromkeys(int(u) for u in user_ids if int(u) != ADMIN_SENDER_ID))
+
+        result = {"sent": 0, "chats_created": 0, "skipped": len(user_ids) - len(recipients)}
+        for start in range(0, len(recipients), BULK_MESSAGE_CHUNK):
+            chunk = recipients[start:start + BULK_MESSAGE_CHUNK]
+            sent, created = self._send_message_chunk(chunk, message, action_type or None, action_text or None, data)
+            result["sent"] += sent
+            result["chats_created"] += created
+            result["skipped"] += len(chunk) - sent
+            if on_progress:
+                on_progress(start + len(chunk), len(recipients))
+
+        AuditLogger.log_action(
+            "BULK_MESSAGE_SENT",
+            {**result, "message_length": len(message), "has_action": bool(action_type)},
+        )
+        return result
+
+    def _send_message_chunk(self, user_ids: List[int], message: str, action_type, action_text, data):
+        """Deliver one chunk in a single transaction; returns (sent, chats created)"""
+        now = int(time.time())
+
+        with self.get_db_session() as db:
+            receivers = [
+                row.id for row in db.query(User.id).filter(User.id.in_(user_ids))
+            ]
+            if not receivers:
+                return 0, 0
+
+            chats = self._admin_chats(db, receivers)
+            missing = [user_id for user_id in receivers if user_id not in chats]
+
+            if missing:
+                db.execute(
+                    insert(IndChats),
+                    [
+                        {
+                            "activity_name": "Jointly Notifications",
+                            "activity_id": None,
+                            "activity_owner_id": ADMIN_SENDER_ID,
+                            "last_sender_name": ADMIN_SENDER_NAME,
+                            "last_message": message,
+                            "last_timestamp": now,
+                            "receiver_id": user_id,
+                        }
+                        for user_id in missing
+                    ],
+                )
+                # Multi-row inserts do not return ids on MySQL; read them back
+                created = self._admin_chats(db, missing)
+                db.execute(
+                    insert(IndChatMembers),
+                    [
+                        {"ind_chat_id": created[user_id], "user_id": member,
+                         "last_activity": now if member == ADMIN_SENDER_ID else None,
+                         "active": True}
+                        for user_id in missing
+                        for member in (ADMIN_SENDER_ID, user_id)
+                    ],
+                )
+
+            existing = [chats[user_id] for user_id in receivers if user_id in chats]
+            if existing:
+                db.query(IndChats).filter(IndChats.id.in_(existing)).update(
+                    {
+                        IndChats.last_sender_name: ADMIN_SENDER_NAME,
+                        IndChats.last_message: message,
+                        IndChats.last_timestamp: now,
+                    },
+                    synchronize_session=False,
+                )
+            if missing:
+                chats.update(created)
+
+            db.execute(
+                insert(IndMessage),
+                [
+                    {
+                        "content": message,
+                        "timestamp": now,
+                        "sender_id": ADMIN_SENDER_ID,
+                        "ind_chat_id": chats[user_id],
+                        "action_type": action_type,
+                        "action_text": action_text,
+                        "action_data": data,
+                    }
+                    for user_id in receivers
+                ],
+            )
+            db.commit()
+
+            return len(receivers), len(missing)
+
+    def _admin_chats(self, db, user_ids: List[int]) -> Dict[int, int]:
+        """user id -> id of their chat with the admin, in either direction"""
+        rows = (
+            db.query(IndChats.id, IndChats.activity_owner_id, IndChats.receiver_id)
+            .filter(
+                or_(
+                    and_(IndChats.activity_owner_id == ADMIN_SENDER_ID, IndChats.receiver_id.in_(user_ids)),
+                    and_(IndChats.receiver_id == ADMIN_SENDER_ID, IndChats.activity_owner_id.in_(user_ids)),
+                )
+            )
+            .order_by(IndChats.id.asc())
+            .all()
+        )
+
+        chats: Dict[int, int] = {}
+        reverse: Dict[int, int] = {}
+        for chat_id, owner_id, receiver_id in rows:
+            if owner_id == ADMIN_SENDER_ID:
+                chats.setdefault(receiver_id, chat_id)
+            else:
+                reverse.setdefault(owner_id, chat_id)
+        # Like send_message, a chat the admin started wins over a reverse one
+        for user_id, chat_id in reverse.items():
+            chats.setdefault(user_id, chat_id)
+        return chats
+
     @audit_log("PERMANENT_BAN_USER")
     @ErrorHandler.handle_database_error
     def permanent_ban(self, user_id: str, reason: str) -> bool:
@@ -199,45 +370,105 @@ class ModerationService:
                 raise DashboardException(f"Ban API request failed: {str(e)}")
 
     @ErrorHandler.handle_database_error
-    def get_pending_reports(self) -> List[Dict]:
-        if self.use_direct_db:
-            with self.get_db_session() as db:
-                report_data = (
-                    db.query(
-                        UserReport.reported_id,
-                        func.count(UserReport.id).label("report_count"),
-                        User.name.label("reported_name"),
-                    )
-                    .outerjoin(User, UserReport.reported_id == User.id)
-                    .group_by(UserReport.reported_id, User.name)
-                    .having(func.count(UserReport.id) > 1)
-                    .order_by(func.count(UserReport.id).desc())
+    def get_ban_candidates(self, user_ids: List[int]) -> Dict:
+        """Look up users to ban in IN batches; unknown IDs are reported back"""
+        ids = list(dict.fromkeys(int(u) for u in user_ids))
+        users = []
+
+        with self.get_db_session() as db:
+            for start in range(0, len(ids), BULK_BAN_CHUNK):
+                chunk = ids[start:start + BULK_BAN_CHUNK]
+                rows = db.query(User.id, User.name, User.email).filter(User.id.in_(chunk)).all()
+                report_counts = dict(
+                    db.query(UserReport.reported_id, func.count(UserReport.id))
+                    .filter(UserReport.reported_id.in_(chunk))
+                    .group_by(UserReport.reported_id)
                     .all()
                 )
+                users.extend(
+                    {
+                        "id": row.id,
+                        "name": row.name,
+                        "email": row.email,
+                        "report_count": int(report_counts.get(row.id, 0)),
+                    }
+                    for row in rows
+                )
 
-                result = []
-                for reported_id, count, reported_name in report_data:
-                    reporters_query = (
-                        db.query(User.name)
-                        .join(UserReport, UserReport.reporter_id == User.id)
-                        .filter(UserReport.reported_id == reported_id)
-                        .all()
-                    )
+        found = {user["id"] for user in users}
+        order = {user_id: i for i, user_id in enumerate(ids)}
+        return {
+            "users": sorted(users, key=lambda user: order[user["id"]]),
+            "missing": [user_id for user_id in ids if user_id not in found],
+        }
 
-                    reporter_names = [r.name for r in reporters_query if r.name]
+    @audit_log("BULK_PERMANENT_BAN")
+    @ErrorHandler.handle_database_error
+    def bulk_permanent_ban(self, user_ids: List[int], reason: str,
+                           on_progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+        """Ban many users with set-based statements, one short transaction per chunk.
+
+        For each chunk of `BULK_BAN_CHUNK` IDs the users are copied into
+        `deleted_users` with `INSERT ... SELECT` and deleted with one
+        `DELETE ... IN`, then committed, so locks are held only briefly.
+        Each chunk writes one audit record listing the banned IDs.
+        """
+        if not self.use_direct_db:
+            raise ValidationError("Bulk bans require direct database access")
+        if not reason or len(reason) > 1000:
+            raise ValidationError(
+                "Ban reason is required and must be under 1000 characters"
+            )
 
-                    result.append(
-                        {
-                            "id": f"rep_{reported_id}",
-                            "reported_user": reported_name or f"User {reported_id}",
-                            "reported_user_id": str(reported_id),
-                            "description": f"User has been reported {count} times by different users",
-                            "report_count": int(count),
-                            "reporters": reporter_names,
-                        }
+        ids = list(dict.fromkeys(int(u) for u in user_ids))
+        invalid = [u for u in ids if not security_validator.validate_user_id(str(u)) or u == ADMIN_SENDER_ID]
+        if invalid:
+            raise ValidationError(f"Invalid user IDs: {', '.join(map(str, invalid[:10]))}")
+
+        # deleted_users.reason holds 250 characters
+        reason = security_validator.sanitize_input(reason)[:250]
+        result = {"banned": 0, "missing": []}
+
+        for batch, start in enumerate(range(0, len(ids), BULK_BAN_CHUNK), start=1):
+            chunk = ids[start:start + BULK_BAN_CHUNK]
+
+            with self.get_db_session() as db:
+                found = [row.id for row in db.query(User.id).filter(User.id.in_(chunk))]
+                if found:
+                    db.execute(
+                        insert(DeletedUser).from_select(
+                            ["user_id", "name", "email", "phone", "reason"],
+                            select(User.id, User.name, User.email, User.phone, literal(reason))
+                            .where(User.id.in_(found)),
+                        )
                     )
+                    db.execute(delete(User).where(User.id.in_(found)))
+                    db.commit()
+
+            found_ids = set(found)
+            result["banned"] += len(found)
+            result["missing"].extend(user_id for user_id in chunk if user_id not in found_ids)
+
+            AuditLogger.log_action(
+                "USERS_BANNED",
+                {
+                    "batch": batch,
+                    "banned_user_ids": found,
+                    "count": len(found),
+                    "ban_reason": reason[:100],
+                },
+            )
+            if on_progress:
+                on_progress(start + len(chunk), len(ids))
 
-                return result
+        return result
+
+    @ErrorHandler.handle_database_error
+    def get_pending_reports(
+        self, search: Optional[str] = None, limit: Optional[int] = None, offset: int = 0
+    ) -> List[Dict]:
+        if self.use_direct_db:
+            return self.get_report_page(search, limit, offset)["reports"]
         else:
             try:
                 response = self.session.get(f"{self.api_base_url}/api/reports/pending")
@@ -248,91 +479,246 @@ class ModerationService:
                 raise DashboardException(f"Reports API request failed: {str(e)}")
 
     @ErrorHandler.handle_database_error
-    def get_sent_feedback(self) -> List[Dict]:
-        """Get all feedback/messages sent to users from database"""
-        if self.use_direct_db:
-            with self.get_db_session() as db:
-                try:
-                    columns_result = db.execute(text("DESCRIBE feedback"))
-                    columns = [row[0] for row in columns_result.fetchall()]
-
-                    timestamp_fields = []
-                    for field in [
-                        "created_at",
-                        "timestamp",
-                        "date_created",
-                        "updated_at",
-                        "created",
-                    ]:
-                        if field in columns:
-                            timestamp_fields.append(field)
-
-                    if timestamp_fields:
-                        coalesce_clause = f"COALESCE({', '.join(timestamp_fields)}, NOW()) as feedback_date"
-                    else:
-                        coalesce_clause = "NOW() as feedback_date"
-
-                    result = db.execute(
-                        text(
-                            f"""
-                        SELECT *, {coalesce_clause}
-                        FROM feedback 
-                        ORDER BY 
-                            CASE 
-                                WHEN rating IS NULL OR rating = 0 THEN 2 
-                                ELSE 1 
-                            END,
-                            rating ASC,
-                            id DESC 
-                        LIMIT 100
-                    """
-                        )
-                    )
-                except Exception as e:
-                    result = db.execute(
-                        text(
-                            """
-                        SELECT *, NOW() as feedback_date
-                        FROM feedback 
-                        ORDER BY 
-                            CASE 
-                                WHEN rating IS NULL OR rating = 0 THEN 2 
-                                ELSE 1 
-                            END,
-                            rating ASC,
-                            id DESC 
-                        LIMIT 100
-                    """
-                        )
-                    )
-                rows = result.fetchall()
+    def get_report_page(
+        self, search: Optional[str] = None, limit: Optional[int] = REPORT_PAGE_SIZE, offset: int = 0
+    ) -> Dict:
+        """Users reported more than once, most reported first.
+
+        One grouped statement returns the page together with the total
+        (`COUNT(*) OVER ()`), and one batched `IN` lookup fetches the
+        reporter names for the whole page. `search` matches the reported
+        user's name (substring) or exact user ID.
+        """
+        if not self.use_direct_db:
+            return self._page_api_reports(search, limit, offset)
+
+        with self.get_db_session() as db:
+            report_count = func.count(UserReport.id)
+            query = (
+                db.query(
+                    UserReport.reported_id,
+                    report_count.label("report_count"),
+                    User.name.label("reported_name"),
+                    func.count().over().label("total"),
+                )
+                .outerjoin(User, UserReport.reported_id == User.id)
+                .group_by(UserReport.reported_id, User.name)
+                .having(report_count > 1)
+                .order_by(report_count.desc(), UserReport.reported_id.asc())
+            )
 
-                feedback_list = []
-                for row in rows:
-                    row_dict = dict(row._mapping)
-                    user_id = row_dict.get("user_id")
+            search = (search or "").strip()
+            if search:
+                condition = User.name.ilike(f"%{search}%")
+                if search.isdigit():
+                    condition = or_(condition, UserReport.reported_id == int(search))
+                query = query.filter(condition)
+
+            if offset:
+                query = query.offset(offset)
+            if limit:
+                query = query.limit(limit)
+            rows = query.all()
+
+            reporters = self._reporter_names(db, [row.reported_id for row in rows])
+
+            reports = [
+                {
+                    "id": f"rep_{reported_id}",
+                    "reported_user": reported_name or f"User {reported_id}",
+                    "reported_user_id": str(reported_id),
+                    "description": f"User has been reported {count} times by different users",
+                    "report_count": int(count),
+                    "reporters": reporters.get(reported_id, []),
+                }
+                for reported_id, count, reported_name, _ in rows
+            ]
+
+            if rows:
+                total = int(rows[0].total)
+            elif offset:
+                # Past the last page the window has no row to carry the total
+                total = self._count_reported_users(db, query)
+            else:
+                total = 0
+
+            return {
+                "reports": reports,
+                "total": total,
+                "has_more": offset + len(reports) < total,
+            }
+
+    def _page_api_reports(self, search: Optional[str], limit: Optional[int], offset: int) -> Dict:
+        """The reports API has no paging; filter and slice its full list"""
+        reports = self.get_pending_reports()
+        search = (search or "").strip()
+        if search:
+            reports = [
+                r
+                for r in reports
+                if search.lower() in r.get("reported_user", "").lower()
+                or search == str(r.get("reported_user_id", ""))
+            ]
+
+        page = reports[offset : offset + limit] if limit else reports[offset:]
+        return {
+            "reports": page,
+            "total": len(reports),
+            "has_more": offset + len(page) < len(reports),
+        }
 
-                    user = db.query(User).filter(User.id == user_id).first()
-                    user_name = user.name if user and user.name else f"User {user_id}"
+    @ErrorHandler.handle_database_error
+    def get_feedback_page(
+        self,
+        search: Optional[str] = None,
+        ratings: Optional[List[int]] = None,
+        sort: str = "rating",
+        limit: int = FEEDBACK_PAGE_SIZE,
+        cursor: Optional[str] = None,
+    ) -> Dict:
+        """One keyset page of user feedback with the author's name joined in.
+
+        `sort="rating"` lists rated feedback lowest first, then unrated,
+        newest first within a rating; `sort="date"` is newest first.
+        `ratings` keeps only those ratings (0 = unrated). `search` matches
+        the author's name or the feedback text, or the exact user ID. Pass
+        the returned `next_cursor` back to get the following page.
+        """
+        if sort not in FEEDBACK_SORTS:
+            raise ValidationError(f"Invalid feedback sort: {sort!r}")
+        if not self.use_direct_db:
+            # The feedback API returns one unpaged list
+            return {"feedback": self.get_sent_feedback(), "next_cursor": None, "has_more": False}
+
+        try:
+            return self._load_feedback_page(search, ratings, sort, limit, cursor)
+        except (OperationalError, ProgrammingError):
+            # The table changed since its columns were cached; look again once
+            invalidate_table_columns(self.db_service.engine, "feedback")
+            return self._load_feedback_page(search, ratings, sort, limit, cursor)
+
+    def _load_feedback_page(self, search, ratings, sort, limit, cursor) -> Dict:
+        columns = get_table_columns(self.db_service.engine, "feedback")
+        feedback = table("feedback", *[column(name) for name in columns])
+        fields = feedback.c
+
+        def optional(name):
+            return fields[name] if name in columns else literal_column("NULL")
+
+        rating = optional("rating")
+        message = optional("feedback") if "feedback" in columns else optional("message")
+        timestamps = [fields[name] for name in FEEDBACK_TIMESTAMP_FIELDS if name in columns]
+        feedback_date = func.coalesce(*timestamps, func.current_timestamp())
+        unrated = case((or_(rating.is_(None), rating == 0), 1), else_=0)
+        rating_key = func.coalesce(rating, 0)
+
+        query = select(
+            fields.id,
+            fields.user_id,
+            message.label("message"),
+            rating.label("rating"),
+            feedback_date.label("feedback_date"),
+            User.name.label("user_name"),
+            unrated.label("unrated"),
+            rating_key.label("rating_key"),
+        ).select_from(feedback.outerjoin(User, User.id == fields.user_id))
+
+        search = (search or "").strip()
+        if search:
+            conditions = [User.name.ilike(f"%{search}%"), message.ilike(f"%{search}%")]
+            if search.isdigit():
+                conditions.append(fields.user_id == int(search))
+            query = query.where(or_(*conditions))
+
+        if ratings:
+            conditions = []
+            rated = [int(r) for r in ratings if r]
+            if rated:
+                conditions.append(rating.in_(rated))
+            if len(rated) < len(ratings):
+                conditions.append(or_(rating.is_(None), rating == 0))
+            query = query.where(or_(*conditions))
+
+        if sort == "date":
+            if cursor:
+                query = query.where(fields.id < _parse_feedback_cursor(cursor, 1)[0])
+            query = query.order_by(fields.id.desc())
+        else:
+            if cursor:
+                is_unrated, rating_value, feedback_id = _parse_feedback_cursor(cursor, 3)
+                query = query.where(
+                    or_(
+                        unrated > is_unrated,
+                        and_(unrated == is_unrated, rating_key > rating_value),
+                        and_(unrated == is_unrated, rating_key == rating_value, fields.id < feedback_id),
+                    )
+                )
+            query = query.order_by(unrated.asc(), rating_key.asc(), fields.id.desc())
 
-                    rating = row_dict.get("rating", 0)
+        with self.get_db_session() as db:
+            rows = db.execute(query.limit(limit + 1)).fetchall()
 
-                    feedback_date = row_dict.get("feedback_date")
+        has_more = len(rows) > limit
+        rows = rows[:limit]
 
-                    feedback_list.append(
-                        {
-                            "id": row_dict.get("id"),
-                            "user_id": user_id,
-                            "user_name": user_name,
-                            "message": row_dict.get("feedback", "No feedback"),
-                            "rating": row_dict.get("rating", "No rating"),
-                            "timestamp": feedback_date,
-                            "status": "Feedback",
-                            "read_status": True,
-                        }
-                    )
+        next_cursor = None
+        if has_more:
+            last = rows[-1]
+            next_cursor = (
+                str(last.id) if sort == "date" else f"{last.unrated}:{int(last.rating_key)}:{last.id}"
+            )
 
-                return feedback_list
+        return {
+            "feedback": [
+                {
+                    "id": row.id,
+                    "user_id": row.user_id,
+                    "user_name": row.user_name or f"User {row.user_id}",
+                    "message": row.message or "No feedback",
+                    "rating": row.rating,
+                    "timestamp": row.feedback_date,
+                    "status": "Feedback",
+                    "read_status": True,
+                }
+                for row in rows
+            ],
+            "next_cursor": next_cursor,
+            "has_more": has_more,
+        }
+
+    def _reporter_names(self, db, reported_ids: List[int]) -> Dict[int, List[str]]:
+        if not reported_ids:
+            return {}
+
+        names: Dict[int, List[str]] = {}
+        rows = (
+            db.query(UserReport.reported_id, User.name)
+            .join(User, UserReport.reporter_id == User.id)
+            .filter(UserReport.reported_id.in_(reported_ids))
+            .order_by(UserReport.id.asc())
+            .all()
+        )
+        for reported_id, name in rows:
+            if name:
+                names.setdefault(reported_id, []).append(name)
+        return names
+
+    def _count_reported_users(self, db, query) -> int:
+        subquery = query.limit(None).offset(None).order_by(None).subquery()
+        return db.query(func.count()).select_from(subquery).scalar() or 0
+
+    @ErrorHandler.handle_database_error
+    def get_sent_feedback(
+        self,
+        search: Optional[str] = None,
+        ratings: Optional[List[int]] = None,
+        sort: str = "rating",
+        limit: int = FEEDBACK_PAGE_SIZE,
+        cursor: Optional[str] = None,
+    ) -> List[Dict]:
+        """Get all feedback/messages sent to users from database"""
+        if self.use_direct_db:
+            return self.get_feedback_page(search, ratings, sort, limit, cursor)["feedback"]
         else:
             try:
                 response = self.session.get(
@@ -343,3 +729,13 @@ class ModerationService:
                 return []
             except requests.RequestException as e:
                 raise DashboardException(f"Feedback API request failed: {str(e)}")
+
+
+def _parse_feedback_cursor(cursor: str, parts: int):
+    try:
+        values = [int(value) for value in cursor.split(":")]
+    except (AttributeError, ValueError):
+        values = []
+    if len(values) != parts:
+        raise ValidationError(f"Invalid feedback cursor: {cursor!r}")
+    return values
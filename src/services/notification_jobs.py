@@ -0,0 +1,279 @@
+"""Durable bulk notification jobs processed by a background worker"""
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+
+from core.models import NotificationJob
+from core.security import AuditLogger
+from services.push_delivery import DeliveryResult, ExpoPushClient, build_push_message
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+ACTIVE_JOB_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+JOB_CHUNK_SIZE = int(os.getenv("NOTIFICATION_JOB_CHUNK", "1000"))
+# A running job whose heartbeat is older than this is taken over
+JOB_LEASE_SECONDS = int(os.getenv("NOTIFICATION_JOB_LEASE", "120"))
+# Heartbeats while a chunk is being sent, well inside the lease
+JOB_HEARTBEAT_SECONDS = max(1, JOB_LEASE_SECONDS // 4)
+WORKER_POLL_SECONDS = int(os.getenv("NOTIFICATION_WORKER_POLL", "10"))
+
+TokenSource = Callable[[Dict, int, int], List[Tuple[int, str]]]
+
+
+class LeaseLost(Exception):
+    """The job was cancelled or taken over while this worker was sending it"""
+
+
+class NotificationJobWorker:
+    """Sends queued notification jobs from a daemon thread, one job at a time.
+
+    A job is claimed with a lease (owner + heartbeat). After each chunk of
+    recipients the cursor on `User.id`, the counters and the heartbeat are
+    committed together, so a job whose process dies is picked up by the
+    next worker from its last checkpoint once the lease expires. While a
+    chunk is being sent, the heartbeat is also refreshed from the push
+    client's `on_batch` callback every `JOB_HEARTBEAT_SECONDS`, so a slow
+    chunk does not let the lease expire. Delivery is at-least-once: at
+    most one chunk can be resent after a crash.
+    """
+
+    def __init__(
+        self,
+        db_service,
+        token_source: TokenSource,
+        client_factory: Callable[[], ExpoPushClient] = ExpoPushClient,
+    ):
+        self.db_service = db_service
+        self.token_source = token_source
+        self.client_factory = client_factory
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{id(self)}"
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start the worker thread unless it is already running"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="notification-jobs", daemon=True
+                )
+                self._thread.start()
+
+    def wake(self):
+        """Look for work now instead of at the next poll"""
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            try:
+                job_id = self.claim_next()
+                if job_id is not None:
+                    self.process(job_id)
+                    continue
+            except Exception:
+                logger.exception("Notification worker iteration failed")
+
+            self._wake.wait(WORKER_POLL_SECONDS)
+            self._wake.clear()
+
+    def _claimable(self, now: datetime):
+        stale = now - timedelta(seconds=JOB_LEASE_SECONDS)
+        return or_(
+            NotificationJob.status == JOB_QUEUED,
+            and_(
+                NotificationJob.status == JOB_RUNNING,
+                or_(
+                    NotificationJob.heartbeat_at.is_(None),
+                    NotificationJob.heartbeat_at < stale,
+                ),
+            ),
+        )
+
+    def claim_next(self) -> Optional[int]:
+        """Lease the oldest queued (or abandoned) job; returns its id"""
+        with self.db_service.get_session() as db:
+            now = datetime.now()
+            candidates = (
+                db.query(NotificationJob.id, NotificationJob.started_at)
+                .filter(self._claimable(now))
+                .order_by(NotificationJob.id.asc())
+                .limit(5)
+                .all()
+            )
+
+            for job_id, started_at in candidates:
+                claimed = (
+                    db.query(NotificationJob)
+                    .filter(NotificationJob.id == job_id, self._claimable(now))
+                    .update(
+                        {
+                            NotificationJob.status: JOB_RUNNING,
+                            NotificationJob.lease_owner: self.owner,
+                            NotificationJob.heartbeat_at: now,
+                            NotificationJob.started_at: started_at or now,
+                        },
+                        synchronize_session=False,
+                    )
+                )
+                db.commit()
+                if claimed:
+                    return job_id
+
+        return None
+
+    def process(self, job_id: int):
+        """Send a claimed job from its cursor until done, cancelled or the lease is lost"""
+        with self.db_service.get_session() as db:
+            job = db.query(NotificationJob).filter(NotificationJob.id == job_id).first()
+            title, body = job.title, job.body
+            data = json.loads(job.data or "{}")
+            filters = json.loads(job.filters or "{}")
+            cursor, processed = job.cursor_user_id or 0, (job.sent or 0) + (job.failed or 0)
+
+        limit = filters.get("limit") or None
+        beat_at = time.monotonic()
+
+        def heartbeat(_result: DeliveryResult):
+            nonlocal beat_at
+            if time.monotonic() - beat_at < JOB_HEARTBEAT_SECONDS:
+                return
+            if not self._heartbeat(job_id):
+                raise LeaseLost(f"Notification job {job_id} is no longer leased by {self.owner}")
+            beat_at = time.monotonic()
+
+        client = self.client_factory()
+        try:
+            while limit is None or processed < limit:
+                chunk_size = JOB_CHUNK_SIZE
+                if limit is not None:
+                    chunk_size = min(chunk_size, limit - processed)
+
+                recipients = self.token_source(filters, cursor, chunk_size)
+                if not recipients:
+                    break
+
+                result = client.deliver(
+                    (build_push_message(token, title, body, data) for _, token in recipients),
+                    on_batch=heartbeat,
+                )
+                cursor = recipients[-1][0]
+                processed += len(recipients)
+
+                if not self._checkpoint(job_id, cursor, result):
+                    return
+                beat_at = time.monotonic()
+                if len(recipients) < chunk_size:
+                    break
+
+            self._finish(job_id, JOB_COMPLETED)
+        except LeaseLost:
+            logger.warning(f"Notification job {job_id} was cancelled or taken over mid-chunk")
+        except Exception as e:
+            logger.exception(f"Notification job {job_id} failed")
+            self._finish(job_id, JOB_FAILED, error=str(e))
+        finally:
+            client.close()
+
+    def _heartbeat(self, job_id: int) -> bool:
+        """Extend the lease mid-chunk; False if the job was cancelled or taken over"""
+        with self.db_service.get_session() as db:
+            renewed = (
+                db.query(NotificationJob)
+                .filter(
+                    NotificationJob.id == job_id,
+                    NotificationJob.status == JOB_RUNNING,
+                    NotificationJob.lease_owner == self.owner,
+                )
+                .update({NotificationJob.heartbeat_at: datetime.now()}, synchronize_session=False)
+            )
+            db.commit()
+            return bool(renewed)
+
+    def _checkpoint(self, job_id: int, cursor: int, result: DeliveryResult) -> bool:
+        """Record a delivered chunk; False if the job was cancelled or taken over"""
+        with self.db_service.get_session() as db:
+            job = (
+                db.query(NotificationJob)
+                .filter(
+                    NotificationJob.id == job_id,
+                    NotificationJob.status == JOB_RUNNING,
+                    NotificationJob.lease_owner == self.owner,
+                )
+                .with_for_update()
+                .first()
+            )
+            if job is None:
+                return False
+
+            errors = json.loads(job.errors or "{}")
+            for error, count in result.errors.items():
+                errors[error] = errors.get(error, 0) + count
+
+            job.cursor_user_id = cursor
+            job.sent = (job.sent or 0) + result.sent
+            job.failed = (job.failed or 0) + result.failed
+            job.errors = json.dumps(errors)
+            job.heartbeat_at = datetime.now()
+            db.commit()
+            return True
+
+    def _finish(self, job_id: int, status: str, error: Optional[str] = None):
+        with self.db_service.get_session() as db:
+            job = (
+                db.query(NotificationJob)
+                .filter(
+                    NotificationJob.id == job_id,
+                    NotificationJob.status == JOB_RUNNING,
+                    NotificationJob.lease_owner == self.owner,
+                )
+                .first()
+            )
+            if job is None:
+                return
+
+            job.status = status
+            job.last_error = error[:1000] if error else None
+            job.finished_at = datetime.now()
+            job.lease_owner = None
+            db.commit()
+
+            AuditLogger.log_action(
+                "BULK_NOTIFICATION_SENT",
+                {
+                    "job_id": job_id,
+                    "title": job.title[:50],
+                    "created_by": job.created_by,
+                    "recipients": job.sent,
+                    "failed": job.failed,
+                },
+                success=status == JOB_COMPLETED,
+            )
+
+
+_worker: Optional[NotificationJobWorker] = None
+_worker_lock = threading.Lock()
+
+
+def get_notification_worker(db_service, token_source: TokenSource) -> NotificationJobWorker:
+    """Return the process-wide worker, starting it on first use"""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = NotificationJobWorker(db_service, token_source)
+        _worker.start()
+        return _worker
@@ -1,33 +1,51 @@
 import json
-from typing import Dict, List
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
 
-import requests
 from dotenv import load_dotenv
+from sqlalchemy import func
 
-from core.models import User
+from core.models import NotificationJob, User
 from core.security import AuditLogger, audit_log
+from core.schema import ensure_tables
 from services.database_service import DatabaseService
+from services.notification_jobs import (
+    ACTIVE_JOB_STATUSES,
+    JOB_CANCELLED,
+    JOB_FAILED,
+    JOB_QUEUED,
+    get_notification_worker,
+)
+from services.push_delivery import ExpoPushClient, build_push_message
+from services.segment_index import get_segment_index
 from utils.error_handler import ErrorHandler
 from utils.exceptions import ValidationError
+from utils.time_buckets import as_datetime
 
 load_dotenv()
 
+RECIPIENT_FIELDS = ("id", "notif_token", "language", "email")
+RECIPIENT_CHUNK = 1000
+# Rows fetched per round trip from the server-side cursor
+STREAM_BATCH = 500
+
 
 class NotificationService:
     def __init__(self):
         self.db_service = DatabaseService()
+        ensure_tables(self.db_service.engine, [NotificationJob])
+        self.segment_index = get_segment_index(self.db_service)
+        # Started here so jobs interrupted by a restart resume on first use
+        self.worker = get_notification_worker(self.db_service, self._fetch_push_tokens)
 
     def get_db_session(self):
         return self.db_service.get_session()
 
     @ErrorHandler.handle_database_error
-    def get_recipient_count(self, filters: Dict) -> int:
-        with self.get_db_session() as db:
-            query = db.query(User).filter(User.notif_token.isnot(None), User.notif_token != '')
-
-            query = self._apply_filters(query, filters)
-
-            return query.count()
+    def get_recipient_count(self, filters: Dict, require_token: bool = True) -> int:
+        """Count matching users from the in-memory segment index"""
+        self.segment_index.refresh()
+        return self.segment_index.count(filters, require_token)
 
     @audit_log("SEND_BULK_NOTIFICATION")
     @ErrorHandler.handle_database_error
@@ -35,43 +53,212 @@ class NotificationService:
         if not title or not body:
             raise ValidationError("Title and body are required")
 
+        messages = (
+            build_push_message(token, title, body, data)
+            for _, token in self.iter_recipients(filters, fields=("id", "notif_token"))
+        )
+
+        client = ExpoPushClient()
+        try:
+            result = client.deliver(messages)
+        finally:
+            client.close()
+
+        AuditLogger.log_action(
+            "BULK_NOTIFICATION_SENT",
+            {
+                "title": title[:50],
+                "recipients": result.sent,
+                "failed": result.failed,
+                "errors": dict(result.errors),
+                "filters": filters
+            }
+        )
+
+        return result.to_dict()
+
+    @audit_log("CREATE_NOTIFICATION_JOB")
+    @ErrorHandler.handle_database_error
+    def create_notification_job(
+        self, title: str, body: str, data: Dict, filters: Dict, created_by: str = "unknown"
+    ) -> int:
+        """Queue a bulk notification for the background worker; returns the job id"""
+        if not title or not body:
+            raise ValidationError("Title and body are required")
+
+        total = self.get_recipient_count(filters)
+        if filters.get('limit'):
+            total = min(total, filters['limit'])
+
+        with self.get_db_session() as db:
+            job = NotificationJob(
+                title=title[:100],
+                body=body,
+                data=json.dumps(data or {}),
+                filters=json.dumps(filters or {}),
+                status=JOB_QUEUED,
+                total=total,
+                created_by=created_by,
+            )
+            db.add(job)
+            db.commit()
+            job_id = job.id
+
+        self.worker.wake()
+
+        AuditLogger.log_action(
+            "NOTIFICATION_JOB_CREATED",
+            {"job_id": job_id, "title": title[:50], "recipients": total, "filters": filters}
+        )
+
+        return job_id
+
+    @ErrorHandler.handle_database_error
+    def get_notification_jobs(self, limit: int = 10) -> List[Dict]:
+        """Most recent notification jobs, newest first"""
+        with self.get_db_session() as db:
+            jobs = (
+                db.query(NotificationJob)
+                .order_by(NotificationJob.id.desc())
+                .limit(limit)
+                .all()
+            )
+            return [self._job_to_dict(job) for job in jobs]
+
+    @ErrorHandler.handle_database_error
+    def get_notification_job(self, job_id: int) -> Dict:
+        with self.get_db_session() as db:
+            job = db.query(NotificationJob).filter(NotificationJob.id == job_id).first()
+            if not job:
+                raise ValidationError(f"Notification job {job_id} not found")
+            return self._job_to_dict(job)
+
+    @audit_log("CANCEL_NOTIFICATION_JOB")
+    @ErrorHandler.handle_database_error
+    def cancel_notification_job(self, job_id: int) -> bool:
+        """Stop a queued or running job after its current chunk"""
+        return self._set_job_status(
+            job_id, ACTIVE_JOB_STATUSES, JOB_CANCELLED, finished_at=datetime.now()
+        )
+
+    @audit_log("RESUME_NOTIFICATION_JOB")
+    @ErrorHandler.handle_database_error
+    def resume_notification_job(self, job_id: int) -> bool:
+        """Requeue a failed or cancelled job; it continues from its cursor"""
+        resumed = self._set_job_status(
+            job_id,
+            (JOB_FAILED, JOB_CANCELLED),
+            JOB_QUEUED,
+            finished_at=None,
+            last_error=None,
+            lease_owner=None,
+        )
+        self.worker.wake()
+        return resumed
+
+    def _set_job_status(self, job_id: int, from_statuses, status: str, **values) -> bool:
         with self.get_db_session() as db:
-            query = db.query(User).filter(User.notif_token.isnot(None), User.notif_token != '')
-
-            query = self._apply_filters(query, filters)
-
-            if 'limit' in filters and filters['limit']:
-                query = query.limit(filters['limit'])
-
-            users = query.all()
-
-            sent = 0
-            failed = 0
-
-            for user in users:
-                try:
-                    if user.notif_token and user.notif_token != '':
-                        success = self._send_push_notification(
-                            user.notif_token, title, body, data
-                        )
-                        if success:
-                            sent += 1
-                        else:
-                            failed += 1
-                except Exception as e:
-                    failed += 1
-
-            AuditLogger.log_action(
-                "BULK_NOTIFICATION_SENT",
-                {
-                    "title": title[:50],
-                    "recipients": sent,
-                    "failed": failed,
-                    "filters": filters
-                }
+            updated = (
+                db.query(NotificationJob)
+                .filter(NotificationJob.id == job_id, NotificationJob.status.in_(from_statuses))
+                .update({"status": status, **values}, synchronize_session=False)
             )
+            db.commit()
+
+        if not updated:
+            raise ValidationError(f"Job {job_id} is not {' or '.join(from_statuses)}")
+        return True
+
+    def _job_to_dict(self, job: NotificationJob) -> Dict:
+        processed = (job.sent or 0) + (job.failed or 0)
+        return {
+            "id": job.id,
+            "title": job.title,
+            "status": job.status,
+            "total": job.total,
+            "sent": job.sent,
+            "failed": job.failed,
+            "progress": min(processed / job.total, 1.0) if job.total else 1.0,
+            "errors": json.loads(job.errors or "{}"),
+            "last_error": job.last_error,
+            "cursor_user_id": job.cursor_user_id,
+            "created_by": job.created_by,
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+            "heartbeat_at": job.heartbeat_at,
+        }
+
+    def iter_recipients(
+        self,
+        filters: Dict,
+        fields: Tuple[str, ...] = RECIPIENT_FIELDS,
+        require_token: bool = True,
+        after_id: int = 0,
+        limit: Optional[int] = None,
+        chunk_size: int = RECIPIENT_CHUNK,
+    ) -> Iterator:
+        """Stream matching users as lightweight rows in User.id order.
+
+        The segment index plans each chunk: its next `chunk_size`
+        candidates after the keyset position bound an id range. Which users
+        in that range match is decided in SQL on current values, and after
+        the last candidate the range is open-ended. Users whose token,
+        language, registration, ambassador flag or city changed without a
+        `last_active` bump since the snapshot are therefore still found.
+        Each chunk is one query selecting only `fields` (`id` always comes
+        first), limited to `chunk_size` rows and read through a server-side
+        cursor with `yield_per`. The connection is released before the
+        chunk's rows are handed out, so a slow consumer never pins it and
+        memory is bounded by `chunk_size` however large the audience is.
+        `limit` defaults to `filters['limit']`.
+        """
+        columns = [User.id] + [getattr(User, field) for field in fields if field != "id"]
+        remaining = limit if limit is not None else filters.get('limit') or None
+        last_id = after_id
+
+        self.segment_index.refresh()
+
+        while remaining is None or remaining > 0:
+            size = chunk_size if remaining is None else min(chunk_size, remaining)
+            candidate_ids = self.segment_index.ids_after(filters, last_id, size, require_token)
+            upper = int(candidate_ids[-1]) if len(candidate_ids) == size else None
 
-            return {"sent": sent, "failed": failed}
+            with self.get_db_session() as db:
+                query = db.query(*columns).filter(User.id > last_id)
+                if upper is not None:
+                    query = query.filter(User.id <= upper)
+                if require_token:
+                    query = query.filter(User.notif_token.isnot(None), User.notif_token != '')
+                # _apply_filters orders by User.id
+                query = (
+                    self._apply_filters(query, filters)
+                    .limit(size)
+                    .execution_options(yield_per=min(size, STREAM_BATCH))
+                )
+                rows = list(query)
+
+            if remaining is not None:
+                rows = rows[:remaining]
+                remaining -= len(rows)
+            yield from rows
+
+            if len(rows) == size:
+                # The range may hold more matches than the snapshot knew of
+                last_id = rows[-1][0]
+            elif upper is None:
+                return
+            else:
+                last_id = upper
+
+    def _fetch_push_tokens(self, filters: Dict, after_id: int, limit: int) -> List[Tuple[int, str]]:
+        """One keyset chunk of (user id, push token) after after_id"""
+        return [
+            tuple(row)
+            for row in self.iter_recipients(
+                filters, fields=("id", "notif_token"), after_id=after_id, limit=limit, chunk_size=limit
+            )
+        ]
 
     def _apply_filters(self, query, filters: Dict):
         if filters.get('language'):
@@ -86,36 +273,23 @@ class NotificationService:
         if filters.get('max_user_id'):
             query = query.filter(User.id <= filters['max_user_id'])
 
-        return query.order_by(User.id.asc())
+        if filters.get('is_ambassador'):
+            query = query.filter(User.is_ambassador == True)
 
-    def _send_push_notification(self, token: str, title: str, body: str, data: Dict) -> bool:
-        try:
-            notification = {
-                "to": token,
-                "sound": "default",
-                "title": title,
-                "body": body,
-                "data": data,
-                "collapse_id": "admin-notification",
-                "channelId": "default",
-                "priority": "default",
-                "android": {
-                    "collapseKey": "admin-notification",
-                    "category": "CATEGORY_MESSAGE"
-                }
-            }
+        if filters.get('cities'):
+            cities = [city.strip().lower() for city in filters['cities']]
+            query = query.filter(func.lower(func.trim(User.city)).in_(cities))
 
-            response = requests.post(
-                "https://exp.host/--/api/v2/push/send",
-                headers={
-                    "Accept": "application/json",
-                    "Accept-encoding": "gzip, deflate",
-                    "Content-Type": "application/json"
-                },
-                data=json.dumps(notification),
-                timeout=10
-            )
+        if filters.get('created_after'):
+            query = query.filter(User.created_at >= as_datetime(filters['created_after']))
+
+        if filters.get('created_before'):
+            query = query.filter(User.created_at < as_datetime(filters['created_before']))
 
-            return response.status_code == 200
-        except Exception:
-            return False
+        if filters.get('active_since'):
+            query = query.filter(User.last_active >= as_datetime(filters['active_since']))
+
+        if filters.get('active_before'):
+            query = query.filter(User.last_active < as_datetime(filters['active_before']))
+
+        return query.order_by(User.id.asc())
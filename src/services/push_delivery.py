@@ -0,0 +1,205 @@
+"""Batched, concurrent delivery of Expo push notifications"""
+
+import logging
+import os
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+EXPO_PUSH_URL = os.getenv("EXPO_PUSH_URL", "https://exp.host/--/api/v2/push/send")
+# Expo accepts at most 100 messages per request
+EXPO_BATCH_SIZE = 100
+PUSH_CONCURRENCY = int(os.getenv("PUSH_CONCURRENCY", "4"))
+PUSH_TIMEOUT = int(os.getenv("PUSH_TIMEOUT", "30"))
+# Tokens Expo reports as unregistered, kept for cleanup
+MAX_INVALID_TOKENS = 1000
+
+
+def build_push_message(token: str, title: str, body: str, data: Dict) -> Dict:
+    return {
+        "to": token,
+        "sound": "default",
+        "title": title,
+        "body": body,
+        "data": data,
+        "collapse_id": "admin-notification",
+        "channelId": "default",
+        "priority": "default",
+        "android": {
+            "collapseKey": "admin-notification",
+            "category": "CATEGORY_MESSAGE",
+        },
+    }
+
+
+class DeliveryResult:
+    """Aggregated Expo tickets for one delivery run"""
+
+    def __init__(self):
+        self.sent = 0
+        self.failed = 0
+        self.errors = Counter()
+        self.invalid_tokens: List[str] = []
+
+    def add_tickets(self, messages: List[Dict], tickets: List[Dict]):
+        for message, ticket in zip(messages, tickets):
+            if ticket.get("status") == "ok":
+                self.sent += 1
+                continue
+
+            self.failed += 1
+            error = (ticket.get("details") or {}).get("error") or "Unknown"
+            self.errors[error] += 1
+            if (
+                error == "DeviceNotRegistered"
+                and len(self.invalid_tokens) < MAX_INVALID_TOKENS
+            ):
+                self.invalid_tokens.append(message["to"])
+
+        # Expo returns one ticket per message; anything missing failed
+        missing = len(messages) - len(tickets)
+        if missing > 0:
+            self.failed += missing
+            self.errors["MissingTicket"] += missing
+
+    def add_failure(self, count: int, error: str):
+        self.failed += count
+        self.errors[error] += count
+
+    def merge(self, other: "DeliveryResult"):
+        self.sent += other.sent
+        self.failed += other.failed
+        self.errors.update(other.errors)
+        room = MAX_INVALID_TOKENS - len(self.invalid_tokens)
+        self.invalid_tokens.extend(other.invalid_tokens[:room])
+
+    def to_dict(self) -> Dict:
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "errors": dict(self.errors),
+            "invalid_tokens": len(self.invalid_tokens),
+        }
+
+
+class ExpoPushClient:
+    """Sends push messages to Expo in 100-message batches over pooled connections.
+
+    Batches are posted from a bounded thread pool and at most
+    `2 * max_workers` batches are in flight, so an arbitrarily long
+    message iterator is consumed with constant memory.
+    """
+
+    def __init__(
+        self,
+        url: str = EXPO_PUSH_URL,
+        max_workers: int = PUSH_CONCURRENCY,
+        timeout: int = PUSH_TIMEOUT,
+    ):
+        self.url = url
+        self.max_workers = max_workers
+        self.timeout = timeout
+
+        # Expo may already have queued a batch that came back 5xx or timed
+        # out, so only refused connections and 429 are retried here. Other
+        # failures are recorded and left to the job's checkpoint and retry.
+        retry = Retry(
+            total=3,
+            read=0,
+            backoff_factor=1,
+            status_forcelist=(429,),
+            allowed_methods=frozenset(["POST"]),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=max_workers, max_retries=retry
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(
+            {
+                "Accept": "application/json",
+                "Accept-Encoding": "gzip, deflate",
+                "Content-Type": "application/json",
+            }
+        )
+
+    def send_batch(self, messages: List[Dict]) -> DeliveryResult:
+        """Post one batch (at most 100 messages) and collect its tickets"""
+        result = DeliveryResult()
+        try:
+            response = self.session.post(self.url, json=messages, timeout=self.timeout)
+        except requests.RequestException as e:
+            logger.warning(f"Expo push request failed: {e}")
+            result.add_failure(len(messages), "RequestError")
+            return result
+
+        if response.status_code != 200:
+            logger.warning(f"Expo push returned {response.status_code}: {response.text[:200]}")
+            result.add_failure(len(messages), f"HTTP{response.status_code}")
+            return result
+
+        try:
+            tickets = response.json().get("data") or []
+        except ValueError:
+            result.add_failure(len(messages), "InvalidResponse")
+            return result
+
+        result.add_tickets(messages, tickets)
+        return result
+
+    def deliver(
+        self,
+        messages: Iterable[Dict],
+        on_batch: Optional[Callable[[DeliveryResult], None]] = None,
+    ) -> DeliveryResult:
+        """Send every message and return the aggregated result.
+
+        `on_batch` is called from the calling thread with each finished
+        batch's result, e.g. to record progress.
+        """
+        total = DeliveryResult()
+
+        def collect(done):
+            for future in done:
+                batch_result = future.result()
+                total.merge(batch_result)
+                if on_batch:
+                    on_batch(batch_result)
+
+        with ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="expo-push"
+        ) as executor:
+            pending = set()
+            for batch in _batches(messages, EXPO_BATCH_SIZE):
+                pending.add(executor.submit(self.send_batch, batch))
+                if len(pending) >= self.max_workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+
+            done, _ = wait(pending)
+            collect(done)
+
+        return total
+
+    def close(self):
+        self.session.close()
+
+
+def _batches(items: Iterable[Dict], size: int):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
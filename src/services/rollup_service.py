@@ -0,0 +1,327 @@
+"""Daily analytics rollups with incremental refresh"""
+
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import func
+
+from core.models import (
+    Activity,
+    CommunityThread,
+    CommunityThreadReply,
+    DailyRollup,
+    IndMessage,
+    Message,
+    User,
+    UserReport,
+    Watermark,
+)
+from core.schema import ensure_tables
+from services.database_service import DatabaseService
+from services.watermarks import get_watermark, set_watermark
+from utils.error_handler import ErrorHandler
+from utils.time_buckets import as_datetime, bucket_key, count_by_bucket, day_range
+
+logger = logging.getLogger(__name__)
+
+# Days (including today) that are recomputed on every refresh
+ROLLUP_OPEN_DAYS = int(os.getenv("ROLLUP_OPEN_DAYS", "3"))
+ROLLUP_BACKFILL_DAYS = int(os.getenv("ROLLUP_BACKFILL_DAYS", "365"))
+# Closed days recomputed per backfill transaction
+ROLLUP_BACKFILL_CHUNK = 30
+ROLLUP_REFRESH_INTERVAL = int(os.getenv("ROLLUP_REFRESH_INTERVAL", "300"))
+
+CLOSED_THROUGH = "rollups.closed_through"
+FIRST_DAY = "rollups.first_day"
+MESSAGE_ID_FLOOR = "rollups.message_id_floor"
+IND_MESSAGE_ID_FLOOR = "rollups.ind_message_id_floor"
+REPORT_ID = "rollups.report_id"
+
+COUNTER_COLUMNS = (
+    "active_users",
+    "new_users",
+    "group_messages",
+    "direct_messages",
+    "activities_created",
+    "reports",
+    "forum_posts",
+)
+
+
+class RollupService:
+    """Maintains per-day analytics counters so dashboard reads stay flat.
+
+    Days older than the open window are closed and never rescanned. Each
+    refresh recomputes only the open days (plus any gap since the last run),
+    and message scans start from an id floor instead of the whole table.
+    The first refresh covers only the open days; `backfill` extends the
+    rollups back to `ROLLUP_BACKFILL_DAYS`, a chunk at a time, from a
+    background thread or the command line. `reported_users` has no
+    timestamp, so reports are attributed to the day a refresh first sees
+    them; reports that existed before the first refresh are on no day.
+    """
+
+    _refresh_lock = threading.Lock()
+    _last_refresh = 0.0
+
+    def __init__(self):
+        self.db_service = DatabaseService()
+        ensure_tables(self.db_service.engine, [Watermark, DailyRollup])
+        # Started here so the first dashboard load never waits for the backfill
+        start_backfill(self)
+
+    def get_db_session(self):
+        return self.db_service.get_session()
+
+    @ErrorHandler.handle_database_error
+    def refresh(self, force: bool = False) -> bool:
+        """Recompute the open days; returns False if a recent refresh is still fresh"""
+        with RollupService._refresh_lock:
+            elapsed = time.monotonic() - RollupService._last_refresh
+            if not force and elapsed < ROLLUP_REFRESH_INTERVAL:
+                return False
+
+            with self.get_db_session() as db:
+                today = date.today()
+                first_open = today - timedelta(days=ROLLUP_OPEN_DAYS - 1)
+
+                closed = get_watermark(db, CLOSED_THROUGH)
+                if closed and closed.marked_at:
+                    start = min(closed.marked_at.date() + timedelta(days=1), first_open)
+                else:
+                    start = first_open
+                    set_watermark(db, FIRST_DAY, marked_at=as_datetime(start))
+
+                self._recompute(db, start, today + timedelta(days=1))
+                db.flush()
+                self._add_new_reports(db, today)
+
+                window_start = as_datetime(first_open)
+                self._advance_id_floor(db, MESSAGE_ID_FLOOR, Message, window_start)
+                self._advance_id_floor(
+                    db, IND_MESSAGE_ID_FLOOR, IndMessage, window_start
+                )
+                set_watermark(
+                    db, CLOSED_THROUGH, marked_at=window_start - timedelta(days=1)
+                )
+                db.commit()
+
+            RollupService._last_refresh = time.monotonic()
+            return True
+
+    @ErrorHandler.handle_database_error
+    def backfill(self, days: int = ROLLUP_BACKFILL_DAYS) -> int:
+        """Extend the rollups back to cover the last `days` days; returns the days added.
+
+        Each chunk of `ROLLUP_BACKFILL_CHUNK` days is its own transaction
+        and holds the refresh lock only while it runs.
+        """
+        self.refresh()
+        target = date.today() - timedelta(days=days - 1)
+        added = 0
+
+        while True:
+            with RollupService._refresh_lock:
+                with self.get_db_session() as db:
+                    first_day = self._first_day(db)
+                    if first_day is None or first_day <= target:
+                        return added
+
+                    start = max(target, first_day - timedelta(days=ROLLUP_BACKFILL_CHUNK))
+                    self._recompute(db, start, first_day)
+                    set_watermark(db, FIRST_DAY, marked_at=as_datetime(start))
+                    db.commit()
+
+            added += (first_day - start).days
+
+    @ErrorHandler.handle_database_error
+    def get_first_day(self) -> Optional[date]:
+        """Earliest day with a rollup row, or None before the first refresh"""
+        with self.get_db_session() as db:
+            return self._first_day(db)
+
+    def _first_day(self, db) -> Optional[date]:
+        first = get_watermark(db, FIRST_DAY)
+        return first.marked_at.date() if first and first.marked_at else None
+
+    @ErrorHandler.handle_database_error
+    def get_daily_rollups(self, start_day: date, end_day: date) -> List[Dict]:
+        """Get rollup rows for start_day (inclusive) to end_day (exclusive).
+
+        Only days from `get_first_day()` on have rows; earlier days are not
+        backfilled here.
+        """
+        self.refresh()
+
+        with self.get_db_session() as db:
+            rows = (
+                db.query(DailyRollup)
+                .filter(DailyRollup.day >= start_day, DailyRollup.day < end_day)
+                .order_by(DailyRollup.day.asc())
+                .all()
+            )
+
+            return [
+                {"day": row.day, **{c: getattr(row, c) or 0 for c in COUNTER_COLUMNS}}
+                for row in rows
+            ]
+
+    @ErrorHandler.handle_database_error
+    def get_platform_counters(self) -> Dict:
+        """Get today's message volume from rollups and the live report total"""
+        self.refresh()
+
+        with self.get_db_session() as db:
+            today_row = (
+                db.query(DailyRollup).filter(DailyRollup.day == date.today()).first()
+            )
+            # Live, so dismissed reports leave the total
+            reports_total = db.query(func.count(UserReport.id)).scalar()
+
+            messages_today = 0
+            if today_row:
+                messages_today = (today_row.group_messages or 0) + (
+                    today_row.direct_messages or 0
+                )
+
+            return {
+                "messages_today": messages_today,
+                "reports_total": int(reports_total or 0),
+            }
+
+    def _recompute(self, db, start_day: date, end_day: date) -> None:
+        start, end = as_datetime(start_day), as_datetime(end_day)
+
+        message_floor = self._id_floor(db, MESSAGE_ID_FLOOR, start)
+        ind_message_floor = self._id_floor(db, IND_MESSAGE_ID_FLOOR, start)
+
+        threads = count_by_bucket(db, CommunityThread.created_at, start, end, "day")
+        replies = count_by_bucket(
+            db, CommunityThreadReply.created_at, start, end, "day"
+        )
+
+        counts = {
+            "active_users": count_by_bucket(db, User.last_active, start, end, "day"),
+            "new_users": count_by_bucket(db, User.created_at, start, end, "day"),
+            "group_messages": count_by_bucket(
+                db,
+                Message.timestamp,
+                start,
+                end,
+                "day",
+                unix=True,
+                filters=(Message.id >= message_floor,),
+            ),
+            "direct_messages": count_by_bucket(
+                db,
+                IndMessage.timestamp,
+                start,
+                end,
+                "day",
+                unix=True,
+                filters=(IndMessage.id >= ind_message_floor,),
+            ),
+            "activities_created": count_by_bucket(
+                db, Activity.created_at, start, end, "day"
+            ),
+            "forum_posts": {
+                key: threads.get(key, 0) + replies.get(key, 0)
+                for key in set(threads) | set(replies)
+            },
+        }
+
+        existing = {
+            row.day: row
+            for row in db.query(DailyRollup).filter(
+                DailyRollup.day >= start_day, DailyRollup.day < end_day
+            )
+        }
+
+        now = datetime.now()
+        for day in day_range(start_day, end_day):
+            row = existing.get(day)
+            if row is None:
+                row = DailyRollup(day=day, reports=0)
+                db.add(row)
+
+            key = bucket_key(day, "day")
+            for column, by_day in counts.items():
+                setattr(row, column, by_day.get(key, 0))
+            row.refreshed_at = now
+
+    def _id_floor(self, db, name: str, start: datetime) -> int:
+        """Lowest message id that can fall on or after start, if known"""
+        watermark = get_watermark(db, name)
+        if (
+            watermark
+            and watermark.position
+            and watermark.marked_at
+            and watermark.marked_at <= start
+        ):
+            return watermark.position
+        return 0
+
+    def _advance_id_floor(self, db, name: str, model, window_start: datetime) -> None:
+        floor = self._id_floor(db, name, window_start)
+        new_floor = (
+            db.query(func.min(model.id))
+            .filter(model.id >= floor, model.timestamp >= int(window_start.timestamp()))
+            .scalar()
+        )
+        if new_floor is not None:
+            set_watermark(db, name, position=new_floor, marked_at=window_start)
+
+    def _add_new_reports(self, db, today: date) -> None:
+        watermark = get_watermark(db, REPORT_ID)
+        if watermark is None or watermark.position is None:
+            # Reports from before the first refresh have no day to go on
+            max_id = db.query(func.coalesce(func.max(UserReport.id), 0)).scalar()
+            set_watermark(db, REPORT_ID, position=max_id)
+            return
+        last_id = watermark.position
+
+        new_count, max_id = (
+            db.query(func.count(UserReport.id), func.max(UserReport.id))
+            .filter(UserReport.id > last_id)
+            .one()
+        )
+        if not new_count:
+            return
+
+        row = db.query(DailyRollup).filter(DailyRollup.day == today).first()
+        row.reports = (row.reports or 0) + int(new_count)
+        set_watermark(db, REPORT_ID, position=max_id)
+
+
+_backfill_thread: Optional[threading.Thread] = None
+_backfill_lock = threading.Lock()
+
+
+def _run_backfill(service: RollupService):
+    try:
+        service.backfill()
+    except Exception:
+        logger.exception("Rollup backfill failed")
+
+
+def start_backfill(service: RollupService) -> None:
+    """Run `service.backfill()` once per process on a daemon thread"""
+    global _backfill_thread
+    with _backfill_lock:
+        if _backfill_thread is None:
+            _backfill_thread = threading.Thread(
+                target=_run_backfill, args=(service,), name="rollup-backfill", daemon=True
+            )
+            _backfill_thread.start()
+
+
+if __name__ == "__main__":
+    import sys
+
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else ROLLUP_BACKFILL_DAYS
+    added = RollupService().backfill(days)
+    print(f"Backfilled {added} days of rollups")
@@ -0,0 +1,468 @@
+"""Local full-text search indexes kept beside the MySQL database"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_
+
+from core.models import CommunityThread, CommunityThreadReply, IndMessage, Message
+from utils.exceptions import ValidationError
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SEARCH_INDEX_PATH = os.getenv(
+    "SEARCH_INDEX_PATH", os.path.join(ROOT, "data", "search_index.db")
+)
+SEARCH_SYNC_INTERVAL = int(os.getenv("SEARCH_SYNC_INTERVAL", "60"))
+SEARCH_SYNC_BATCH = int(os.getenv("SEARCH_SYNC_BATCH", "5000"))
+# Batches indexed per source when a search triggers a catch-up
+SEARCH_SYNC_MAX_BATCHES = int(os.getenv("SEARCH_SYNC_MAX_BATCHES", "20"))
+
+_TOKEN = re.compile(r'"([^"]*)"|(\S+)')
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def build_match_query(text: str) -> str:
+    """Turn user input into a safe FTS5 MATCH expression.
+
+    `"exact phrase"` is kept as a phrase, `word*` becomes a prefix query
+    and every other word must match. FTS5 operators typed by the user
+    are treated as plain words.
+    """
+    terms = []
+    for phrase, word in _TOKEN.findall(text or ""):
+        if phrase:
+            words = _WORD.findall(phrase)
+            if words:
+                terms.append('"' + " ".join(words) + '"')
+            continue
+
+        parts = [f'"{part}"' for part in _WORD.findall(word)]
+        if parts and word.endswith("*"):
+            parts[-1] += "*"
+        terms.extend(parts)
+
+    if not terms:
+        raise ValidationError("Search query must contain at least one word")
+    return " ".join(terms)
+
+
+class SearchIndex:
+    """SQLite FTS5 index fed incrementally from MySQL tables.
+
+    Each source is read in id order from a watermark stored in the index
+    file itself, so deleting the file simply triggers a full rebuild.
+    Subclasses describe the FTS table and how to load source rows.
+    """
+
+    TABLE = ""
+    COLUMNS: Tuple[str, ...] = ()
+    UNINDEXED: Tuple[str, ...] = ()
+    TOKENIZE = "unicode61 remove_diacritics 2"
+    WEIGHTS: Tuple[float, ...] = ()
+    # Column the snippet is cut from; -1 lets FTS5 pick the best match
+    SNIPPET_COLUMN = 0
+    SOURCES: Tuple[str, ...] = ()
+
+    def __init__(self, db_service, path: str = SEARCH_INDEX_PATH):
+        self.db_service = db_service
+        self.path = path
+        self._lock = threading.Lock()
+        self._last_sync = 0.0
+        self._caught_up = False
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._create_tables()
+
+    def _create_tables(self):
+        columns = list(self.COLUMNS) + [f"{c} UNINDEXED" for c in self.UNINDEXED]
+        with self._conn:
+            self._conn.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.TABLE} USING fts5("
+                f"{', '.join(columns)}, tokenize='{self.TOKENIZE}')"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS index_state "
+                "(name TEXT PRIMARY KEY, position INTEGER NOT NULL)"
+            )
+
+    def _position(self, source: str) -> int:
+        row = self._conn.execute(
+            "SELECT position FROM index_state WHERE name = ?",
+            (f"{self.TABLE}.{source}",),
+        ).fetchone()
+        return row[0] if row else 0
+
+    def _set_position(self, source: str, position: int):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO index_state (name, position) VALUES (?, ?)",
+            (f"{self.TABLE}.{source}", position),
+        )
+
+    def sync(self, max_batches: Optional[int] = None, force: bool = False) -> bool:
+        """Index new source rows; returns True once every source is caught up"""
+        with self._lock:
+            if not force and time.monotonic() - self._last_sync < SEARCH_SYNC_INTERVAL:
+                return self._caught_up
+
+            caught_up = True
+            with self.db_service.get_session() as db:
+                for source in self.SOURCES:
+                    batches = 0
+                    while max_batches is None or batches < max_batches:
+                        after_id = self._position(source)
+                        rows, last_id = self.load_rows(
+                            db, source, after_id, SEARCH_SYNC_BATCH
+                        )
+                        if rows or last_id != after_id:
+                            with self._conn:
+                                self._conn.executemany(self._insert_sql(), rows)
+                                self._set_position(source, last_id)
+                        batches += 1
+                        if len(rows) < SEARCH_SYNC_BATCH:
+                            break
+                    else:
+                        caught_up = False
+
+            self._last_sync = time.monotonic()
+            self._caught_up = caught_up
+            return caught_up
+
+    def _insert_sql(self) -> str:
+        names = ("rowid",) + self.COLUMNS + self.UNINDEXED
+        placeholders = ", ".join("?" for _ in names)
+        return f"INSERT OR REPLACE INTO {self.TABLE} ({', '.join(names)}) VALUES ({placeholders})"
+
+    def remove(self, rowids: List[int]):
+        """Drop entries, e.g. after their source rows are deleted"""
+        if not rowids:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"DELETE FROM {self.TABLE} WHERE rowid = ?", [(r,) for r in rowids]
+            )
+
+    def rebuild(self):
+        """Empty the index so the next sync re-reads every source row"""
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {self.TABLE}")
+            self._conn.execute(
+                "DELETE FROM index_state WHERE name LIKE ?", (f"{self.TABLE}.%",)
+            )
+            self._last_sync = 0.0
+            self._caught_up = False
+
+    def load_rows(
+        self, db, source: str, after_id: int, limit: int
+    ) -> Tuple[List[tuple], int]:
+        """Up to `limit` source rows with id > after_id, in id order.
+
+        Returns the (rowid, *COLUMNS, *UNINDEXED) tuples and the last
+        source id read.
+        """
+        raise NotImplementedError
+
+    def match(
+        self, text: str, limit: int, where: str = "", params: tuple = ()
+    ) -> List[Dict]:
+        """Best-ranked entries for a query, unindexed columns only"""
+        weights = "".join(f", {w}" for w in self.WEIGHTS)
+        sql = (
+            f"SELECT {', '.join(self.UNINDEXED)} FROM {self.TABLE} "
+            f"WHERE {self.TABLE} MATCH ?{' AND ' + where if where else ''} "
+            f"ORDER BY bm25({self.TABLE}{weights}) LIMIT ?"
+        )
+        args = [build_match_query(text), *params, limit]
+
+        with self._lock:
+            try:
+                rows = self._conn.execute(sql, args).fetchall()
+            except sqlite3.OperationalError as e:
+                raise ValidationError(f"Invalid search query: {e}")
+        return [dict(zip(self.UNINDEXED, row)) for row in rows]
+
+    def query(
+        self,
+        text: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        order: str = "relevance",
+        where: str = "",
+        params: tuple = (),
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """Run a ranked MATCH query with keyset paging; returns (hits, next_cursor).
+
+        `order` is "relevance" (bm25, best first) or "newest" (the
+        `timestamp` column, newest first). Hits carry rowid, the
+        unindexed columns, the bm25 rank and a highlighted snippet.
+        """
+        match = build_match_query(text)
+        weights = "".join(f", {w}" for w in self.WEIGHTS)
+        rank = f"bm25({self.TABLE}{weights})"
+
+        if order == "relevance":
+            sort, direction = rank, "ASC"
+        elif order == "newest" and "timestamp" in self.UNINDEXED:
+            sort, direction = "timestamp", "DESC"
+        else:
+            raise ValidationError(f"Unsupported search order: {order}")
+
+        conditions = [f"{self.TABLE} MATCH ?"]
+        args = [match]
+        if where:
+            conditions.append(where)
+            args.extend(params)
+
+        if cursor:
+            sort_value, rowid = _parse_search_cursor(cursor)
+            op = ">" if direction == "ASC" else "<"
+            conditions.append(f"({sort} {op} ? OR ({sort} = ? AND rowid > ?))")
+            args.extend([sort_value, sort_value, rowid])
+
+        sql = (
+            f"SELECT rowid, {', '.join(self.UNINDEXED)}, {rank} AS rank, "
+            f"{sort} AS sort_value, "
+            f"snippet({self.TABLE}, {self.SNIPPET_COLUMN}, '**', '**', '…', 16) "
+            f"FROM {self.TABLE} WHERE {' AND '.join(conditions)} "
+            f"ORDER BY {sort} {direction}, rowid ASC LIMIT ?"
+        )
+        args.append(limit + 1)
+
+        with self._lock:
+            try:
+                rows = self._conn.execute(sql, args).fetchall()
+            except sqlite3.OperationalError as e:
+                raise ValidationError(f"Invalid search query: {e}")
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = f"{last[-2]!r}:{last[0]}"
+
+        hits = []
+        for row in rows:
+            hit = {"rowid": row[0], "rank": row[-3], "snippet": row[-1]}
+            hit.update(zip(self.UNINDEXED, row[1:-3]))
+            hits.append(hit)
+        return hits, next_cursor
+
+
+def _parse_search_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        sort_value, rowid = cursor.rsplit(":", 1)
+        return float(sort_value), int(rowid)
+    except (AttributeError, ValueError):
+        raise ValidationError(f"Invalid search cursor: {cursor!r}")
+
+
+class MessageSearchIndex(SearchIndex):
+    """Full-text index over group (`messages`) and direct (`ind_messages`) chats.
+
+    Rowids interleave both tables: even for group messages, odd for
+    direct messages. Edits to already indexed messages are picked up by
+    `rebuild()`; hits are re-read from MySQL, so results show current
+    content and drop rows that no longer exist.
+    """
+
+    TABLE = "messages_fts"
+    COLUMNS = ("content",)
+    UNINDEXED = ("kind", "message_id", "chat_id", "timestamp")
+    SOURCES = ("activity", "individual")
+
+    def load_rows(self, db, source: str, after_id: int, limit: int):
+        if source == "activity":
+            model, chat_column, parity = Message, Message.chat_id, 0
+        else:
+            model, chat_column, parity = IndMessage, IndMessage.ind_chat_id, 1
+
+        rows = (
+            db.query(model.id, model.content, chat_column, model.timestamp)
+            .filter(model.id > after_id)
+            .order_by(model.id.asc())
+            .limit(limit)
+            .all()
+        )
+        documents = [
+            (
+                message_id * 2 + parity,
+                content or "",
+                source,
+                message_id,
+                chat_id,
+                timestamp or 0,
+            )
+            for message_id, content, chat_id, timestamp in rows
+        ]
+        return documents, rows[-1][0] if rows else after_id
+
+
+# index_state entry holding the thread id paired with the thread_updates position
+UPDATES_TIE_BREAK = "thread_updates.id"
+
+
+class ForumSearchIndex(SearchIndex):
+    """Full-text index over community threads and replies.
+
+    Titles weigh ten times as much as bodies. Tokens are accent-folded
+    but not stemmed, since content mixes Dutch, English and French; use
+    `prefix*` terms for word variants. Thread edits are picked up through
+    `last_updated`; deletions made from the dashboard remove entries
+    directly and anything deleted elsewhere is dropped at enrichment.
+    """
+
+    TABLE = "forum_fts"
+    COLUMNS = ("title", "body")
+    UNINDEXED = ("kind", "item_id", "thread_id", "community_id", "timestamp")
+    WEIGHTS = (10.0, 1.0)
+    SNIPPET_COLUMN = -1
+    # thread_updates runs first so a fresh index starts tracking edits from now
+    SOURCES = ("thread_updates", "threads", "replies")
+
+    def load_rows(self, db, source: str, after_id: int, limit: int):
+        if source == "replies":
+            rows = (
+                db.query(
+                    CommunityThreadReply.id,
+                    CommunityThreadReply.body,
+                    CommunityThreadReply.thread_id,
+                    CommunityThread.community_id,
+                    CommunityThreadReply.created_at,
+                )
+                .outerjoin(
+                    CommunityThread,
+                    CommunityThread.id == CommunityThreadReply.thread_id,
+                )
+                .filter(CommunityThreadReply.id > after_id)
+                .order_by(CommunityThreadReply.id.asc())
+                .limit(limit)
+                .all()
+            )
+            documents = [
+                (
+                    reply_id * 2 + 1,
+                    "",
+                    body or "",
+                    "reply",
+                    reply_id,
+                    thread_id,
+                    community_id,
+                    _epoch(created_at),
+                )
+                for reply_id, body, thread_id, community_id, created_at in rows
+            ]
+            return documents, rows[-1][0] if rows else after_id
+
+        columns = (
+            CommunityThread.id,
+            CommunityThread.title,
+            CommunityThread.body,
+            CommunityThread.community_id,
+            CommunityThread.created_at,
+        )
+
+        if source == "threads":
+            rows = (
+                db.query(*columns)
+                .filter(CommunityThread.id > after_id)
+                .order_by(CommunityThread.id.asc())
+                .limit(limit)
+                .all()
+            )
+            position = rows[-1][0] if rows else after_id
+        else:
+            # Position is the newest last_updated (epoch seconds) already seen,
+            # with the last thread id read at that second as a tie-break, so
+            # threads sharing a second are neither skipped nor re-read forever
+            if not after_id:
+                latest = db.query(func.max(CommunityThread.last_updated)).scalar()
+                self._set_position(UPDATES_TIE_BREAK, 0)
+                return [], _epoch(latest)
+
+            # last_updated is stored to the second
+            since = _from_epoch(after_id)
+            next_second = since + timedelta(seconds=1)
+            last_id = self._position(UPDATES_TIE_BREAK)
+            rows = (
+                db.query(*columns, CommunityThread.last_updated)
+                .filter(
+                    or_(
+                        CommunityThread.last_updated >= next_second,
+                        and_(
+                            CommunityThread.last_updated >= since,
+                            CommunityThread.last_updated < next_second,
+                            CommunityThread.id > last_id,
+                        ),
+                    )
+                )
+                .order_by(CommunityThread.last_updated.asc(), CommunityThread.id.asc())
+                .limit(limit)
+                .all()
+            )
+            position = after_id
+            if rows:
+                position = _epoch(rows[-1][-1])
+                self._set_position(UPDATES_TIE_BREAK, rows[-1][0])
+            rows = [row[:-1] for row in rows]
+
+        documents = [
+            (
+                thread_id * 2,
+                title or "",
+                body or "",
+                "thread",
+                thread_id,
+                thread_id,
+                community_id,
+                _epoch(created_at),
+            )
+            for thread_id, title, body, community_id, created_at in rows
+        ]
+        return documents, position
+
+    def remove_thread(self, thread_id: int, reply_ids: List[int]):
+        self.remove([thread_id * 2] + [reply_id * 2 + 1 for reply_id in reply_ids])
+
+    def remove_reply(self, reply_id: int):
+        self.remove([reply_id * 2 + 1])
+
+
+def _epoch(value: Optional[datetime]) -> int:
+    return int(value.timestamp()) if value else 0
+
+
+def _from_epoch(value: int) -> datetime:
+    return datetime.fromtimestamp(value)
+
+
+_indexes: Dict[tuple, SearchIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_search_index(index_class, db_service, path: str = SEARCH_INDEX_PATH):
+    """Return the process-wide index of a class, opening it on first use"""
+    key = (index_class, path)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = index_class(db_service, path)
+            _indexes[key] = index
+        return index
+
+
+if __name__ == "__main__":
+    from services.database_service import DatabaseService
+
+    db_service = DatabaseService()
+    for index_class in (MessageSearchIndex, ForumSearchIndex):
+        index = get_search_index(index_class, db_service)
+        index.sync(force=True)
+        print(f"{index_class.__name__} up to date at {index.path}")
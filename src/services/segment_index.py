@@ -0,0 +1,280 @@
+"""In-memory columnar snapshot of user attributes for audience filters"""
+
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+import numpy as np
+from sqlalchemy import or_
+
+from core.models import User
+from utils.time_buckets import as_datetime
+
+SEGMENT_REFRESH_INTERVAL = int(os.getenv("SEGMENT_REFRESH_INTERVAL", "60"))
+# Full reloads also drop deleted users and catch changes without a last_active bump
+SEGMENT_REBUILD_INTERVAL = int(os.getenv("SEGMENT_REBUILD_INTERVAL", "21600"))
+SEGMENT_LOAD_CHUNK = 50000
+
+# Stands in for NULL timestamps; never matches a date filter
+NO_TIME = np.iinfo(np.int64).min
+
+_COLUMNS = (
+    User.id,
+    User.language,
+    User.reg_complete,
+    User.notif_token,
+    User.created_at,
+    User.last_active,
+    User.city,
+    User.is_ambassador,
+)
+
+
+def _epoch(value: Optional[datetime]) -> int:
+    return int(value.timestamp()) if value else NO_TIME
+
+
+def _city_key(city: Optional[str]) -> str:
+    return (city or "").strip().lower()
+
+
+class _Dictionary:
+    """Maps string values to small integer codes; 0 is NULL/empty"""
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {"": 0}
+
+    def encode(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.codes)
+            self.codes[value] = code
+        return code
+
+    def lookup(self, values) -> np.ndarray:
+        return np.array([self.codes[v] for v in values if v in self.codes], dtype=np.int32)
+
+
+class UserSegmentIndex:
+    """Columnar NumPy snapshot of the user attributes audiences are built from.
+
+    One array per attribute (language, reg_complete, has-token,
+    created_at, last_active, city, is_ambassador), aligned on a sorted
+    array of user ids. A filter combination resolves to boolean mask
+    intersections, so counts take well under a millisecond instead of a COUNT over
+    `users`. New users are appended by id and active users are re-read
+    by `last_active` on each refresh; a periodic full reload catches
+    everything else, including deletions.
+    """
+
+    def __init__(self, db_service):
+        self.db_service = db_service
+        self._lock = threading.RLock()
+        self._languages = _Dictionary()
+        self._cities = _Dictionary()
+        self._loaded_at = 0.0
+        self._refreshed_at = 0.0
+        self._max_id = 0
+        self._max_last_active = NO_TIME
+        self._set_arrays(self._empty_arrays())
+
+    def _empty_arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            "ids": np.empty(0, dtype=np.int64),
+            "language": np.empty(0, dtype=np.int32),
+            "reg_complete": np.empty(0, dtype=bool),
+            "has_token": np.empty(0, dtype=bool),
+            "created_at": np.empty(0, dtype=np.int64),
+            "last_active": np.empty(0, dtype=np.int64),
+            "city": np.empty(0, dtype=np.int32),
+            "is_ambassador": np.empty(0, dtype=bool),
+        }
+
+    def _set_arrays(self, arrays: Dict[str, np.ndarray]):
+        self._bitmaps: Dict[tuple, np.ndarray] = {}
+        self.ids = arrays["ids"]
+        self.language = arrays["language"]
+        self.reg_complete = arrays["reg_complete"]
+        self.has_token = arrays["has_token"]
+        self.created_at = arrays["created_at"]
+        self.last_active = arrays["last_active"]
+        self.city = arrays["city"]
+        self.is_ambassador = arrays["is_ambassador"]
+
+    def _encode(self, rows) -> Dict[str, np.ndarray]:
+        return {
+            "ids": np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows)),
+            "language": np.fromiter(
+                (self._languages.encode(r[1] or "") for r in rows), dtype=np.int32, count=len(rows)
+            ),
+            "reg_complete": np.fromiter((bool(r[2]) for r in rows), dtype=bool, count=len(rows)),
+            "has_token": np.fromiter((bool(r[3]) for r in rows), dtype=bool, count=len(rows)),
+            "created_at": np.fromiter((_epoch(r[4]) for r in rows), dtype=np.int64, count=len(rows)),
+            "last_active": np.fromiter((_epoch(r[5]) for r in rows), dtype=np.int64, count=len(rows)),
+            "city": np.fromiter(
+                (self._cities.encode(_city_key(r[6])) for r in rows), dtype=np.int32, count=len(rows)
+            ),
+            "is_ambassador": np.fromiter((bool(r[7]) for r in rows), dtype=bool, count=len(rows)),
+        }
+
+    def refresh(self, force: bool = False) -> bool:
+        """Bring the snapshot up to date; returns False if it was still fresh"""
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._refreshed_at < SEGMENT_REFRESH_INTERVAL:
+                return False
+
+            if not self._loaded_at or now - self._loaded_at >= SEGMENT_REBUILD_INTERVAL:
+                self._reload()
+                self._loaded_at = now
+            else:
+                self._apply_changes()
+
+            self._refreshed_at = now
+            return True
+
+    def _reload(self):
+        self._languages = _Dictionary()
+        self._cities = _Dictionary()
+        parts = []
+        last_id = 0
+
+        while True:
+            with self.db_service.get_session() as db:
+                rows = (
+                    db.query(*_COLUMNS)
+                    .filter(User.id > last_id)
+                    .order_by(User.id.asc())
+                    .limit(SEGMENT_LOAD_CHUNK)
+                    .execution_options(yield_per=5000)
+                    .all()
+                )
+            if rows:
+                parts.append(self._encode(rows))
+                last_id = rows[-1][0]
+            if len(rows) < SEGMENT_LOAD_CHUNK:
+                break
+
+        arrays = self._empty_arrays()
+        if parts:
+            arrays = {name: np.concatenate([p[name] for p in parts]) for name in arrays}
+        self._set_arrays(arrays)
+        self._update_watermarks()
+
+    def _apply_changes(self):
+        since = None
+        if self._max_last_active != NO_TIME:
+            since = datetime.fromtimestamp(self._max_last_active)
+
+        with self.db_service.get_session() as db:
+            condition = User.id > self._max_id
+            if since is not None:
+                condition = or_(condition, User.last_active >= since)
+            rows = db.query(*_COLUMNS).filter(condition).order_by(User.id.asc()).all()
+
+        if not rows:
+            return
+
+        changes = self._encode(rows)
+        positions = np.searchsorted(self.ids, changes["ids"])
+        known = positions < len(self.ids)
+        known[known] = self.ids[positions[known]] == changes["ids"][known]
+
+        arrays = {
+            "ids": self.ids,
+            "language": self.language,
+            "reg_complete": self.reg_complete,
+            "has_token": self.has_token,
+            "created_at": self.created_at,
+            "last_active": self.last_active,
+            "city": self.city,
+            "is_ambassador": self.is_ambassador,
+        }
+        for name, values in arrays.items():
+            values = values.copy()
+            values[positions[known]] = changes[name][known]
+            arrays[name] = np.concatenate([values, changes[name][~known]])
+
+        # New ids are larger than every known id, so the order holds
+        self._set_arrays(arrays)
+        self._update_watermarks()
+
+    def _update_watermarks(self):
+        self._max_id = int(self.ids[-1]) if len(self.ids) else 0
+        self._max_last_active = int(self.last_active.max()) if len(self.ids) else NO_TIME
+
+    def mask(self, filters: Dict, require_token: bool = True) -> np.ndarray:
+        """Boolean mask over `ids` for the NotificationService filter keys"""
+        with self._lock:
+            mask = np.ones(len(self.ids), dtype=bool)
+
+            if require_token:
+                mask &= self.has_token
+            if filters.get("language"):
+                mask &= self._any_of("language", self._languages.lookup(filters["language"]))
+            if filters.get("reg_complete"):
+                mask &= self.reg_complete
+            if filters.get("is_ambassador"):
+                mask &= self.is_ambassador
+            if filters.get("cities"):
+                codes = self._cities.lookup(_city_key(c) for c in filters["cities"])
+                mask &= self._any_of("city", codes)
+
+            if filters.get("min_user_id"):
+                mask[: np.searchsorted(self.ids, filters["min_user_id"])] = False
+            if filters.get("max_user_id"):
+                mask[np.searchsorted(self.ids, filters["max_user_id"], side="right"):] = False
+
+            for key, column, lower in (
+                ("created_after", self.created_at, True),
+                ("created_before", self.created_at, False),
+                ("active_since", self.last_active, True),
+                ("active_before", self.last_active, False),
+            ):
+                if filters.get(key):
+                    bound = _epoch(as_datetime(filters[key]))
+                    if lower:
+                        mask &= column >= bound
+                    else:
+                        mask &= (column < bound) & (column != NO_TIME)
+
+            return mask
+
+    def _any_of(self, column: str, codes: np.ndarray) -> np.ndarray:
+        """Union of the cached per-value bitmaps of a dictionary-encoded column"""
+        values = getattr(self, column)
+        result = np.zeros(len(values), dtype=bool)
+        for code in codes:
+            key = (column, int(code))
+            bitmap = self._bitmaps.get(key)
+            if bitmap is None:
+                bitmap = self._bitmaps[key] = values == code
+            result |= bitmap
+        return result
+
+    def count(self, filters: Dict, require_token: bool = True) -> int:
+        return int(np.count_nonzero(self.mask(filters, require_token)))
+
+    def ids_after(
+        self, filters: Dict, after_id: int, limit: int, require_token: bool = True
+    ) -> np.ndarray:
+        """Up to `limit` matching ids greater than after_id, ascending"""
+        with self._lock:
+            start = np.searchsorted(self.ids, after_id, side="right")
+            mask = self.mask(filters, require_token)[start:]
+            return self.ids[start:][mask][:limit]
+
+
+_index: Optional[UserSegmentIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_segment_index(db_service) -> UserSegmentIndex:
+    """Return the process-wide segment index, creating it on first use"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = UserSegmentIndex(db_service)
+        return _index
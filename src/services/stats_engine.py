@@ -0,0 +1,69 @@
+"""Stats panels computed with one conditional-aggregation statement per table"""
+
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import case, func
+
+from services.database_service import DatabaseService
+from utils.concurrency import fan_out
+
+STATS_TIMEOUT_SECONDS = 30
+
+
+class StatsEngine:
+    """Computes stats panels in one round trip per table.
+
+    A panel maps a model to `{metric_name: condition}`. A condition of
+    `None` counts every row; anything else becomes
+    `SUM(CASE WHEN condition THEN 1 ELSE 0 END)`. The per-table statements
+    run concurrently on pooled connections and the results are merged.
+
+    Callers that already fan out must not call `compute` from a fan-out
+    task, since both levels would wait on the same workers. They add
+    `tasks(panel)` to their own fan-out and `merge` the results instead.
+    """
+
+    def __init__(self, db_service: Optional[DatabaseService] = None):
+        self.db_service = db_service or DatabaseService()
+
+    def compute(self, panel: Dict[Any, Dict[str, Any]]) -> Dict[str, int]:
+        tasks = self.tasks(panel)
+        results, failures = fan_out(
+            tasks, timeout=STATS_TIMEOUT_SECONDS, fail_fast=True
+        )
+        if failures:
+            raise next(iter(failures.values()))
+
+        return self.merge(results, tasks)
+
+    def tasks(self, panel: Dict[Any, Dict[str, Any]]) -> Dict[str, Callable[[], Dict[str, int]]]:
+        """One fan-out task per table, named `stats.<table>`"""
+        return {
+            f"stats.{model.__tablename__}": partial(self._run_statement, model, metrics)
+            for model, metrics in panel.items()
+        }
+
+    @staticmethod
+    def merge(results: Dict[str, Any], tasks: Dict[str, Callable]) -> Dict[str, int]:
+        """Combine the results of `tasks` from a fan-out into one metrics dict"""
+        merged = {}
+        for name in tasks:
+            merged.update(results[name])
+        return merged
+
+    def _run_statement(self, model, metrics: Dict[str, Any]) -> Dict[str, int]:
+        columns = [
+            _aggregate(condition).label(name) for name, condition in metrics.items()
+        ]
+
+        with self.db_service.get_session() as db:
+            row = db.query(*columns).select_from(model).one()
+
+        return {name: int(row._mapping[name] or 0) for name in metrics}
+
+
+def _aggregate(condition):
+    if condition is None:
+        return func.count()
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
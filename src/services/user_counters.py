@@ -0,0 +1,321 @@
+"""Per-user content counters maintained from id watermarks"""
+
+import logging
+import os
+import threading
+import time
+import weakref
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, insert
+
+from core.models import (
+    Activity,
+    ActivityJoiner,
+    CommunityThread,
+    CommunityThreadReply,
+    IndMessage,
+    Message,
+    User,
+    UserContentCounter,
+    UserReport,
+    Watermark,
+)
+from core.schema import ensure_tables
+from services.database_service import DatabaseService
+from services.watermarks import get_watermark, set_watermark
+from utils.error_handler import ErrorHandler
+
+logger = logging.getLogger(__name__)
+
+COUNTER_REFRESH_INTERVAL = int(os.getenv("COUNTER_REFRESH_INTERVAL", "60"))
+# Full recounts correct deletes (threads, replies, users, dismissed reports)
+COUNTER_RECONCILE_INTERVAL = int(os.getenv("COUNTER_RECONCILE_INTERVAL", "86400"))
+# Users recounted per statement (and transaction) by a reconcile
+COUNTER_RECONCILE_CHUNK = 5000
+COUNTER_WRITE_CHUNK = 1000
+
+WATERMARK_PREFIX = "user_counters."
+RECONCILED = "user_counters.reconciled"
+
+# Counter -> (table with an increasing id, owning user column)
+TRACKED_SOURCES = {
+    "messages": (Message, Message.sender_id),
+    "direct_messages": (IndMessage, IndMessage.sender_id),
+    "reports_received": (UserReport, UserReport.reported_id),
+    "threads": (CommunityThread, CommunityThread.owner_id),
+    "replies": (CommunityThreadReply, CommunityThreadReply.owner_id),
+    "activities_hosted": (Activity, Activity.owner_id),
+}
+
+COUNTER_COLUMNS = (*TRACKED_SOURCES, "activities_joined")
+
+
+class UserCounterService:
+    """Per-user content counts so a profile reads one row by primary key.
+
+    Every tracked table has a watermark holding the highest id already
+    counted. A refresh groups only the rows above it by owner and adds
+    them to the owners' counter rows. A reconcile recounts everything up
+    to the same watermarks, a chunk of users at a time, which corrects
+    deletions and rows committed out of id order. It is also the only
+    thing that updates `activities_joined`, because `activity_joiners`
+    has no id to track. A refresh reconciles when none has finished yet
+    or the last one is older than `COUNTER_RECONCILE_INTERVAL`.
+
+    Refreshes run from `UserCounterWorker` or the command line, never on
+    the read path; until the first reconcile has finished the counters
+    are reported as unavailable. Watermark rows are read `FOR UPDATE` in
+    every refresh and reconcile chunk, so runs in different processes
+    never count a row twice.
+    """
+
+    _lock = threading.Lock()
+    _reconciled_engines = weakref.WeakSet()
+
+    def __init__(self, db_service: Optional[DatabaseService] = None):
+        self.db_service = db_service or DatabaseService()
+        ensure_tables(self.db_service.engine, [Watermark, UserContentCounter])
+
+    @ErrorHandler.handle_database_error
+    def refresh(self) -> bool:
+        """Count new rows, reconciling when one is due; returns True if it reconciled"""
+        with UserCounterService._lock:
+            reconciled_at = self._advance()
+            due = datetime.now() - timedelta(seconds=COUNTER_RECONCILE_INTERVAL)
+            if reconciled_at is not None and reconciled_at > due:
+                return False
+
+            self._reconcile()
+            return True
+
+    @ErrorHandler.handle_database_error
+    def reconcile(self) -> None:
+        """Recount every user's counters from scratch"""
+        with UserCounterService._lock:
+            self._advance()
+            self._reconcile()
+
+    @ErrorHandler.handle_database_error
+    def get_counters(self, user_id: int) -> Optional[Dict[str, int]]:
+        """The user's counters; None until the first reconcile has finished"""
+        if not self._is_reconciled():
+            return None
+
+        with self.db_service.get_session() as db:
+            row = (
+                db.query(UserContentCounter)
+                .filter(UserContentCounter.user_id == user_id)
+                .first()
+            )
+            return {c: (getattr(row, c) or 0) if row else 0 for c in COUNTER_COLUMNS}
+
+    def _is_reconciled(self) -> bool:
+        engine = self.db_service.engine
+        if engine in UserCounterService._reconciled_engines:
+            return True
+
+        with self.db_service.get_session() as db:
+            watermark = get_watermark(db, RECONCILED)
+            if watermark is None or watermark.marked_at is None:
+                return False
+
+        UserCounterService._reconciled_engines.add(engine)
+        return True
+
+    @ErrorHandler.handle_database_error
+    def get_status(self) -> Dict:
+        """Counter watermarks and when the last full reconcile finished"""
+        with self.db_service.get_session() as db:
+            watermarks = {
+                w.name: w
+                for w in db.query(Watermark).filter(Watermark.name.like(f"{WATERMARK_PREFIX}%"))
+            }
+            reconciled = watermarks.get(RECONCILED)
+            return {
+                "reconciled_at": reconciled.marked_at if reconciled else None,
+                "positions": {
+                    column: watermarks[WATERMARK_PREFIX + column].position
+                    for column in TRACKED_SOURCES
+                    if WATERMARK_PREFIX + column in watermarks
+                },
+            }
+
+    def _lock_watermarks(self, db) -> Dict[str, Watermark]:
+        names = [WATERMARK_PREFIX + column for column in TRACKED_SOURCES] + [RECONCILED]
+        rows = {
+            w.name: w
+            for w in db.query(Watermark).filter(Watermark.name.in_(names)).with_for_update()
+        }
+        return {name: rows.get(name) or set_watermark(db, name) for name in names}
+
+    def _advance(self) -> Optional[datetime]:
+        """Apply rows above the watermarks; returns when the last reconcile finished"""
+        with self.db_service.get_session() as db:
+            watermarks = self._lock_watermarks(db)
+            reconciled_at = watermarks[RECONCILED].marked_at
+
+            if reconciled_at is None:
+                # Start from the current ids; the reconcile counts everything below them
+                for column, (model, _) in TRACKED_SOURCES.items():
+                    watermark = watermarks[WATERMARK_PREFIX + column]
+                    if watermark.position is None:
+                        watermark.position = db.query(func.coalesce(func.max(model.id), 0)).scalar()
+            else:
+                self._apply_new_rows(db, watermarks)
+
+            db.commit()
+            return reconciled_at
+
+    def _apply_new_rows(self, db, watermarks: Dict[str, Watermark]) -> None:
+        deltas: Dict[int, Dict[str, int]] = {}
+
+        for column, (model, owner) in TRACKED_SOURCES.items():
+            watermark = watermarks[WATERMARK_PREFIX + column]
+            rows = (
+                db.query(owner, func.count(), func.max(model.id))
+                .filter(model.id > watermark.position)
+                .group_by(owner)
+                .all()
+            )
+            for user_id, count, max_id in rows:
+                watermark.position = max(watermark.position, max_id)
+                if user_id is not None:
+                    deltas.setdefault(user_id, {})[column] = count
+
+        now = datetime.now()
+        user_ids = sorted(deltas)
+        for start in range(0, len(user_ids), COUNTER_WRITE_CHUNK):
+            chunk = user_ids[start:start + COUNTER_WRITE_CHUNK]
+            existing = {
+                row.user_id: row
+                for row in db.query(UserContentCounter).filter(UserContentCounter.user_id.in_(chunk))
+            }
+
+            for user_id in chunk:
+                row = existing.get(user_id)
+                if row is None:
+                    row = UserContentCounter(user_id=user_id, **{c: 0 for c in COUNTER_COLUMNS})
+                    db.add(row)
+
+                for column, count in deltas[user_id].items():
+                    setattr(row, column, (getattr(row, column) or 0) + count)
+                row.updated_at = now
+
+    def _reconcile(self) -> None:
+        last_id = 0
+        while True:
+            with self.db_service.get_session() as db:
+                user_ids = [
+                    user_id
+                    for (user_id,) in db.query(User.id)
+                    .filter(User.id > last_id)
+                    .order_by(User.id.asc())
+                    .limit(COUNTER_RECONCILE_CHUNK)
+                ]
+                # The last chunk is open-ended so counters of deleted users are dropped
+                upper = user_ids[-1] if len(user_ids) == COUNTER_RECONCILE_CHUNK else None
+
+                watermarks = self._lock_watermarks(db)
+                self._recount(db, watermarks, user_ids, last_id, upper)
+                db.commit()
+
+            if upper is None:
+                break
+            last_id = upper
+
+        with self.db_service.get_session() as db:
+            set_watermark(db, RECONCILED, marked_at=datetime.now())
+            db.commit()
+
+    def _recount(
+        self, db, watermarks: Dict[str, Watermark], user_ids: List[int], lower: int, upper: Optional[int]
+    ) -> None:
+        """Replace the counters in (lower, upper] with fresh counts for user_ids"""
+
+        def in_range(column):
+            condition = column > lower
+            return condition if upper is None else condition & (column <= upper)
+
+        counts: Dict[int, Dict[str, int]] = {}
+        for column, (model, owner) in TRACKED_SOURCES.items():
+            rows = (
+                db.query(owner, func.count())
+                .filter(in_range(owner), model.id <= watermarks[WATERMARK_PREFIX + column].position)
+                .group_by(owner)
+            )
+            for user_id, count in rows:
+                counts.setdefault(user_id, {})[column] = count
+
+        joined = (
+            db.query(ActivityJoiner.user_id, func.count())
+            .filter(in_range(ActivityJoiner.user_id))
+            .group_by(ActivityJoiner.user_id)
+        )
+        for user_id, count in joined:
+            counts.setdefault(user_id, {})["activities_joined"] = count
+
+        db.query(UserContentCounter).filter(in_range(UserContentCounter.user_id)).delete(
+            synchronize_session=False
+        )
+
+        now = datetime.now()
+        rows: List[Dict] = [
+            {"user_id": user_id, **{c: counts[user_id].get(c, 0) for c in COUNTER_COLUMNS}, "updated_at": now}
+            for user_id in user_ids
+            if user_id in counts
+        ]
+        for start in range(0, len(rows), COUNTER_WRITE_CHUNK):
+            db.execute(insert(UserContentCounter), rows[start:start + COUNTER_WRITE_CHUNK])
+
+
+class UserCounterWorker:
+    """Refreshes the counters from a daemon thread every COUNTER_REFRESH_INTERVAL"""
+
+    def __init__(self, service: UserCounterService):
+        self.service = service
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start the worker thread unless it is already running"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="user-counters", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.service.refresh()
+            except Exception:
+                logger.exception("User counter refresh failed")
+            time.sleep(COUNTER_REFRESH_INTERVAL)
+
+
+_worker: Optional[UserCounterWorker] = None
+_worker_lock = threading.Lock()
+
+
+def get_counter_worker(db_service) -> UserCounterWorker:
+    """Return the process-wide counter worker, starting it on first use"""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = UserCounterWorker(UserCounterService(db_service))
+        _worker.start()
+        return _worker
+
+
+if __name__ == "__main__":
+    import sys
+
+    service = UserCounterService()
+    if "--refresh" in sys.argv:
+        service.refresh()
+    else:
+        service.reconcile()
+    print(service.get_status())
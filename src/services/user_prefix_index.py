@@ -0,0 +1,382 @@
+"""In-memory prefix index over user names, emails and phones for typeahead"""
+
+import bisect
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import or_
+
+from core.models import User
+
+logger = logging.getLogger(__name__)
+
+TYPEAHEAD_REFRESH_INTERVAL = int(os.getenv("TYPEAHEAD_REFRESH_INTERVAL", "60"))
+# Full reloads also drop deleted users and catch edits without a last_active bump
+TYPEAHEAD_REBUILD_INTERVAL = int(os.getenv("TYPEAHEAD_REBUILD_INTERVAL", "21600"))
+TYPEAHEAD_LOAD_CHUNK = 50000
+TYPEAHEAD_LIMIT = 10
+# Entries examined per prefix of three or more characters
+TYPEAHEAD_SCAN_LIMIT = 2000
+# Prefixes up to this length keep their own candidates in ranking order,
+# capped at TYPEAHEAD_SCAN_LIMIT, instead of scanning alphabetically
+TYPEAHEAD_SHORT_PREFIX = 2
+# Refreshes touching more users than this reload instead of patching
+TYPEAHEAD_MAX_PATCH = 5000
+
+# Also the ranking order when keys match equally well
+NAME, EMAIL, PHONE = 0, 1, 2
+FIELD_NAMES = ("name", "email", "phone")
+
+# Only these queries are also matched against phone digits
+_PHONE_QUERY = re.compile(r"^[\d\s+()\-]*\d[\d\s+()\-]*$")
+
+_COLUMNS = (User.id, User.name, User.email, User.phone, User.last_active)
+
+
+def fold(text: Optional[str]) -> str:
+    """Accent-free, case-folded, single-spaced form of keys and queries"""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.casefold().split())
+
+
+def phone_digits(phone: Optional[str]) -> str:
+    return "".join(c for c in phone or "" if c.isdigit())
+
+
+def user_keys(name: Optional[str], email: Optional[str], phone: Optional[str]) -> List[Tuple[str, int]]:
+    """(key, field) pairs a user is found by.
+
+    Every word of the name starts a key, so "jans" finds "Anna Jansen";
+    emails are matched from the start and phones on their digits only.
+    """
+    keys = {}
+    words = fold(name).split(" ")
+    for i, word in enumerate(words):
+        if word:
+            keys.setdefault(" ".join(words[i:]), NAME)
+
+    email_key = fold(email).replace(" ", "")
+    if email_key:
+        keys.setdefault(email_key, EMAIL)
+
+    digits = phone_digits(phone)
+    if digits:
+        keys.setdefault(digits, PHONE)
+
+    return list(keys.items())
+
+
+def _epoch(value: Optional[datetime]) -> int:
+    return int(value.timestamp()) if value else 0
+
+
+def short_prefixes(key: str) -> set:
+    return {key[:length] for length in range(1, TYPEAHEAD_SHORT_PREFIX + 1)}
+
+
+def _candidates(users: Dict[int, Tuple]) -> Dict[str, List[Tuple[int, int, int]]]:
+    """Short prefix -> (field, -last_active, user id), best matches first"""
+    candidates: Dict[str, List[Tuple[int, int, int]]] = {}
+    for user_id, record in users.items():
+        for key, field in record[4]:
+            for prefix in short_prefixes(key):
+                candidates.setdefault(prefix, []).append((field, -record[3], user_id))
+
+    for prefix, entries in candidates.items():
+        entries.sort()
+        del entries[TYPEAHEAD_SCAN_LIMIT:]
+    return candidates
+
+
+def _columns(entries: List[Tuple[str, int, int]]) -> Tuple[List[str], array, bytearray]:
+    """Sorted keys with the user id and field of each in parallel arrays"""
+    entries.sort()
+    keys = [key for key, _, _ in entries]
+    ids = array("q", (user_id for _, user_id, _ in entries))
+    fields = bytearray(field for _, _, field in entries)
+    return keys, ids, fields
+
+
+class UserPrefixIndex:
+    """Sorted key array over folded names, emails and phones, searched with bisect.
+
+    `_keys` is a sorted list with the user id and matched field of each
+    entry in parallel arrays, so a prefix is one binary search plus a
+    short forward scan. That scan stops after `TYPEAHEAD_SCAN_LIMIT`
+    keys, which would rank only alphabetically early users for a one- or
+    two-letter prefix. So `_candidates` keeps, per short prefix, the best
+    `TYPEAHEAD_SCAN_LIMIT` non-exact matches already in ranking order
+    (field, then most recently active). Longer prefixes that match more
+    keys than the scan limit are still ranked among the first ones only.
+
+    New users are added by id and users active since the last refresh are
+    re-keyed in place; a periodic full reload picks up everything else,
+    including deletions.
+
+    Refreshes run from `UserPrefixIndexWorker`, never on the search path.
+    They read the database without holding `_lock`: a reload builds the
+    new arrays aside and swaps them in, and an incremental refresh only
+    takes the lock to patch the rows it read. Searches therefore always
+    answer from the last built snapshot, and find nothing before the
+    first load has finished.
+    """
+
+    def __init__(self, db_service):
+        self.db_service = db_service
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._loaded_at = 0.0
+        self._refreshed_at = 0.0
+        self._max_id = 0
+        self._max_last_active = 0
+        self._keys, self._ids, self._fields = _columns([])
+        self._candidates: Dict[str, List[Tuple[int, int, int]]] = {}
+        self._users: Dict[int, Tuple] = {}
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded_at > 0
+
+    def refresh(self, force: bool = False) -> bool:
+        """Bring the index up to date; returns False if it was still fresh"""
+        with self._refresh_lock:
+            now = time.monotonic()
+            if not force and now - self._refreshed_at < TYPEAHEAD_REFRESH_INTERVAL:
+                return False
+
+            if not self._loaded_at or now - self._loaded_at >= TYPEAHEAD_REBUILD_INTERVAL:
+                self._reload()
+                self._loaded_at = now
+            elif not self._apply_changes():
+                self._reload()
+                self._loaded_at = now
+
+            self._refreshed_at = now
+            return True
+
+    def _reload(self):
+        users, entries = self._load()
+        columns = _columns(entries)
+        candidates = _candidates(users)
+        with self._lock:
+            self._keys, self._ids, self._fields = columns
+            self._candidates = candidates
+            self._users = users
+        self._update_watermarks()
+
+    def _load(self) -> Tuple[Dict[int, Tuple], List[Tuple[str, int, int]]]:
+        users, entries = {}, []
+        last_id = 0
+
+        while True:
+            with self.db_service.get_session() as db:
+                rows = (
+                    db.query(*_COLUMNS)
+                    .filter(User.id > last_id)
+                    .order_by(User.id.asc())
+                    .limit(TYPEAHEAD_LOAD_CHUNK)
+                    .all()
+                )
+            for row in rows:
+                users[row.id] = self._record(row)
+                entries.extend((key, row.id, field) for key, field in users[row.id][4])
+            if rows:
+                last_id = rows[-1].id
+            if len(rows) < TYPEAHEAD_LOAD_CHUNK:
+                break
+
+        return users, entries
+
+    def _apply_changes(self) -> bool:
+        """Re-key new and recently active users; False if a reload is cheaper"""
+        with self.db_service.get_session() as db:
+            condition = User.id > self._max_id
+            if self._max_last_active:
+                since = datetime.fromtimestamp(self._max_last_active)
+                condition = or_(condition, User.last_active >= since)
+            rows = (
+                db.query(*_COLUMNS)
+                .filter(condition)
+                .order_by(User.id.asc())
+                .limit(TYPEAHEAD_MAX_PATCH + 1)
+                .all()
+            )
+
+        if len(rows) > TYPEAHEAD_MAX_PATCH:
+            return False
+
+        with self._lock:
+            self._patch(rows)
+        return True
+
+    def _patch(self, rows):
+        for row in rows:
+            old = self._users.get(row.id)
+            record = self._users[row.id] = self._record(row)
+            self._max_id = max(self._max_id, row.id)
+            self._max_last_active = max(self._max_last_active, record[3])
+
+            # A last_active bump moves the user up the short prefix candidates
+            for key, field in old[4] if old else ():
+                for prefix in short_prefixes(key):
+                    self._remove_candidate(prefix, (field, -old[3], row.id))
+            for key, field in record[4]:
+                for prefix in short_prefixes(key):
+                    self._insert_candidate(prefix, (field, -record[3], row.id))
+
+            # Usually only last_active moved; the keys stay where they are
+            if old is not None and old[4] == record[4]:
+                continue
+            for key, _ in old[4] if old else ():
+                self._remove(key, row.id)
+            for key, field in record[4]:
+                self._insert(key, row.id, field)
+
+    def _record(self, row) -> Tuple:
+        """(name, email, phone, last_active epoch, keys) kept per user"""
+        keys = tuple(user_keys(row.name, row.email, row.phone))
+        return row.name, row.email, row.phone, _epoch(row.last_active), keys
+
+    def _insert(self, key: str, user_id: int, field: int):
+        position = bisect.bisect_right(self._keys, key)
+        self._keys.insert(position, key)
+        self._ids.insert(position, user_id)
+        self._fields.insert(position, field)
+
+    def _remove(self, key: str, user_id: int):
+        position = bisect.bisect_left(self._keys, key)
+        while position < len(self._keys) and self._keys[position] == key:
+            if self._ids[position] == user_id:
+                del self._keys[position]
+                del self._ids[position]
+                del self._fields[position]
+                return
+            position += 1
+
+    def _insert_candidate(self, prefix: str, entry: Tuple[int, int, int]):
+        entries = self._candidates.setdefault(prefix, [])
+        bisect.insort(entries, entry)
+        del entries[TYPEAHEAD_SCAN_LIMIT:]
+
+    def _remove_candidate(self, prefix: str, entry: Tuple[int, int, int]):
+        # A user dropped from a full list leaves a gap until the next reload
+        entries = self._candidates.get(prefix, [])
+        position = bisect.bisect_left(entries, entry)
+        if position < len(entries) and entries[position] == entry:
+            del entries[position]
+
+    def _update_watermarks(self):
+        self._max_id = max(self._users, default=0)
+        self._max_last_active = max((record[3] for record in self._users.values()), default=0)
+
+    def search(self, text: str, limit: int = TYPEAHEAD_LIMIT) -> List[Dict]:
+        """Best `limit` users whose name words, email or phone start with text.
+
+        Exact key matches rank first, then name over email over phone
+        matches, then the most recently active users. Phone-like queries
+        (digits, spaces and `+()-`) also match phones on their digits, and
+        a numeric query also matches the user with that id.
+        """
+        query = fold(text)
+        if not query:
+            return []
+
+        prefixes = {query}
+        if _PHONE_QUERY.match(text.strip()):
+            prefixes.add(phone_digits(text))
+
+        with self._lock:
+            ranks: Dict[int, Tuple[int, int]] = {}
+
+            def consider(user_id: int, rank: Tuple[int, int]):
+                if rank < ranks.get(user_id, (2, 0)):
+                    ranks[user_id] = rank
+
+            for prefix in prefixes:
+                start = bisect.bisect_left(self._keys, prefix)
+                end = min(start + TYPEAHEAD_SCAN_LIMIT, len(self._keys))
+                short = len(prefix) <= TYPEAHEAD_SHORT_PREFIX
+                for position in range(start, end):
+                    key = self._keys[position]
+                    # Exact keys sort first; short prefixes take the rest from their candidates
+                    if not key.startswith(prefix) or (short and key != prefix):
+                        break
+                    consider(self._ids[position], (0 if key == prefix else 1, self._fields[position]))
+
+                if short:
+                    taken = set()
+                    for field, _, user_id in self._candidates.get(prefix, ()):
+                        if len(taken) >= limit:
+                            break
+                        consider(user_id, (1, field))
+                        if ranks[user_id][0] == 1:
+                            taken.add(user_id)
+
+            if query.isdigit() and int(query) in self._users:
+                ranks[int(query)] = (-1, 0)
+
+            best = sorted(ranks, key=lambda user_id: (ranks[user_id], -self._users[user_id][3], user_id))
+            return [self._match(user_id, ranks[user_id]) for user_id in best[:limit]]
+
+    def _match(self, user_id: int, rank: Tuple[int, int]) -> Dict:
+        name, email, phone, _, _ = self._users[user_id]
+        return {
+            "id": user_id,
+            "name": name or f"User {user_id}",
+            "email": email,
+            "phone": phone,
+            "matched": "id" if rank[0] < 0 else FIELD_NAMES[rank[1]],
+        }
+
+
+class UserPrefixIndexWorker:
+    """Refreshes the index from a daemon thread every TYPEAHEAD_REFRESH_INTERVAL"""
+
+    def __init__(self, index: UserPrefixIndex):
+        self.index = index
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start the worker thread unless it is already running"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="user-prefix-index", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.index.refresh()
+            except Exception:
+                logger.exception("User typeahead index refresh failed")
+            time.sleep(TYPEAHEAD_REFRESH_INTERVAL)
+
+
+_index: Optional[UserPrefixIndex] = None
+_worker: Optional[UserPrefixIndexWorker] = None
+_index_lock = threading.Lock()
+
+
+def get_user_prefix_index(db_service) -> UserPrefixIndex:
+    """Return the process-wide typeahead index, starting its refresh worker on first use"""
+    global _index, _worker
+    with _index_lock:
+        if _index is None:
+            _index = UserPrefixIndex(db_service)
+            _worker = UserPrefixIndexWorker(_index)
+        _worker.start()
+        return _index
@@ -1,23 +1,50 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Optional
+from functools import partial
+from typing import Callable, Dict, List, Optional
 
-from sqlalchemy import desc
+from sqlalchemy import and_, case, desc, func, or_, select, union
 
 from core.models import Activity, ActivityJoiner, IndMessage, Message, User, UserReport
 from core.security import AuditLogger
 from services.database_service import DatabaseService
+from services.user_counters import UserCounterService, get_counter_worker
+from services.user_prefix_index import TYPEAHEAD_LIMIT, get_user_prefix_index
+from utils.concurrency import fan_out
 from utils.error_handler import ErrorHandler
 from utils.exceptions import DatabaseError, UserNotFoundError, ValidationError
 
+logger = logging.getLogger(__name__)
+
 # Constants
 MAX_RECENT_MESSAGES = 10
+MAX_ACTIVITY_MESSAGES = 5
+ACTIVITY_PAGE_SIZE = 50
+# Activity dates are stored to the second
+ACTIVITY_CURSOR_DATE_FORMAT = '%Y%m%d%H%M%S'
 MESSAGE_CONTENT_PREVIEW_LENGTH = 10000
 VALID_SEARCH_TYPES = ["user_id", "username"]
+MAX_TYPEAHEAD_QUERY_LENGTH = 100
+# Profile sub-queries still running after this are left out of the profile
+PROFILE_DEADLINE_SECONDS = float(os.getenv("PROFILE_DEADLINE_SECONDS", "3"))
+# Profiles get their own pool, so they never queue behind other fan-outs
+# and abandoned profile queries cannot starve anything but profiles
+PROFILE_WORKERS = int(os.getenv("PROFILE_WORKERS", "6"))
+
+_profile_executor = ThreadPoolExecutor(
+    max_workers=PROFILE_WORKERS, thread_name_prefix="profile"
+)
 
 
 class UserService:
     def __init__(self):
         self.db_service = DatabaseService()
+        self.counters = UserCounterService(self.db_service)
+        get_counter_worker(self.db_service)
+        # Starts loading the typeahead index in the background
+        get_user_prefix_index(self.db_service)
 
     def get_user(self, search_type: str, search_value: str) -> Optional[Dict]:
         self._validate_search_params(search_type, search_value)
@@ -33,14 +60,25 @@ class UserService:
                     f"No user found with {search_type.replace('_', ' ')}: '{search_value}'"
                 )
 
-            report_count = self._get_report_count(db, user.id)
-            total_messages = self._get_total_message_count(db, user.id)
-            recent_messages = self._get_recent_messages(db, user.id)
+        return self._load_profile(user)
 
-            return self._build_user_dict(
-                user, report_count, total_messages, recent_messages
+    @ErrorHandler.handle_database_error
+    def search_users(self, text: str, limit: int = TYPEAHEAD_LIMIT) -> List[Dict]:
+        """Typeahead matches on name, email or phone prefixes, served from memory.
+
+        Reads the index's last built snapshot; its worker keeps it fresh.
+        """
+        if len(text or "") > MAX_TYPEAHEAD_QUERY_LENGTH:
+            raise ValidationError(
+                f"Search text must be at most {MAX_TYPEAHEAD_QUERY_LENGTH} characters"
             )
 
+        return get_user_prefix_index(self.db_service).search(text, limit)
+
+    def is_typeahead_loaded(self) -> bool:
+        """Whether the typeahead index has finished its first load"""
+        return get_user_prefix_index(self.db_service).is_loaded
+
     @ErrorHandler.handle_database_error
     def get_user_from_report(self, reported_user_id):
         if not reported_user_id:
@@ -58,109 +96,249 @@ class UserService:
             if not user:
                 raise UserNotFoundError(str(user_id))
 
-            report_count = self._get_report_count(db, user.id)
-            total_messages = self._get_total_message_count(db, user.id)
-            recent_messages = self._get_recent_messages(db, user.id)
+        return self._load_profile(user)
+
+    def _load_profile(self, user) -> Dict:
+        """Profile counters and recent messages, loaded concurrently.
+
+        Counts come from the user's row in the maintained content counters
+        (see `UserCounterService`), which are never refreshed here. Until
+        their first reconcile has finished, the message and report counts
+        are instead counted live, as before the counters existed. That
+        read and the two recent-message queries run on their own pooled
+        connections, on a profile-only pool, through `fan_out`. Whatever has
+        not finished (or failed) by `PROFILE_DEADLINE_SECONDS` is left out:
+        its fields are None and its name is listed in the profile's
+        `incomplete`.
+
+        A query left out at the deadline is not cancelled. It keeps its
+        worker and connection until the database returns, so a slow
+        database can fill the profile pool and later profiles come back
+        incomplete until it drains.
+        """
+        results, failures = fan_out(
+            {
+                "counters": partial(self._get_counts, user.id),
+                "recent_ind_messages": partial(self._read, self._get_recent_ind_messages, user.id),
+                "recent_messages": partial(self._read, self._get_recent_chat_messages, user.id),
+            },
+            timeout=PROFILE_DEADLINE_SECONDS,
+            executor=_profile_executor,
+        )
+        for name, error in failures.items():
+            logger.warning(f"Profile {name} for user {user.id} unavailable: {error}")
 
-            return self._build_user_dict(
-                user, report_count, total_messages, recent_messages
-            )
+        recent_messages = self._merge_recent_messages(
+            results.get("recent_ind_messages", []), results.get("recent_messages", [])
+        )
+
+        profile = self._build_user_dict(user, results.get("counters"), recent_messages)
+        profile["incomplete"] = sorted(failures)
+        return profile
+
+    def _get_counts(self, user_id: int) -> Dict:
+        """Message and report counts, live until the counters are reconciled"""
+        counters = self.counters.get_counters(user_id)
+        if counters is not None:
+            return {
+                "message_count": counters["messages"] + counters["direct_messages"],
+                "report_count": counters["reports_received"],
+                "counters": counters,
+            }
 
-    def get_user_activities(self, user_id: int) -> List[Dict]:
         with self.db_service.get_session() as db:
-            joined_activities = (
-                db.query(ActivityJoiner, Activity)
-                .join(Activity, ActivityJoiner.activity_id == Activity.id)
-                .filter(ActivityJoiner.user_id == user_id)
-                .order_by(desc(Activity.date))
-                .all()
-            )
+            return {
+                "message_count": self._get_total_message_count(db, user_id),
+                "report_count": self._get_report_count(db, user_id),
+                "counters": None,
+            }
 
-            hosted_activities = (
-                db.query(Activity)
-                .filter(Activity.owner_id == user_id)
-                .order_by(desc(Activity.date))
-                .all()
-            )
+    def _get_report_count(self, db, user_id: int) -> int:
+        return (
+            db.query(func.count(UserReport.id))
+            .filter(UserReport.reported_id == user_id)
+            .scalar()
+        )
 
-            activities = []
-
-            for joiner, activity in joined_activities:
-                activities.append({
-                    'activity_id': activity.id,
-                    'name': activity.name,
-                    'description': activity.description,
-                    'date': activity.date.strftime('%Y-%m-%d %H:%M') if activity.date else 'Unknown',
-                    'city': activity.city,
-                    'status': 'Joined',
-                    'is_full': activity.is_full,
-                    'is_owner': False,
-                    'date_raw': activity.date
-                })
-
-            for activity in hosted_activities:
-                if not any(a['activity_id'] == activity.id for a in activities):
-                    activities.append({
-                        'activity_id': activity.id,
-                        'name': activity.name,
-                        'description': activity.description,
-                        'date': activity.date.strftime('%Y-%m-%d %H:%M') if activity.date else 'Unknown',
-                        'city': activity.city,
-                        'status': 'Host',
-                        'is_full': activity.is_full,
-                        'is_owner': True,
-                        'date_raw': activity.date
-                    })
-
-            activities.sort(key=lambda x: x['date_raw'] if x['date_raw'] else datetime.min, reverse=True)
-
-            for activity in activities:
-                del activity['date_raw']
-
-            return activities
+    def _get_total_message_count(self, db, user_id: int) -> int:
+        ind_count = (
+            db.query(func.count(IndMessage.id)).filter(IndMessage.sender_id == user_id).scalar()
+        )
+        reg_count = (
+            db.query(func.count(Message.id)).filter(Message.sender_id == user_id).scalar()
+        )
+        return ind_count + reg_count
 
-    def get_user_activity_messages(self, user_id: int) -> Dict[int, List[Dict]]:
+    def _read(self, query: Callable, user_id: int):
         with self.db_service.get_session() as db:
-            joiners = (
-                db.query(ActivityJoiner)
-                .filter(ActivityJoiner.user_id == user_id)
-                .all()
-            )
+            return query(db, user_id)
 
-            hosted = (
-                db.query(Activity)
-                .filter(Activity.owner_id == user_id)
-                .all()
-            )
+    def get_user_activities(self, user_id: int) -> List[Dict]:
+        """Every activity the user joined or hosted, newest first"""
+        activities, cursor = [], None
+        while True:
+            page = self.get_user_activity_page(user_id, cursor=cursor)
+            activities += page['activities']
+            if not page['has_more']:
+                return activities
+            cursor = page['next_cursor']
+
+    def get_user_activity_page(
+        self, user_id: int, limit: int = ACTIVITY_PAGE_SIZE, cursor: Optional[str] = None
+    ) -> Dict:
+        """One page of the user's joined and hosted activities.
+
+        The activity ids are merged with a `UNION`, so an activity the user
+        both hosts and joined appears once, as hosted. Ordering (newest
+        first, undated last) and keyset paging on `(date, id)` run in SQL;
+        pass `next_cursor` back to get the following page. The first page
+        also carries the user's activity count (`COUNT(*) OVER ()`) as
+        `total`; later pages return None there.
+        """
+        if limit < 1:
+            raise ValidationError("Limit must be at least 1")
+
+        activity_ids = union(
+            select(ActivityJoiner.activity_id).where(ActivityJoiner.user_id == user_id),
+            select(Activity.id).where(Activity.owner_id == user_id),
+        )
+        undated = case((Activity.date.is_(None), 1), else_=0)
+
+        query = select(
+            Activity.id,
+            Activity.name,
+            Activity.description,
+            Activity.date,
+            Activity.city,
+            Activity.location,
+            Activity.place,
+            Activity.participants_min,
+            Activity.participants_max,
+            Activity.min_age,
+            Activity.max_age,
+            Activity.question1,
+            Activity.question2,
+            Activity.question3,
+            Activity.is_full,
+            (Activity.owner_id == user_id).label('is_owner'),
+        ).where(Activity.id.in_(activity_ids))
+
+        if cursor:
+            is_undated, date_key, activity_id = _parse_activity_cursor(cursor)
+            if is_undated:
+                query = query.where(Activity.date.is_(None), Activity.id < activity_id)
+            else:
+                date = datetime.strptime(str(date_key), ACTIVITY_CURSOR_DATE_FORMAT)
+                query = query.where(
+                    or_(
+                        Activity.date < date,
+                        and_(Activity.date == date, Activity.id < activity_id),
+                        Activity.date.is_(None),
+                    )
+                )
+        else:
+            # The window counts before LIMIT, so the first page knows the total
+            query = query.add_columns(func.count().over().label('total'))
 
-            activity_ids = [j.activity_id for j in joiners] + [h.id for h in hosted]
-            activity_ids = list(set(activity_ids))
+        query = query.order_by(undated.asc(), Activity.date.desc(), Activity.id.desc())
 
-            activity_messages = {}
-            for activity_id in activity_ids:
-                messages = (
-                    db.query(Message)
-                    .filter(
-                        Message.chat_id == activity_id,
-                        Message.sender_id == user_id
-                    )
-                    .order_by(desc(Message.timestamp))
-                    .limit(5)
-                    .all()
+        with self.db_service.get_session() as db:
+            rows = db.execute(query.limit(limit + 1)).all()
+
+        total = None
+        if not cursor:
+            total = int(rows[0].total) if rows else 0
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        next_cursor = None
+        if has_more:
+            last = rows[-1]
+            if last.date is None:
+                next_cursor = f"1:0:{last.id}"
+            else:
+                next_cursor = f"0:{last.date.strftime(ACTIVITY_CURSOR_DATE_FORMAT)}:{last.id}"
+
+        return {
+            'activities': [self._build_activity_dict(row) for row in rows],
+            'next_cursor': next_cursor,
+            'has_more': has_more,
+            'total': total,
+        }
+
+    def _build_activity_dict(self, row) -> Dict:
+        is_owner = bool(row.is_owner)
+        return {
+            'activity_id': row.id,
+            'name': row.name,
+            'description': row.description,
+            'date': row.date.strftime('%Y-%m-%d %H:%M') if row.date else 'Unknown',
+            'city': row.city,
+            'location': row.location,
+            'place': row.place,
+            'participants_min': row.participants_min,
+            'participants_max': row.participants_max,
+            'min_age': row.min_age,
+            'max_age': row.max_age,
+            'question1': row.question1,
+            'question2': row.question2,
+            'question3': row.question3,
+            'status': 'Host' if is_owner else 'Joined',
+            'is_full': row.is_full,
+            'is_owner': is_owner,
+        }
+
+    def get_user_activity_messages(self, user_id: int) -> Dict[int, List[Dict]]:
+        """Last messages the user sent in each activity they joined or hosted.
+
+        One statement: `ROW_NUMBER()` over the user's messages partitioned
+        by chat keeps the newest `MAX_ACTIVITY_MESSAGES` per activity. The
+        `ix_messages_sender_chat_timestamp` index serves both the filter and
+        the window ordering.
+        """
+        activity_ids = union(
+            select(ActivityJoiner.activity_id).where(ActivityJoiner.user_id == user_id),
+            select(Activity.id).where(Activity.owner_id == user_id),
+        )
+
+        ranked = (
+            select(
+                Message.chat_id,
+                Message.content,
+                Message.timestamp,
+                Message.is_deleted,
+                Message.is_edited,
+                func.row_number()
+                .over(
+                    partition_by=Message.chat_id,
+                    order_by=(Message.timestamp.desc(), Message.id.desc()),
                 )
+                .label("position"),
+            )
+            .where(Message.sender_id == user_id, Message.chat_id.in_(activity_ids))
+            .subquery()
+        )
 
-                if messages:
-                    activity_messages[activity_id] = [
-                        {
-                            'content': self._format_message_content(msg.content),
-                            'timestamp': self._format_timestamp(msg.timestamp),
-                            'is_deleted': msg.is_deleted,
-                            'is_edited': msg.is_edited
-                        }
-                        for msg in messages
-                    ]
+        with self.db_service.get_session() as db:
+            rows = db.execute(
+                select(ranked)
+                .where(ranked.c.position <= MAX_ACTIVITY_MESSAGES)
+                .order_by(ranked.c.chat_id, ranked.c.position)
+            ).all()
+
+        activity_messages = {}
+        for row in rows:
+            activity_messages.setdefault(row.chat_id, []).append(
+                {
+                    'content': self._format_message_content(row.content),
+                    'timestamp': self._format_timestamp(row.timestamp),
+                    'is_deleted': row.is_deleted,
+                    'is_edited': row.is_edited
+                }
+            )
 
-            return activity_messages
+        return activity_messages
 
     def _validate_search_params(self, search_type: str, search_value: str):
         """Validate search parameters"""
@@ -194,67 +372,43 @@ class UserService:
         """Find user by username"""
         return db.query(User).filter(User.name == username).first()
 
-    def _get_report_count(self, db, user_id: int) -> int:
-        return db.query(UserReport).filter(UserReport.reported_id == user_id).count()
-
-    def _get_total_message_count(self, db, user_id: int) -> int:
-        ind_count = db.query(IndMessage).filter(IndMessage.sender_id == user_id).count()
-        reg_count = db.query(Message).filter(Message.sender_id == user_id).count()
-        return ind_count + reg_count
-
-    def _get_recent_messages(self, db, user_id: int) -> List[Dict]:
-        try:
-            ind_messages = (
-                db.query(IndMessage)
-                .filter(IndMessage.sender_id == user_id)
-                .order_by(desc(IndMessage.timestamp))
-                .limit(MAX_RECENT_MESSAGES)
-                .all()
-            )
-
-            regular_messages = (
-                db.query(Message)
-                .filter(Message.sender_id == user_id)
-                .order_by(desc(Message.timestamp))
-                .limit(MAX_RECENT_MESSAGES)
-                .all()
-            )
-        except Exception as e:
-            return []
-
-        all_messages = []
-
-        try:
-            for msg in ind_messages:
-                all_messages.append(
-                    {
-                        "content": self._format_message_content(
-                            getattr(msg, "content", None)
-                        ),
-                        "timestamp": self._format_timestamp(
-                            getattr(msg, "timestamp", None)
-                        ),
-                        "chat_id": f"IND-{getattr(msg, 'ind_chat_id', 'unknown')}",
-                        "timestamp_raw": getattr(msg, "timestamp", 0) or 0,
-                    }
-                )
+    def _get_recent_ind_messages(self, db, user_id: int) -> List[Dict]:
+        rows = (
+            db.query(IndMessage.content, IndMessage.timestamp, IndMessage.ind_chat_id)
+            .filter(IndMessage.sender_id == user_id)
+            .order_by(desc(IndMessage.timestamp))
+            .limit(MAX_RECENT_MESSAGES)
+            .all()
+        )
+        return [
+            self._build_recent_message(content, timestamp, f"IND-{chat_id}")
+            for content, timestamp, chat_id in rows
+        ]
+
+    def _get_recent_chat_messages(self, db, user_id: int) -> List[Dict]:
+        rows = (
+            db.query(Message.content, Message.timestamp, Message.id)
+            .filter(Message.sender_id == user_id)
+            .order_by(desc(Message.timestamp))
+            .limit(MAX_RECENT_MESSAGES)
+            .all()
+        )
+        return [
+            self._build_recent_message(content, timestamp, f"MSG-{message_id}")
+            for content, timestamp, message_id in rows
+        ]
 
-            for msg in regular_messages:
-                all_messages.append(
-                    {
-                        "content": self._format_message_content(
-                            getattr(msg, "content", None)
-                        ),
-                        "timestamp": self._format_timestamp(
-                            getattr(msg, "timestamp", None)
-                        ),
-                        "chat_id": f"MSG-{getattr(msg, 'id', 'unknown')}",
-                        "timestamp_raw": getattr(msg, "timestamp", 0) or 0,
-                    }
-                )
-        except Exception as e:
-            pass
+    def _build_recent_message(self, content, timestamp, chat_id: str) -> Dict:
+        return {
+            "content": self._format_message_content(content),
+            "timestamp": self._format_timestamp(timestamp),
+            "chat_id": chat_id,
+            "timestamp_raw": timestamp or 0,
+        }
 
+    def _merge_recent_messages(self, *message_lists: List[Dict]) -> List[Dict]:
+        """Newest MAX_RECENT_MESSAGES across direct and activity chats"""
+        all_messages = [msg for messages in message_lists for msg in messages]
         all_messages.sort(key=lambda x: x["timestamp_raw"], reverse=True)
         messages_list = all_messages[:MAX_RECENT_MESSAGES]
 
@@ -274,8 +428,10 @@ class UserService:
         return "Unknown"
 
     def _build_user_dict(
-        self, user, report_count: int, message_count: int, recent_messages: List[Dict]
+        self, user, counts: Optional[Dict], recent_messages: List[Dict]
     ) -> Dict:
+        counts = counts or {}
+
         return {
             "id": user.id,
             "username": user.name or f"User {user.id}",
@@ -289,7 +445,18 @@ class UserService:
                 if user.last_active
                 else "Unknown"
             ),
-            "message_count": message_count,
-            "report_count": report_count,
+            "message_count": counts.get("message_count"),
+            "report_count": counts.get("report_count"),
+            "counters": counts.get("counters"),
             "recent_messages": recent_messages,
         }
+
+
+def _parse_activity_cursor(cursor: str):
+    try:
+        values = [int(value) for value in cursor.split(":")]
+    except (AttributeError, ValueError):
+        values = []
+    if len(values) != 3:
+        raise ValidationError(f"Invalid activity cursor: {cursor!r}")
+    return values
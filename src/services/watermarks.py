@@ -0,0 +1,27 @@
+"""Persisted progress markers for incremental refresh jobs"""
+
+from datetime import datetime
+from typing import Optional
+
+from core.models import Watermark
+
+
+def get_watermark(db, name: str) -> Optional[Watermark]:
+    return db.query(Watermark).filter(Watermark.name == name).first()
+
+
+def set_watermark(
+    db, name: str, position: Optional[int] = None, marked_at: Optional[datetime] = None
+) -> Watermark:
+    """Create or update a watermark in the current transaction (caller commits)"""
+    watermark = get_watermark(db, name)
+    if watermark is None:
+        watermark = Watermark(name=name)
+        db.add(watermark)
+
+    if position is not None:
+        watermark.position = position
+    if marked_at is not None:
+        watermark.marked_at = marked_at
+    watermark.updated_at = datetime.now()
+    return watermark
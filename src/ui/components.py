@@ -5,7 +5,7 @@ This module contains reusable UI components and helper functions
 for the Streamlit admin dashboard interface.
 """
 
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 import pandas as pd
 import streamlit as st
@@ -15,6 +15,12 @@ def display_user_profile(user: Dict) -> None:
     """Display user profile information in a structured layout"""
     st.subheader(f"Profile: {user['username']}")
 
+    if user.get("incomplete"):
+        st.warning(
+            "Some profile details took too long to load and are not shown: "
+            + ", ".join(name.replace("_", " ") for name in user["incomplete"])
+        )
+
     col1, col2, col3 = st.columns(3)
 
     with col1:
@@ -23,13 +29,22 @@ def display_user_profile(user: Dict) -> None:
         st.metric("Join Date", user["created_at"])
 
     with col2:
-        st.metric("Total Messages", user["message_count"])
-        st.metric("Reports Against", user["report_count"])
+        st.metric("Total Messages", _metric_value(user["message_count"]))
+        st.metric("Reports Against", _metric_value(user["report_count"]))
         st.write("**Email:**")
         st.caption(user["email"])
 
     with col3:
         st.metric("Last Active", user["last_active"])
+        counters = user.get("counters")
+        if counters:
+            st.metric("Activities Hosted / Joined", f"{counters['activities_hosted']} / {counters['activities_joined']}")
+            st.metric("Forum Threads / Replies", f"{counters['threads']} / {counters['replies']}")
+
+
+def _metric_value(value):
+    """Metric placeholder for a value that did not load in time"""
+    return "—" if value is None else value
 
 
 def display_user_activities(activities: List[Dict]) -> None:
@@ -57,7 +72,7 @@ def display_user_messages(messages: List[Dict]) -> None:
 def display_search_form() -> tuple:
     """Display user search form and return search parameters"""
     st.subheader("Search User")
-    search_type = st.selectbox("Search by:", ["User ID", "Username"])
+    search_type = st.selectbox("Search by:", ["Name, email or phone", "User ID", "Username"])
     search_value = st.text_input(
         f"Enter {search_type}:", placeholder=f"Type {search_type.lower()} here..."
     )
@@ -83,38 +98,49 @@ def display_moderation_actions(user_id: str) -> None:
             st.session_state.ban_user_id = user_id
 
 
-def display_message_form(user_id: str, moderation_service) -> None:
-    """Display direct message form with action button support"""
-    st.subheader("Send Direct Message")
-    with st.form("direct_message_form"):
-        message = st.text_area("Message:", max_chars=1000)
+def display_action_button_inputs(key_prefix: str = "") -> Tuple[Optional[str], Optional[str], Optional[Dict]]:
+    """Optional action button fields for admin messages; returns (type, text, data)"""
 
-        st.subheader("Action Button (Optional)")
-        add_action = st.checkbox("Add action button to message")
+    def key(name):
+        return f"{key_prefix}{name}" if key_prefix else None
 
-        action_type = None
-        action_text = None
-        action_data = None
+    st.subheader("Action Button (Optional)")
+    add_action = st.checkbox("Add action button to message", key=key("add_action"))
 
-        if add_action:
-            action_type = st.selectbox("Action Type", ["navigation", "url", "none"])
+    action_type = None
+    action_text = None
+    action_data = None
 
-            if action_type != "none":
-                action_text = st.text_input("Button Text", max_chars=70, placeholder="View Details")
+    if add_action:
+        action_type = st.selectbox("Action Type", ["navigation", "url", "none"], key=key("action_type"))
 
-                if action_type == "navigation":
-                    screen = st.selectbox("Target Screen", ["Browse", "Profile", "Activities", "Communities", "Thread"])
-                    thread_id = st.number_input("Thread ID (if applicable)", min_value=0, value=0)
+        if action_type != "none":
+            action_text = st.text_input("Button Text", max_chars=70, placeholder="View Details", key=key("action_text"))
 
-                    if thread_id > 0:
-                        action_data = {"screen": screen, "params": {"threadId": thread_id}}
-                    else:
-                        action_data = {"screen": screen}
+            if action_type == "navigation":
+                screen = st.selectbox("Target Screen", ["Browse", "Profile", "Activities", "Communities", "Thread"], key=key("screen"))
+                thread_id = st.number_input("Thread ID (if applicable)", min_value=0, value=0, key=key("thread_id"))
+
+                if thread_id > 0:
+                    action_data = {"screen": screen, "params": {"threadId": thread_id}}
+                else:
+                    action_data = {"screen": screen}
+
+            elif action_type == "url":
+                url = st.text_input("URL", placeholder="https://...", key=key("url"))
+                if url:
+                    action_data = {"url": url}
+
+    return action_type, action_text, action_data
+
+
+def display_message_form(user_id: str, moderation_service) -> None:
+    """Display direct message form with action button support"""
+    st.subheader("Send Direct Message")
+    with st.form("direct_message_form"):
+        message = st.text_area("Message:", max_chars=1000)
 
-                elif action_type == "url":
-                    url = st.text_input("URL", placeholder="https://...")
-                    if url:
-                        action_data = {"url": url}
+        action_type, action_text, action_data = display_action_button_inputs()
 
         col1, col2 = st.columns(2)
         with col1:
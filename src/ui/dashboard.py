@@ -52,8 +52,8 @@ def main():
             user_activities_tab()
 
     with main_tab2:
-        sub_tab1, sub_tab2, sub_tab3, sub_tab4 = st.tabs(
-            ["Chats", "Forums", "Reports", "Feedback"]
+        sub_tab1, sub_tab2, sub_tab3, sub_tab4, sub_tab5 = st.tabs(
+            ["Chats", "Forums", "Reports", "Feedback", "Bulk Ban"]
         )
 
         with sub_tab1:
@@ -65,7 +65,9 @@ def main():
 
         with sub_tab2:
             from services.community_forum_service import CommunityForumService
+            from services.community_service import CommunityService
             get_service("community_forum_service", CommunityForumService)
+            get_service("community_service", CommunityService)
             from ui.tabs.forum_moderation_tab import render as forum_moderation_tab
             forum_moderation_tab()
 
@@ -77,6 +79,10 @@ def main():
             from ui.tabs.feedback_tab import feedback_tab
             feedback_tab()
 
+        with sub_tab5:
+            from ui.tabs.bulk_ban_tab import bulk_ban_tab
+            bulk_ban_tab()
+
     with main_tab3:
         from services.analytics_service import AnalyticsService
         get_service("analytics_service", AnalyticsService)
@@ -107,7 +113,7 @@ def main():
             communities_tab()
 
     with main_tab5:
-        sub_tab1, sub_tab2 = st.tabs(["Notifications", "ConvertKit"])
+        sub_tab1, sub_tab2, sub_tab3 = st.tabs(["Notifications", "ConvertKit", "Direct Messages"])
 
         with sub_tab1:
             from services.notification_service import NotificationService
@@ -117,10 +123,16 @@ def main():
 
         with sub_tab2:
             from services.convertkit_service import ConvertKitService
+            from services.notification_service import NotificationService
             get_service("convertkit_service", ConvertKitService)
+            get_service("notification_service", NotificationService)
             from ui.tabs.convertkit_tab import convertkit_tab
             convertkit_tab()
 
+        with sub_tab3:
+            from ui.tabs.direct_messages_tab import direct_messages_tab
+            direct_messages_tab()
+
 
 if __name__ == "__main__":
     main()
@@ -1,7 +1,11 @@
+from datetime import date, timedelta
+
 import pandas as pd
 import plotly.express as px
 import streamlit as st
 
+GRANULARITY_LABELS = {"Hourly": "hour", "Daily": "day", "Weekly": "week", "Monthly": "month"}
+
 
 @st.cache_data(ttl=60)
 def get_cached_stats():
@@ -9,8 +13,10 @@ def get_cached_stats():
 
 
 @st.cache_data(ttl=300)
-def get_cached_analytics():
-    return st.session_state.analytics_service.get_activity_analytics()
+def get_cached_analytics(start: date, end: date, granularity: str):
+    return st.session_state.analytics_service.get_activity_analytics(
+        start=start, end=end + timedelta(days=1), granularity=granularity
+    )
 
 
 def analytics_tab():
@@ -42,9 +48,32 @@ def _display_key_metrics():
 
 
 def _display_analytics_charts():
-    st.subheader("Daily Analytics Trends")
+    st.subheader("Analytics Trends")
+
+    range_col, granularity_col = st.columns([2, 1])
+    with range_col:
+        today = date.today()
+        date_range = st.date_input(
+            "Date range",
+            value=(today - timedelta(days=89), today),
+            max_value=today,
+            key="analytics_date_range",
+        )
+    with granularity_col:
+        granularity_label = st.selectbox(
+            "Granularity", list(GRANULARITY_LABELS), index=1, key="analytics_granularity"
+        )
+
+    if not isinstance(date_range, tuple) or len(date_range) != 2:
+        st.info("Select a start and end date")
+        return
+
+    start, end = date_range
+    granularity = GRANULARITY_LABELS[granularity_label]
+    period = f"{start} to {end}"
+
     with st.spinner("Loading chart data..."):
-        activity_data = get_cached_analytics()
+        activity_data = get_cached_analytics(start, end, granularity)
 
     if not activity_data:
         st.info("No activity data available")
@@ -56,21 +85,21 @@ def _display_analytics_charts():
     )
 
     with chart_tab1:
-        _show_active_users_chart(df)
+        _show_active_users_chart(df, period)
     with chart_tab2:
-        _show_new_users_chart(df)
+        _show_new_users_chart(df, period)
     with chart_tab3:
-        _show_messages_chart(df)
+        _show_messages_chart(df, period)
     with chart_tab4:
-        _show_activities_chart(df)
+        _show_activities_chart(df, period)
 
 
-def _show_active_users_chart(df):
+def _show_active_users_chart(df, period):
     if "active_users" not in df.columns:
         return
 
     fig = px.line(
-        df, x="date", y="active_users", title="Daily Active Users (Last 90 Days)"
+        df, x="date", y="active_users", title=f"Active Users ({period})"
     )
     fig.update_traces(line_width=2, line_color="#007acc")
     fig.update_layout(height=400, xaxis_tickangle=-45)
@@ -82,12 +111,12 @@ def _show_active_users_chart(df):
     st.info(f"Peak: **{max_active:,}** on {max_date} | Average: **{avg_active:.0f}**")
 
 
-def _show_new_users_chart(df):
+def _show_new_users_chart(df, period):
     if "new_users" not in df.columns:
         return
 
     fig = px.bar(
-        df, x="date", y="new_users", title="New User Registrations (Last 90 Days)"
+        df, x="date", y="new_users", title=f"New User Registrations ({period})"
     )
     fig.update_traces(marker_color="#28a745")
     fig.update_layout(height=400, xaxis_tickangle=-45)
@@ -99,12 +128,12 @@ def _show_new_users_chart(df):
     st.info(f"Peak: **{max_new:,}** on {max_date} | Total: **{total_new:,}**")
 
 
-def _show_messages_chart(df):
+def _show_messages_chart(df, period):
     if "messages" not in df.columns:
         return
 
     fig = px.area(
-        df, x="date", y="messages", title="Daily Message Volume (Last 90 Days)"
+        df, x="date", y="messages", title=f"Message Volume ({period})"
     )
     fig.update_traces(fill="tonexty", line_color="#ffc107")
     fig.update_layout(height=400, xaxis_tickangle=-45)
@@ -119,12 +148,12 @@ def _show_messages_chart(df):
     )
 
 
-def _show_activities_chart(df):
+def _show_activities_chart(df, period):
     if "activities" not in df.columns:
         return
 
     fig = px.bar(
-        df, x="date", y="activities", title="Activities Created Per Day (Last 90 Days)"
+        df, x="date", y="activities", title=f"Activities Created ({period})"
     )
     fig.update_traces(marker_color="#17a2b8")
     fig.update_layout(height=400, xaxis_tickangle=-45)
@@ -0,0 +1,119 @@
+"""Bulk permanent bans for spam waves"""
+
+import csv
+import io
+
+import streamlit as st
+
+from core.security import security_validator
+
+MAX_BAN_TARGETS = 5000
+
+
+def bulk_ban_tab():
+    st.header("Bulk Ban")
+
+    st.markdown("Ban many accounts at once from a pasted list, a CSV or the report inbox")
+
+    source = st.radio("Source", ["Paste IDs", "CSV upload", "Reported users"], horizontal=True)
+
+    user_ids, invalid = _collect_ids(source)
+    if invalid:
+        st.warning(f"Ignoring {len(invalid)} invalid IDs: {', '.join(invalid[:10])}")
+
+    if st.button("Validate IDs", key="bulk_ban_validate"):
+        if not user_ids:
+            st.error("No user IDs to validate")
+        elif len(user_ids) > MAX_BAN_TARGETS:
+            st.error(f"At most {MAX_BAN_TARGETS} users per bulk ban")
+        else:
+            try:
+                st.session_state.bulk_ban_candidates = (
+                    st.session_state.moderation_service.get_ban_candidates(user_ids)
+                )
+            except Exception as e:
+                st.error(f"Error: {str(e)}")
+
+    candidates = st.session_state.get("bulk_ban_candidates")
+    if candidates:
+        _confirm_and_ban(candidates)
+
+
+def _collect_ids(source):
+    if source == "Paste IDs":
+        raw = st.text_area("User IDs", placeholder="12, 345, 6789 (commas, spaces or one per line)")
+        return security_validator.parse_user_ids(raw)
+
+    if source == "CSV upload":
+        upload = st.file_uploader("CSV with an id or user_id column", type=["csv"])
+        if upload is None:
+            return [], []
+        return security_validator.parse_user_ids(" ".join(_csv_ids(upload.getvalue())))
+
+    min_reports = st.number_input("Minimum reports", min_value=2, value=3)
+    try:
+        reports = st.session_state.moderation_service.get_pending_reports(limit=MAX_BAN_TARGETS)
+    except Exception as e:
+        st.error(f"Error loading reports: {str(e)}")
+        return [], []
+    ids = [int(r["reported_user_id"]) for r in reports if r["report_count"] >= min_reports]
+    st.caption(f"{len(ids)} reported users with at least {min_reports} reports")
+    return ids, []
+
+
+def _csv_ids(data: bytes):
+    rows = list(csv.reader(io.StringIO(data.decode("utf-8-sig"))))
+    if not rows:
+        return []
+
+    header = [cell.strip().lower() for cell in rows[0]]
+    for name in ("user_id", "id"):
+        if name in header:
+            column = header.index(name)
+            return [row[column] for row in rows[1:] if len(row) > column]
+    # No header: take the first column
+    return [row[0] for row in rows if row]
+
+
+def _confirm_and_ban(candidates):
+    users = candidates["users"]
+    if candidates["missing"]:
+        st.info(f"{len(candidates['missing'])} IDs do not exist and will be skipped")
+    if not users:
+        st.warning("None of these users exist")
+        return
+
+    st.subheader(f"{len(users)} users to ban")
+    st.dataframe(users, use_container_width=True, hide_index=True)
+
+    with st.form("bulk_ban_form"):
+        st.warning("This action cannot be undone!")
+        reason = st.text_area("Reason for permanent ban:", max_chars=250)
+        confirm = st.checkbox(f"I confirm banning {len(users)} users permanently")
+
+        if st.form_submit_button("Ban All", type="primary"):
+            if not (confirm and reason):
+                st.error("Please confirm the action and provide a reason")
+                return
+            _ban([user["id"] for user in users], reason)
+
+
+def _ban(user_ids, reason):
+    try:
+        progress = st.progress(0.0, text=f"Banning {len(user_ids)} users...")
+
+        def on_progress(done, total):
+            progress.progress(done / total, text=f"Processed {done} of {total}")
+
+        result = st.session_state.moderation_service.bulk_permanent_ban(
+            user_ids, reason, on_progress=on_progress
+        )
+        progress.empty()
+
+        st.success(f"✓ Banned {result['banned']} users")
+        if result["missing"]:
+            st.info(f"{len(result['missing'])} users were already gone")
+        del st.session_state.bulk_ban_candidates
+
+    except Exception as e:
+        st.error(f"Error: {str(e)}")
@@ -82,16 +82,7 @@ def render_activity_chats(service):
                     st.markdown("---")
                     st.write("**💬 Chat Messages:**")
                     try:
-                        messages = service.get_chat_messages(chat['id'], chat_type="activity")
-                        if messages:
-                            for msg in messages[-20:]:
-                                deleted_badge = "🗑️ " if msg.get('is_deleted') else ""
-                                edited_badge = "✏️ " if msg.get('is_edited') else ""
-                                st.text(
-                                    f"{deleted_badge}{edited_badge}[{msg['timestamp']}] {msg['sender_name']}: {msg['content'][:100]}"
-                                )
-                        else:
-                            st.info("No messages in this chat")
+                        render_message_page(service, chat['id'], "activity")
                     except Exception as e:
                         st.error(f"Error loading messages: {str(e)}")
 
@@ -144,15 +135,7 @@ def render_individual_chats(service):
                     st.markdown("---")
                     st.write("**💬 Chat Messages:**")
                     try:
-                        messages = service.get_chat_messages(chat['id'], chat_type="individual")
-                        if messages:
-                            for msg in messages[-20:]:
-                                image_badge = "🖼️ " if msg.get('image_url') else ""
-                                st.text(
-                                    f"{image_badge}[{msg['timestamp']}] {msg['sender_name']}: {msg['content'][:100]}"
-                                )
-                        else:
-                            st.info("No messages in this chat")
+                        render_message_page(service, chat['id'], "individual")
                     except Exception as e:
                         st.error(f"Error loading messages: {str(e)}")
 
@@ -160,77 +143,137 @@ def render_individual_chats(service):
         st.error(f"Error loading direct messages: {str(e)}")
 
 
+def render_message_page(service, chat_id, chat_type):
+    cursor_key = f"message_cursor_{chat_type}_{chat_id}"
+    cursor = st.session_state.get(cursor_key, {})
+
+    page = service.get_chat_message_page(chat_id, chat_type=chat_type, limit=20, **cursor)
+    messages = page['messages']
+
+    if page['has_older'] and st.button("⬆️ Load older", key=f"older_{cursor_key}"):
+        st.session_state[cursor_key] = {"before": page['older_cursor']}
+        st.rerun()
+
+    if messages:
+        for msg in messages:
+            if chat_type == "activity":
+                deleted_badge = "🗑️ " if msg.get('is_deleted') else ""
+                edited_badge = "✏️ " if msg.get('is_edited') else ""
+                badges = f"{deleted_badge}{edited_badge}"
+            else:
+                badges = "🖼️ " if msg.get('image_url') else ""
+            st.text(f"{badges}[{msg['timestamp']}] {msg['sender_name']}: {(msg['content'] or '')[:100]}")
+    else:
+        st.info("No messages in this chat")
+
+    col_newer, col_latest = st.columns(2)
+    with col_newer:
+        if page['has_newer'] and st.button("⬇️ Load newer", key=f"newer_{cursor_key}"):
+            st.session_state[cursor_key] = {"after": page['newer_cursor']}
+            st.rerun()
+    with col_latest:
+        if cursor and st.button("⏬ Jump to latest", key=f"latest_{cursor_key}"):
+            st.session_state[cursor_key] = {}
+            st.rerun()
+
+
 def render_message_search(service):
     st.subheader("Search All Messages")
 
-    col1, col2 = st.columns([3, 1])
+    col1, col2, col3 = st.columns([3, 1, 1])
     with col1:
         keyword = st.text_input(
             "Search keyword",
-            placeholder="Enter keyword to search in all messages (min 2 characters)...",
+            placeholder='Words, "exact phrase" or prefix* (min 2 characters)...',
             key="message_search",
         )
     with col2:
-        limit = st.number_input("Max results", min_value=20, max_value=500, value=100, step=20, key="search_limit")
+        limit = st.number_input("Per page", min_value=20, max_value=500, value=100, step=20, key="search_limit")
+    with col3:
+        order = st.selectbox("Sort by", ["relevance", "newest"], key="search_order")
 
     if st.button("🔍 Search Messages", type="primary"):
         if not keyword or len(keyword) < 2:
             st.error("Search keyword must be at least 2 characters")
             return
+        st.session_state.message_search_request = (keyword, limit, order)
+        st.session_state.message_search_cursors = [None]
+
+    if "message_search_request" not in st.session_state:
+        return
+
+    keyword, limit, order = st.session_state.message_search_request
+    cursors = st.session_state.message_search_cursors
+
+    try:
+        with st.spinner("Searching messages..."):
+            page = service.search_message_page(keyword, limit=limit, cursor=cursors[-1], order=order)
+        results = page['results']
+
+        if not page['index_complete']:
+            st.warning("The search index is still catching up with recent messages; results may be incomplete.")
+
+        if not results:
+            st.info(f"No messages found matching '{keyword}'")
+            return
 
-        try:
-            with st.spinner("Searching messages..."):
-                results = service.search_messages(keyword, limit=limit)
-
-            if not results:
-                st.info(f"No messages found containing '{keyword}'")
-                return
-
-            st.success(f"Found {len(results)} messages")
-
-            for result in results:
-                chat_type_icon = "🏃" if result['type'] == "activity" else "💬"
-                with st.expander(
-                    f"{chat_type_icon} [{result['timestamp']}] {result['sender_name']} in {result['chat_name']}"
-                ):
-                    st.write(f"**Type:** {result['type'].title()}")
-                    st.write(f"**Chat ID:** {result['chat_id']}")
-                    st.write(f"**Message ID:** {result['message_id']}")
-                    st.write(f"**Sender:** {result['sender_name']} (ID: {result['sender_id']})")
-                    st.write(f"**Time:** {result['timestamp']}")
-                    st.text_area(
-                        "Content",
-                        value=result['content'],
-                        height=100,
-                        key=f"msg_content_{result['message_id']}_{result['type']}",
-                        disabled=True,
+        st.success(f"Page {len(cursors)}: {len(results)} messages")
+
+        for result in results:
+            chat_type_icon = "🏃" if result['type'] == "activity" else "💬"
+            with st.expander(
+                f"{chat_type_icon} [{result['timestamp']}] {result['sender_name']} in {result['chat_name']}"
+            ):
+                st.write(f"**Type:** {result['type'].title()}")
+                st.write(f"**Chat ID:** {result['chat_id']}")
+                st.write(f"**Message ID:** {result['message_id']}")
+                st.write(f"**Sender:** {result['sender_name']} (ID: {result['sender_id']})")
+                st.write(f"**Time:** {result['timestamp']}")
+                st.markdown(f"**Match:** {result['snippet']}")
+                st.text_area(
+                    "Content",
+                    value=result['content'],
+                    height=100,
+                    key=f"msg_content_{result['message_id']}_{result['type']}",
+                    disabled=True,
+                )
+
+                col1, col2 = st.columns(2)
+                with col1:
+                    if st.button(
+                        "🚩 Flag as Inappropriate",
+                        key=f"flag_{result['message_id']}_{result['type']}",
+                    ):
+                        st.session_state[f"flag_reason_{result['message_id']}_{result['type']}"] = True
+
+                if st.session_state.get(f"flag_reason_{result['message_id']}_{result['type']}", False):
+                    reason = st.text_input(
+                        "Reason for flagging",
+                        key=f"reason_input_{result['message_id']}_{result['type']}",
                     )
+                    if st.button(
+                        "Confirm Flag",
+                        key=f"confirm_flag_{result['message_id']}_{result['type']}",
+                    ):
+                        try:
+                            service.flag_message(
+                                result['message_id'], result['type'], reason
+                            )
+                            st.success("Message flagged successfully")
+                            st.session_state[f"flag_reason_{result['message_id']}_{result['type']}"] = False
+                        except Exception as e:
+                            st.error(f"Error flagging message: {str(e)}")
+
+
+        col_prev, col_next = st.columns(2)
+        with col_prev:
+            if len(cursors) > 1 and st.button("⬅️ Previous page", key="search_prev"):
+                cursors.pop()
+                st.rerun()
+        with col_next:
+            if page['next_cursor'] and st.button("Next page ➡️", key="search_next"):
+                cursors.append(page['next_cursor'])
+                st.rerun()
 
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        if st.button(
-                            "🚩 Flag as Inappropriate",
-                            key=f"flag_{result['message_id']}_{result['type']}",
-                        ):
-                            st.session_state[f"flag_reason_{result['message_id']}_{result['type']}"] = True
-
-                    if st.session_state.get(f"flag_reason_{result['message_id']}_{result['type']}", False):
-                        reason = st.text_input(
-                            "Reason for flagging",
-                            key=f"reason_input_{result['message_id']}_{result['type']}",
-                        )
-                        if st.button(
-                            "Confirm Flag",
-                            key=f"confirm_flag_{result['message_id']}_{result['type']}",
-                        ):
-                            try:
-                                service.flag_message(
-                                    result['message_id'], result['type'], reason
-                                )
-                                st.success("Message flagged successfully")
-                                st.session_state[f"flag_reason_{result['message_id']}_{result['type']}"] = False
-                            except Exception as e:
-                                st.error(f"Error flagging message: {str(e)}")
-
-        except Exception as e:
-            st.error(f"Error searching messages: {str(e)}")
+    except Exception as e:
+        st.error(f"Error searching messages: {str(e)}")
@@ -52,6 +52,10 @@ def _add_single_subscriber(email, first_name, language):
 
 
 def _sync_users():
+    _sync_changes()
+
+    st.divider()
+
     st.subheader("Bulk Sync Users to ConvertKit")
 
     st.info("This will sync registered users with ConvertKit, updating language preferences")
@@ -62,7 +66,7 @@ def _sync_users():
         language_filter = st.multiselect("Filter by language", ["nl", "en", "fr"], default=["nl", "en", "fr"])
 
     with col2:
-        limit = st.number_input("Max users to sync", min_value=1, max_value=1000, value=50)
+        limit = st.number_input("Max users to sync", min_value=1, max_value=100000, value=50)
 
     if st.button("Preview Users", key="preview_convertkit_users"):
         _preview_sync_users(language_filter, limit)
@@ -71,37 +75,80 @@ def _sync_users():
         _sync_users_to_convertkit(language_filter, limit)
 
 
-def _preview_sync_users(language_filter, limit):
+def _sync_changes():
+    st.subheader("Sync Changes")
+
+    service = st.session_state.convertkit_service
+
     try:
-        from services.user_service import UserService
-        from core.models import User
+        status = service.get_sync_status()
+    except Exception as e:
+        st.error(f"Error: {str(e)}")
+        return
+
+    if status["last_sync"]:
+        st.caption(
+            f"Last sync: {status['last_sync'].strftime('%Y-%m-%d %H:%M')} · "
+            f"{status['tracked']} emails tracked"
+        )
+    else:
+        st.caption("No sync yet - the first run compares every registered user with ConvertKit")
+
+    full = st.checkbox("Full resync (rescan all registered users)", key="convertkit_full_resync")
+
+    if st.button("🔄 Sync Changes", type="primary", key="convertkit_sync_changes"):
+        try:
+            progress = st.progress(0.0, text="Finding changed users...")
 
-        user_service = UserService()
+            def on_progress(done, total):
+                progress.progress(done / total if total else 1.0, text=f"Sent {done} of {total} changes")
 
-        with user_service.db_service.get_session() as db:
-            query = db.query(User).filter(
-                User.reg_complete == True,
-                User.language.in_(language_filter)
-            ).limit(limit)
+            result = service.sync_changed_users(full=full, on_progress=on_progress)
+            progress.empty()
 
-            users = query.all()
+            st.success(
+                f"✓ Checked {result['scanned']} users, {result['changed']} changed: "
+                f"{result['created']} added, {result['updated']} updated"
+            )
 
-            st.write(f"**Found {len(users)} users to sync**")
+            if result['failed'] > 0:
+                st.warning(f"⚠ {result['failed']} users failed to sync and will be retried next run")
+                st.json(result['errors'])
 
-            preview = []
-            for user in users[:10]:
-                preview.append({
-                    "ID": user.id,
-                    "Name": user.name or "N/A",
-                    "Email": user.email or "N/A",
-                    "Language": user.language or "N/A"
-                })
+        except Exception as e:
+            st.error(f"Error: {str(e)}")
 
-            if preview:
-                st.table(preview)
 
-                if len(users) > 10:
-                    st.caption(f"Showing first 10 of {len(users)} users")
+def _sync_filters(language_filter, limit):
+    return {"language": language_filter, "reg_complete": True, "limit": limit}
+
+
+def _preview_sync_users(language_filter, limit):
+    try:
+        notification_service = st.session_state.notification_service
+        filters = _sync_filters(language_filter, limit)
+
+        total = min(notification_service.get_recipient_count(filters, require_token=False), limit)
+
+        st.write(f"**Found {total} users to sync**")
+
+        preview = [
+            {
+                "ID": user.id,
+                "Name": user.name or "N/A",
+                "Email": user.email or "N/A",
+                "Language": user.language or "N/A"
+            }
+            for user in notification_service.iter_recipients(
+                filters, fields=("id", "name", "email", "language"), require_token=False, limit=10
+            )
+        ]
+
+        if preview:
+            st.table(preview)
+
+            if total > 10:
+                st.caption(f"Showing first 10 of {total} users")
 
     except Exception as e:
         st.error(f"Error: {str(e)}")
@@ -109,35 +156,37 @@ def _preview_sync_users(language_filter, limit):
 
 def _sync_users_to_convertkit(language_filter, limit):
     try:
-        from services.user_service import UserService
-        from core.models import User
-
-        user_service = UserService()
+        recipients = st.session_state.notification_service.iter_recipients(
+            _sync_filters(language_filter, limit),
+            fields=("id", "name", "email", "language"),
+            require_token=False,
+        )
 
-        with user_service.db_service.get_session() as db:
-            query = db.query(User).filter(
-                User.reg_complete == True,
-                User.language.in_(language_filter)
-            ).limit(limit)
+        user_list = [
+            {
+                "email": u.email,
+                "name": u.name,
+                "language": u.language
+            }
+            for u in recipients if u.email
+        ]
 
-            users = query.all()
+        progress = st.progress(0.0, text=f"Comparing {len(user_list)} users with ConvertKit...")
 
-            user_list = [
-                {
-                    "email": u.email,
-                    "name": u.name,
-                    "language": u.language
-                }
-                for u in users if u.email
-            ]
+        def on_progress(done, total):
+            progress.progress(done / total if total else 1.0, text=f"Sent {done} of {total} changes")
 
-        with st.spinner(f"Syncing {len(user_list)} users..."):
-            result = st.session_state.convertkit_service.bulk_sync_users(user_list)
+        result = st.session_state.convertkit_service.bulk_sync_users(user_list, on_progress)
+        progress.empty()
 
-        st.success(f"✓ Synced {result['synced']} users successfully")
+        st.success(
+            f"✓ Synced {result['synced']} users successfully "
+            f"({result['created']} added, {result['updated']} updated, {result['unchanged']} already up to date)"
+        )
 
         if result['failed'] > 0:
             st.warning(f"⚠ {result['failed']} users failed to sync")
+            st.json(result['errors'])
 
     except Exception as e:
         st.error(f"Error: {str(e)}")
@@ -0,0 +1,59 @@
+"""Bulk admin direct messages"""
+
+import streamlit as st
+
+from core.security import security_validator
+from ui.components import display_action_button_inputs
+
+MAX_RECIPIENTS = 50000
+
+
+def direct_messages_tab():
+    st.header("Bulk Direct Messages")
+
+    st.markdown("Send the same admin message to many users' inboxes")
+
+    raw_ids = st.text_area(
+        "User IDs*",
+        placeholder="12, 345, 6789 (commas, spaces or one per line)",
+        height=120,
+    )
+    message = st.text_area("Message*", max_chars=1000, key="bulk_dm_message")
+
+    action_type, action_text, action_data = display_action_button_inputs(key_prefix="bulk_dm_")
+
+    user_ids, invalid = security_validator.parse_user_ids(raw_ids)
+    if invalid:
+        st.warning(f"Ignoring {len(invalid)} invalid IDs: {', '.join(invalid[:10])}")
+    if user_ids:
+        st.caption(f"{len(user_ids)} recipients")
+
+    if st.button("📨 Send to All", type="primary", key="bulk_dm_send"):
+        if not user_ids or not message:
+            st.error("User IDs and a message are required")
+        elif len(user_ids) > MAX_RECIPIENTS:
+            st.error(f"At most {MAX_RECIPIENTS} recipients per send")
+        else:
+            _send(user_ids, message, action_type, action_text, action_data)
+
+
+def _send(user_ids, message, action_type, action_text, action_data):
+    try:
+        progress = st.progress(0.0, text=f"Sending to {len(user_ids)} users...")
+
+        def on_progress(done, total):
+            progress.progress(done / total, text=f"Sent {done} of {total}")
+
+        result = st.session_state.moderation_service.send_bulk_message(
+            user_ids, message, action_type, action_text, action_data, on_progress=on_progress
+        )
+        progress.empty()
+
+        st.success(
+            f"✓ Sent to {result['sent']} users ({result['chats_created']} new chats)"
+        )
+        if result['skipped']:
+            st.info(f"Skipped {result['skipped']} IDs (unknown users, duplicates or the admin account)")
+
+    except Exception as e:
+        st.error(f"Error: {str(e)}")
@@ -22,51 +22,51 @@ def feedback_tab():
         st.error("Invalid search query. Please check your input.")
         return
 
-    try:
-
-        feedback_list = st.session_state.moderation_service.get_sent_feedback()
+    col1, col2, col3 = st.columns([1, 1, 1])
+    with col1:
+        feedback_limit = st.selectbox(
+            "Show feedback:",
+            [10, 20, 50, 100],
+            index=1,
+            help="Select how many feedback items to display per page",
+        )
+    with col2:
+        sort_option = st.selectbox(
+            "Sort by:",
+            ["Rating", "Date"],
+            index=0,
+            help="Choose how to sort feedback",
+        )
+    with col3:
+        rating_filter = st.multiselect(
+            "Rating:",
+            [1, 2, 3, 4, 5, 0],
+            format_func=lambda r: f"{r} ⭐" if r else "No rating",
+            help="Leave empty to show all ratings",
+        )
+
+    # Any change to the query starts again from the first page
+    request = (search_query, tuple(rating_filter), sort_option, feedback_limit)
+    if st.session_state.get("feedback_request") != request:
+        st.session_state.feedback_request = request
+        st.session_state.feedback_cursors = [None]
+    cursors = st.session_state.feedback_cursors
 
-        if search_query:
-            feedback_list = [
-                f
-                for f in feedback_list
-                if search_query.lower() in f.get("user_name", "").lower()
-                or search_query.lower() in f.get("message", "").lower()
-                or search_query in str(f.get("user_id", ""))
-            ]
+    try:
+        page = st.session_state.moderation_service.get_feedback_page(
+            search=search_query,
+            ratings=rating_filter,
+            sort=sort_option.lower(),
+            limit=int(feedback_limit),
+            cursor=cursors[-1],
+        )
+        feedback_list = page["feedback"]
 
         if not feedback_list:
             st.info("No feedback found.")
             return
 
-        col1, col2, col3 = st.columns([1, 1, 1])
-        with col1:
-            feedback_limit = st.selectbox(
-                "Show feedback:",
-                [10, 20, 50, 100, "All"],
-                index=1, 
-                help="Select how many feedback items to display",
-            )
-        with col2:
-            sort_option = st.selectbox(
-                "Sort by:",
-                ["Rating", "Date"],
-                index=0, 
-                help="Choose how to sort feedback",
-            )
-        with col3:
-            total_available = len(feedback_list)
-            st.metric("Available", total_available)
-
-        if sort_option == "Date":
-            feedback_list = sorted(
-                feedback_list, key=lambda x: x.get("id", 0), reverse=True
-            )
-
-        if feedback_limit != "All":
-            feedback_list = feedback_list[: int(feedback_limit)]
-
-        st.info(f"Showing {len(feedback_list)} feedback messages")
+        st.info(f"Page {len(cursors)}: showing {len(feedback_list)} feedback messages")
 
         for feedback in feedback_list:
             user_name = feedback.get(
@@ -120,6 +120,16 @@ def feedback_tab():
                         else:
                             st.error("User not found")
 
+        col1, col2 = st.columns(2)
+        with col1:
+            if len(cursors) > 1 and st.button("⬅️ Previous page", key="feedback_prev"):
+                cursors.pop()
+                st.rerun()
+        with col2:
+            if page["has_more"] and st.button("Next page ➡️", key="feedback_next"):
+                cursors.append(page["next_cursor"])
+                st.rerun()
+
     except Exception as e:
         st.error(f"Error loading feedback: {str(e)}")
         logging.error(f"Feedback tab error: {str(e)}", exc_info=True)
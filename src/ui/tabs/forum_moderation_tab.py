@@ -1,14 +1,14 @@
 import streamlit as st
 
-from services.community_forum_service import CommunityForumService
+from services.community_forum_service import MAX_THREAD_SEARCH_MATCHES, CommunityForumService
 from services.community_service import CommunityService
 
 
 def render():
     st.header("Forum Moderation")
 
-    forum_service = CommunityForumService()
-    community_service = CommunityService()
+    forum_service = st.session_state.community_forum_service
+    community_service = st.session_state.community_service
 
     try:
         stats = forum_service.get_forum_stats()
@@ -78,11 +78,18 @@ def render_all_threads(forum_service: CommunityForumService, community_service:
             pass
 
     try:
-        threads = forum_service.get_threads(
+        page = forum_service.get_thread_page(
             limit=limit,
             search=search if search else None,
             community_id=community_id,
         )
+        threads = page['threads']
+
+        if page['search_truncated']:
+            st.warning(
+                f"More than {MAX_THREAD_SEARCH_MATCHES} threads match this search; only the best "
+                "matches are listed, so newer threads may be missing. Narrow the search to see them."
+            )
 
         if not threads:
             st.info("No threads found")
@@ -151,41 +158,7 @@ def render_all_threads(forum_service: CommunityForumService, community_service:
                     st.markdown("---")
                     st.write("**💬 Replies:**")
                     try:
-                        replies = forum_service.get_thread_replies(thread['id'])
-                        if replies:
-                            for reply in replies:
-                                reported_badge_reply = "🚩 " if reply.get('is_reported') else ""
-                                parent_info = f" (replying to {reply['parent_author']})" if reply.get('parent_author') else ""
-
-                                with st.container():
-                                    st.markdown(f"---")
-                                    col_r1, col_r2 = st.columns([3, 1])
-                                    with col_r1:
-                                        st.write(f"{reported_badge_reply}**{reply['owner_name']}**{parent_info} - {reply['created_at']}")
-                                        st.write(reply['body'])
-                                        st.caption(f"👍 {reply['upvote_count']} upvotes")
-                                    with col_r2:
-                                        if st.button("🗑️", key=f"delete_reply_{reply['id']}"):
-                                            st.session_state[f"confirm_delete_reply_{reply['id']}"] = True
-
-                                if st.session_state.get(f"confirm_delete_reply_{reply['id']}", False):
-                                    reason_r = st.text_input(
-                                        "Reason for deletion",
-                                        key=f"delete_reason_reply_{reply['id']}",
-                                    )
-                                    if st.button("Confirm Delete Reply", key=f"confirm_delete_reply_btn_{reply['id']}"):
-                                        if reason_r and len(reason_r) >= 5:
-                                            try:
-                                                forum_service.delete_reply(reply['id'], reason_r)
-                                                st.success("Reply deleted")
-                                                st.session_state[f"confirm_delete_reply_{reply['id']}"] = False
-                                                st.rerun()
-                                            except Exception as e:
-                                                st.error(f"Error: {str(e)}")
-                                        else:
-                                            st.error("Reason must be at least 5 characters")
-                        else:
-                            st.info("No replies yet")
+                        render_reply_tree(forum_service, thread['id'])
                     except Exception as e:
                         st.error(f"Error loading replies: {str(e)}")
 
@@ -193,6 +166,78 @@ def render_all_threads(forum_service: CommunityForumService, community_service:
         st.error(f"Error loading threads: {str(e)}")
 
 
+REPLY_TREE_DEPTH = 4
+REPLY_PAGE_SIZE = 20
+
+
+def render_reply_tree(forum_service: CommunityForumService, thread_id: int, parent_id=None, level: int = 0):
+    branch = parent_id if parent_id is not None else "root"
+    limit_key = f"reply_limit_{thread_id}_{branch}"
+    limit = st.session_state.get(limit_key, REPLY_PAGE_SIZE)
+
+    tree = forum_service.get_thread_reply_tree(
+        thread_id, parent_id=parent_id, max_depth=REPLY_TREE_DEPTH, limit=limit
+    )
+    if not tree['replies']:
+        st.info("No replies yet")
+        return
+
+    for reply in tree['replies']:
+        render_reply(forum_service, thread_id, reply, level)
+
+    if tree['has_more']:
+        remaining = tree['total'] - limit
+        if st.button(f"Show more replies ({remaining} left)", key=f"more_{limit_key}"):
+            st.session_state[limit_key] = limit + REPLY_PAGE_SIZE
+            st.rerun()
+
+
+def render_reply(forum_service: CommunityForumService, thread_id: int, reply, level: int = 0):
+    reported_badge_reply = "🚩 " if reply.get('is_reported') else ""
+    parent_info = f" (replying to {reply['parent_author']})" if reply.get('parent_author') else ""
+    indent = "↳ " * level
+
+    with st.container():
+        st.markdown(f"---")
+        col_r1, col_r2 = st.columns([3, 1])
+        with col_r1:
+            st.write(f"{indent}{reported_badge_reply}**{reply['owner_name']}**{parent_info} - {reply['created_at']}")
+            st.write(reply['body'])
+            st.caption(f"👍 {reply['upvote_count']} upvotes")
+        with col_r2:
+            if st.button("🗑️", key=f"delete_reply_{reply['id']}"):
+                st.session_state[f"confirm_delete_reply_{reply['id']}"] = True
+
+    if st.session_state.get(f"confirm_delete_reply_{reply['id']}", False):
+        reason_r = st.text_input(
+            "Reason for deletion",
+            key=f"delete_reason_reply_{reply['id']}",
+        )
+        if st.button("Confirm Delete Reply", key=f"confirm_delete_reply_btn_{reply['id']}"):
+            if reason_r and len(reason_r) >= 5:
+                try:
+                    forum_service.delete_reply(reply['id'], reason_r)
+                    st.success("Reply deleted")
+                    st.session_state[f"confirm_delete_reply_{reply['id']}"] = False
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Error: {str(e)}")
+            else:
+                st.error("Reason must be at least 5 characters")
+
+    for child in reply['children']:
+        render_reply(forum_service, thread_id, child, level + 1)
+
+    # Branch cut off at the depth limit: load it on demand
+    if reply['child_count'] and not reply['children']:
+        expand_key = f"expand_reply_{reply['id']}"
+        if st.session_state.get(expand_key, False):
+            render_reply_tree(forum_service, thread_id, parent_id=reply['id'], level=level + 1)
+        elif st.button(f"{'↳ ' * (level + 1)}Show {reply['child_count']} replies", key=f"expand_btn_{reply['id']}"):
+            st.session_state[expand_key] = True
+            st.rerun()
+
+
 def render_reported_content(forum_service: CommunityForumService):
     st.subheader("Reported Forum Content")
 
@@ -269,58 +314,91 @@ def render_reported_content(forum_service: CommunityForumService):
 def render_search(forum_service: CommunityForumService):
     st.subheader("Search Forum Content")
 
-    col1, col2 = st.columns([3, 1])
+    col1, col2, col3, col4 = st.columns([3, 1, 1, 1])
     with col1:
         keyword = st.text_input(
             "Search keyword",
-            placeholder="Search threads and replies...",
+            placeholder='Words, "exact phrase" or prefix*...',
             key="forum_search",
         )
     with col2:
-        limit = st.number_input("Max results", min_value=20, max_value=200, value=50, step=10, key="forum_search_limit")
+        limit = st.number_input("Per page", min_value=20, max_value=200, value=50, step=10, key="forum_search_limit")
+    with col3:
+        content_type = st.selectbox("Type", ["all", "thread", "reply"], key="forum_search_type")
+    with col4:
+        order = st.selectbox("Sort by", ["relevance", "newest"], key="forum_search_order")
 
     if st.button("🔍 Search", type="primary"):
         if not keyword or len(keyword) < 2:
             st.error("Search keyword must be at least 2 characters")
             return
+        st.session_state.forum_search_request = (keyword, limit, content_type, order)
+        st.session_state.forum_search_cursors = [None]
 
-        try:
-            results = forum_service.search_forum_content(keyword, limit=limit)
+    if "forum_search_request" not in st.session_state:
+        return
 
-            if not results:
-                st.info(f"No content found containing '{keyword}'")
-                return
+    keyword, limit, content_type, order = st.session_state.forum_search_request
+    cursors = st.session_state.forum_search_cursors
 
-            st.success(f"Found {len(results)} results")
+    try:
+        page = forum_service.search_forum_page(
+            keyword,
+            limit=limit,
+            cursor=cursors[-1],
+            order=order,
+            content_type=None if content_type == "all" else content_type,
+        )
+        results = page['results']
 
-            for result in results:
-                type_icon = "📝" if result['type'] == "thread" else "💬"
-                reported_badge = "🚩 " if result.get('is_reported') else ""
+        if not page['index_complete']:
+            st.warning("The search index is still catching up with recent posts; results may be incomplete.")
 
-                if result['type'] == "thread":
-                    title = f"{type_icon} {reported_badge}{result['title']}"
-                else:
-                    title = f"{type_icon} {reported_badge}Reply in '{result['thread_title']}'"
+        if not results:
+            st.info(f"No content found matching '{keyword}'")
+            return
 
-                with st.expander(title):
-                    st.write(f"**Type:** {result['type'].title()}")
-                    st.write(f"**Author:** {result['owner_name']}")
+        st.success(f"Page {len(cursors)}: {len(results)} results")
 
-                    if result['type'] == "thread":
-                        st.write(f"**Community:** {result['community_name']}")
+        for result in results:
+            type_icon = "📝" if result['type'] == "thread" else "💬"
+            reported_badge = "🚩 " if result.get('is_reported') else ""
 
-                    st.write(f"**Created:** {result['created_at']}")
+            if result['type'] == "thread":
+                title = f"{type_icon} {reported_badge}{result['title']}"
+            else:
+                title = f"{type_icon} {reported_badge}Reply in '{result['thread_title']}'"
 
-                    st.text_area(
-                        "Content",
-                        value=result['body'],
-                        height=100,
-                        key=f"search_result_{result['type']}_{result['id']}",
-                        disabled=True,
-                    )
+            with st.expander(title):
+                st.write(f"**Type:** {result['type'].title()}")
+                st.write(f"**Author:** {result['owner_name']}")
 
-        except Exception as e:
-            st.error(f"Error searching: {str(e)}")
+                if result['type'] == "thread":
+                    st.write(f"**Community:** {result['community_name']}")
+
+                st.write(f"**Created:** {result['created_at']}")
+                st.markdown(f"**Match:** {result['snippet']}")
+
+                st.text_area(
+                    "Content",
+                    value=result['body'],
+                    height=100,
+                    key=f"search_result_{result['type']}_{result['id']}",
+                    disabled=True,
+                )
+
+        col_prev, col_next = st.columns(2)
+        with col_prev:
+            if len(cursors) > 1 and st.button("⬅️ Previous page", key="forum_search_prev"):
+                cursors.pop()
+                st.rerun()
+        with col_next:
+            if page['next_cursor'] and st.button("Next page ➡️", key="forum_search_next"):
+                cursors.append(page['next_cursor'])
+                st.rerun()
+
+    except Exception as e:
+        st.error(f"Error searching: {str(e)}")
 
 
 def render_members(forum_service: CommunityForumService, community_service: CommunityService):
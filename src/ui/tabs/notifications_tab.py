@@ -1,5 +1,6 @@
 import streamlit as st
 import json
+from datetime import timedelta
 from ui.error_handler import UIErrorHandler
 
 
@@ -27,6 +28,14 @@ def notifications_tab():
         min_user_id = st.number_input("Min User ID (optional)", min_value=0, value=0)
         max_user_id = st.number_input("Max User ID (optional)", min_value=0, value=0)
 
+    filters = {
+        "language": language,
+        "reg_complete": reg_complete,
+        "min_user_id": min_user_id if min_user_id > 0 else None,
+        "max_user_id": max_user_id if max_user_id > 0 else None
+    }
+    filters.update(_more_filters())
+
     st.divider()
 
     col1, col2 = st.columns(2)
@@ -36,31 +45,47 @@ def notifications_tab():
             if not title or not body:
                 st.error("Title and message are required")
             else:
-                _preview_recipients(title, body, screen, language, reg_complete, min_user_id, max_user_id)
+                _preview_recipients(title, body, screen, filters)
 
     with col2:
         if st.button("🚀 Send to All", type="primary", use_container_width=True):
             if not title or not body:
                 st.error("Title and message are required")
             else:
-                filters = {
-                    "language": language,
-                    "reg_complete": reg_complete,
-                    "min_user_id": min_user_id if min_user_id > 0 else None,
-                    "max_user_id": max_user_id if max_user_id > 0 else None
-                }
                 _send_notifications(title, body, screen, filters)
 
+    st.divider()
+    _render_jobs()
+
+
+def _more_filters():
+    with st.expander("More filters"):
+        col1, col2 = st.columns(2)
+
+        with col1:
+            use_created = st.checkbox("Filter by sign-up date")
+            created = st.date_input("Signed up between", value=(), disabled=not use_created)
+            use_active = st.checkbox("Filter by last activity")
+            active_since = st.date_input("Active since", disabled=not use_active)
+
+        with col2:
+            cities = st.text_input("Cities (comma-separated)", placeholder="Amsterdam, Utrecht")
+            ambassadors = st.checkbox("Only ambassadors")
+
+    filters = {
+        "cities": [c.strip() for c in cities.split(",") if c.strip()],
+        "is_ambassador": ambassadors,
+    }
+    if use_created and len(created) == 2:
+        filters["created_after"] = created[0].isoformat()
+        filters["created_before"] = (created[1] + timedelta(days=1)).isoformat()
+    if use_active:
+        filters["active_since"] = active_since.isoformat()
+    return filters
 
-def _preview_recipients(title, body, screen, language, reg_complete, min_user_id, max_user_id):
-    try:
-        filters = {
-            "language": language,
-            "reg_complete": reg_complete,
-            "min_user_id": min_user_id if min_user_id > 0 else None,
-            "max_user_id": max_user_id if max_user_id > 0 else None
-        }
 
+def _preview_recipients(title, body, screen, filters):
+    try:
         recipient_count = st.session_state.notification_service.get_recipient_count(filters)
 
         st.success(f"✓ Found {recipient_count} users matching filters")
@@ -79,17 +104,61 @@ def _send_notifications(title, body, screen, filters):
     try:
         data = {"screen": screen} if screen != "None" else {}
 
-        result = st.session_state.notification_service.send_bulk_notification(
-            title, body, data, filters
+        job_id = st.session_state.notification_service.create_notification_job(
+            title, body, data, filters, created_by=st.session_state.get("username", "unknown")
         )
 
-        st.success(f"✓ Sent {result['sent']} notifications successfully")
+        st.success(f"✓ Notification job #{job_id} queued; progress is shown below")
+
+    except Exception as e:
+        st.error(f"Failed to queue notifications: {str(e)}")
+
 
-        if result['failed'] > 0:
-            st.warning(f"⚠ {result['failed']} notifications failed")
+def _render_jobs():
+    st.subheader("Notification Jobs")
 
+    st.button("🔄 Refresh", key="refresh_notification_jobs")
+
+    try:
+        jobs = st.session_state.notification_service.get_notification_jobs(limit=10)
     except Exception as e:
-        st.error(f"Failed to send notifications: {str(e)}")
+        st.error(f"Error loading jobs: {str(e)}")
+        return
+
+    if not jobs:
+        st.info("No notification jobs yet")
+        return
+
+    for job in jobs:
+        status_icon = {
+            "queued": "⏳",
+            "running": "📤",
+            "completed": "✅",
+            "failed": "❌",
+            "cancelled": "⛔",
+        }.get(job['status'], "•")
+
+        with st.container():
+            st.write(f"{status_icon} **#{job['id']} {job['title']}** - {job['status']} (by {job['created_by']}, {job['created_at']})")
+            st.progress(job['progress'], text=f"{job['sent']} sent, {job['failed']} failed of {job['total']}")
+
+            if job['errors']:
+                st.caption(", ".join(f"{error}: {count}" for error, count in job['errors'].items()))
+            if job['last_error']:
+                st.caption(f"Last error: {job['last_error']}")
+
+            if job['status'] in ("queued", "running"):
+                if st.button("Cancel", key=f"cancel_job_{job['id']}"):
+                    st.session_state.notification_service.cancel_notification_job(job['id'])
+                    st.rerun()
+            elif job['status'] in ("failed", "cancelled"):
+                if st.button("Resume", key=f"resume_job_{job['id']}"):
+                    st.session_state.notification_service.resume_notification_job(job['id'])
+                    st.rerun()
+
+    # Jobs run on the background worker; polling is a click, never a blocking rerun loop
+    if any(job['status'] in ("queued", "running") for job in jobs):
+        st.caption("Jobs are sending in the background. Press Refresh to update their progress.")
 
 
 def _send_test_notifications(title, body, screen, filters):
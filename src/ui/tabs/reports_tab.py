@@ -3,6 +3,7 @@
 import streamlit as st
 
 from core.security import security_validator
+from services.moderation_service import REPORT_PAGE_SIZE
 
 
 def reports_tab():
@@ -21,24 +22,24 @@ def reports_tab():
         st.error("Invalid search query. Please check your input.")
         return
 
-    try:
-        reports = st.session_state.moderation_service.get_pending_reports()
+    if st.session_state.get("report_search") != search_query:
+        st.session_state.report_search = search_query
+        st.session_state.report_offset = 0
+    offset = st.session_state.get("report_offset", 0)
 
-        if search_query:
-            reports = [
-                r
-                for r in reports
-                if search_query.lower() in r.get("reported_user", "").lower()
-                or search_query in str(r.get("reported_user_id", ""))
-            ]
+    try:
+        page = st.session_state.moderation_service.get_report_page(
+            search=search_query, limit=REPORT_PAGE_SIZE, offset=offset
+        )
+        reports = page["reports"]
 
         if not reports:
             st.info("No reports found.")
             return
 
-       
-        if reports:
-            st.info(f"Found {len(reports)} reports")
+        st.info(
+            f"Found {page['total']} reports (showing {offset + 1}-{offset + len(reports)})"
+        )
 
         for report in reports:
             report_count = report.get("report_count", 1)
@@ -76,6 +77,16 @@ def reports_tab():
                         else:
                             st.error("User not found")
 
+        col1, col2 = st.columns(2)
+        with col1:
+            if offset > 0 and st.button("← Previous", key="reports_prev"):
+                st.session_state.report_offset = max(0, offset - REPORT_PAGE_SIZE)
+                st.rerun()
+        with col2:
+            if page["has_more"] and st.button("Next →", key="reports_next"):
+                st.session_state.report_offset = offset + REPORT_PAGE_SIZE
+                st.rerun()
+
     except Exception as e:
         st.error(f"Error loading reports: {str(e)}")
 
@@ -90,7 +101,8 @@ def show_compact_user_info(user, report_details):
         st.write(f"**Email:** {user['email']}")
     with col2:
         st.write(f"**Total Reports:** {report_details['report_count']}")
-        st.write(f"**Message Count:** {user['message_count']}")
+        message_count = user["message_count"]
+        st.write(f"**Message Count:** {'—' if message_count is None else message_count}")
 
    
     if report_details["reporters"]:
@@ -56,7 +56,18 @@ def _render_user_activities_section():
 def show_user_activities(user):
     st.subheader(f"Activities for {user['username']}")
 
-    activities = st.session_state.user_service.get_user_activities(user['id'])
+    # A different user starts again from the first page
+    if st.session_state.get("user_activities_user_id") != user['id']:
+        st.session_state.user_activities_user_id = user['id']
+        st.session_state.user_activities_cursors = [None]
+        st.session_state.user_activities_total = None
+    cursors = st.session_state.user_activities_cursors
+
+    page = st.session_state.user_service.get_user_activity_page(user['id'], cursor=cursors[-1])
+    activities = page['activities']
+    # Only the first page carries the total; keep it while paging on
+    if page['total'] is not None:
+        st.session_state.user_activities_total = page['total']
 
     if not activities:
         st.info("No activities found for this user.")
@@ -64,12 +75,24 @@ def show_user_activities(user):
 
     activity_messages = st.session_state.user_service.get_user_activity_messages(user['id'])
 
-    st.metric("Total Activities", len(activities))
+    total = st.session_state.get("user_activities_total")
+    st.metric("Total Activities", total if total is not None else len(activities))
+    st.caption(f"Page {len(cursors)} · {len(activities)} activities on this page")
     st.divider()
 
     for activity in activities:
         _render_activity_card(activity, user['id'], activity_messages)
 
+    col1, col2 = st.columns(2)
+    with col1:
+        if len(cursors) > 1 and st.button("⬅️ Previous page", key="user_activities_prev"):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        if page['has_more'] and st.button("Next page ➡️", key="user_activities_next"):
+            cursors.append(page['next_cursor'])
+            st.rerun()
+
 
 def _render_activity_card(activity, user_id, activity_messages):
     status_emoji = "👑" if activity['is_owner'] else "👤"
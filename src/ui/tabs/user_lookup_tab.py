@@ -6,6 +6,8 @@ from core.security import security_validator
 from ui.components import display_search_form
 from ui.error_handler import UIErrorHandler
 
+TYPEAHEAD_SEARCH = "Name, email or phone"
+
 
 def user_lookup_tab():
     """Handle user lookup tab"""
@@ -24,6 +26,10 @@ def _render_search_section():
     """Render the search form and handle search logic"""
     search_type, search_value, search_button = display_search_form()
 
+    if search_type == TYPEAHEAD_SEARCH:
+        _render_typeahead_matches(search_value)
+        return
+
     if search_button and search_value:
         if not security_validator.validate_search_query(search_value):
             st.error("Invalid search query. Please check your input.")
@@ -32,6 +38,35 @@ def _render_search_section():
         _perform_user_search(search_type, search_value)
 
 
+def _render_typeahead_matches(search_value: str):
+    """List users whose name, email or phone starts with the typed text"""
+    if not search_value:
+        return
+
+    # Matched in memory, so the text never reaches SQL
+    matches = UIErrorHandler.handle_service_call(
+        lambda: st.session_state.user_service.search_users(search_value),
+        default_return=[],
+    )
+    if not matches:
+        if st.session_state.user_service.is_typeahead_loaded():
+            st.info("No matching users")
+        else:
+            st.info("User search is still loading; try again in a moment or look the user up by ID")
+        return
+
+    for match in matches:
+        if st.button(
+            f"{match['name']} (ID: {match['id']})",
+            key=f"typeahead_{match['id']}",
+            use_container_width=True,
+        ):
+            _perform_user_search("User ID", str(match["id"]))
+        details = " · ".join(value for value in (match["email"], match["phone"]) if value)
+        if details:
+            st.caption(details)
+
+
 def _perform_user_search(search_type: str, search_value: str):
     """Perform user search and update session state"""
     try:
@@ -0,0 +1,67 @@
+"""Bounded thread-pool fan-out for independent database reads"""
+
+import logging
+import os
+from concurrent.futures import (
+    ALL_COMPLETED,
+    FIRST_EXCEPTION,
+    ThreadPoolExecutor,
+    wait,
+)
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Shared by all sessions so concurrent reads stay within the connection pool
+FANOUT_WORKERS = int(os.getenv("DB_FANOUT_WORKERS", "8"))
+
+_executor = ThreadPoolExecutor(
+    max_workers=FANOUT_WORKERS, thread_name_prefix="db-fanout"
+)
+
+
+def fan_out(
+    tasks: Dict[str, Callable[[], Any]],
+    timeout: Optional[float] = None,
+    fail_fast: bool = False,
+    executor: Optional[ThreadPoolExecutor] = None,
+) -> Tuple[Dict[str, Any], Dict[str, Exception]]:
+    """
+    Run independent callables concurrently and collect their results
+
+    Args:
+        tasks: Mapping of result name to a zero-argument callable
+        timeout: Seconds to wait before giving up on unfinished tasks
+        fail_fast: Stop waiting as soon as one task raises
+        executor: Pool to run on instead of the shared one
+
+    Returns:
+        Tuple of (results, failures). Tasks still running at the deadline are
+        reported as TimeoutError failures; their late results are discarded.
+        Tasks that already started cannot be cancelled: they keep their
+        worker (and database connection) until they finish.
+    """
+    pool = executor or _executor
+    futures = {pool.submit(task): name for name, task in tasks.items()}
+    done, not_done = wait(
+        futures,
+        timeout=timeout,
+        return_when=FIRST_EXCEPTION if fail_fast else ALL_COMPLETED,
+    )
+
+    results, failures = {}, {}
+    for future in done:
+        name = futures[future]
+        error = future.exception()
+        if error is not None:
+            failures[name] = error
+        else:
+            results[name] = future.result()
+
+    for future in not_done:
+        name = futures[future]
+        future.cancel()
+        failures[name] = TimeoutError(f"{name} did not finish within {timeout}s")
+        logger.warning(f"Fan-out task {name} exceeded {timeout}s deadline")
+
+    return results, failures
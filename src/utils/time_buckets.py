@@ -0,0 +1,102 @@
+"""Time bucketing helpers shared by analytics queries and rollups"""
+
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+
+from sqlalchemy import func, literal_column
+
+GRANULARITIES = ("hour", "day", "week", "month")
+
+# Key formats shared by Python zero-filling and MySQL DATE_FORMAT
+BUCKET_FORMATS = {
+    "hour": "%Y-%m-%d %H:00",
+    "day": "%Y-%m-%d",
+    "week": "%Y-%m-%d",
+    "month": "%Y-%m",
+}
+
+
+def as_datetime(value) -> datetime:
+    """Convert a date (or ISO string) to midnight; datetimes are returned unchanged"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        return value
+    return datetime(value.year, value.month, value.day)
+
+
+def bucket_start(value: datetime, granularity: str) -> datetime:
+    """Truncate a datetime to the start of its bucket"""
+    if granularity == "hour":
+        return value.replace(minute=0, second=0, microsecond=0)
+
+    day = value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(value: datetime, granularity: str) -> datetime:
+    if granularity == "hour":
+        return value + timedelta(hours=1)
+    if granularity == "week":
+        return value + timedelta(weeks=1)
+    if granularity == "month":
+        if value.month == 12:
+            return value.replace(year=value.year + 1, month=1)
+        return value.replace(month=value.month + 1)
+    return value + timedelta(days=1)
+
+
+def iter_buckets(start: datetime, end: datetime, granularity: str) -> List[datetime]:
+    """All bucket start times between start (inclusive) and end (exclusive)"""
+    buckets = []
+    current = bucket_start(start, granularity)
+    while current < end:
+        buckets.append(current)
+        current = next_bucket(current, granularity)
+    return buckets
+
+
+def bucket_key(value, granularity: str) -> str:
+    return as_datetime(value).strftime(BUCKET_FORMATS[granularity])
+
+
+def day_range(start: date, end: date) -> List[date]:
+    """All days between start (inclusive) and end (exclusive)"""
+    return [start + timedelta(days=i) for i in range((end - start).days)]
+
+
+def bucket_expr(column, granularity: str):
+    """SQL expression producing the same key as bucket_key for a datetime column"""
+    if granularity == "week":
+        column = func.subdate(func.date(column), func.weekday(column))
+    return func.date_format(column, BUCKET_FORMATS[granularity])
+
+
+def count_by_bucket(
+    db,
+    column,
+    start: datetime,
+    end: datetime,
+    granularity: str,
+    unix: bool = False,
+    filters: tuple = (),
+) -> Dict[str, int]:
+    """Count rows per bucket with a single GROUP BY query"""
+    if unix:
+        lower, upper = int(start.timestamp()), int(end.timestamp())
+        bucket = bucket_expr(func.from_unixtime(column), granularity)
+    else:
+        lower, upper = start, end
+        bucket = bucket_expr(column, granularity)
+
+    rows = (
+        db.query(bucket.label("bucket"), func.count().label("total"))
+        .filter(column >= lower, column < upper, *filters)
+        .group_by(literal_column("bucket"))
+        .all()
+    )
+    return {row.bucket: int(row.total) for row in rows}
@@ -0,0 +1,55 @@
+"""In-memory SQLite stand-in for DatabaseService used by service tests"""
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from core.models import Base
+
+
+def _parse(value):
+    return datetime.fromisoformat(value) if value is not None else None
+
+
+def _add_mysql_functions(dbapi_connection, _record):
+    """The MySQL date functions used by utils.time_buckets, in Python"""
+    dbapi_connection.create_function(
+        "date_format", 2, lambda value, fmt: _parse(value).strftime(fmt) if value else None
+    )
+    dbapi_connection.create_function(
+        "from_unixtime", 1, lambda ts: str(datetime.fromtimestamp(ts)) if ts is not None else None
+    )
+    dbapi_connection.create_function(
+        "weekday", 1, lambda value: _parse(value).weekday() if value else None
+    )
+    dbapi_connection.create_function(
+        "subdate",
+        2,
+        lambda value, days: str(date.fromisoformat(value[:10]) - timedelta(days=days)) if value else None,
+    )
+
+
+class SQLiteDatabaseService:
+    """In-memory stand-in exposing the DatabaseService session API"""
+
+    def __init__(self, models):
+        self.engine = create_engine(
+            "sqlite://",
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+        event.listen(self.engine, "connect", _add_mysql_functions)
+        Base.metadata.create_all(
+            self.engine, tables=[model.__table__ for model in models]
+        )
+        self.SessionLocal = sessionmaker(bind=self.engine)
+
+    @contextmanager
+    def get_session(self):
+        session = self.SessionLocal()
+        try:
+            yield session
+        finally:
+            session.close()
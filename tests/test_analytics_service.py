@@ -0,0 +1,169 @@
+"""Tests for the grouped activity time series in AnalyticsService"""
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+import services.rollup_service as rollup_service
+from core.models import (
+    Activity,
+    CommunityThread,
+    CommunityThreadReply,
+    DailyRollup,
+    IndMessage,
+    Message,
+    User,
+    UserReport,
+    Watermark,
+)
+from services.analytics_service import AnalyticsService
+from services.rollup_service import RollupService
+from tests.sqlite_db import SQLiteDatabaseService
+from utils.exceptions import ValidationError
+from utils.time_buckets import bucket_start
+
+ANALYTICS_MODELS = [
+    User,
+    Message,
+    IndMessage,
+    Activity,
+    CommunityThread,
+    CommunityThreadReply,
+    UserReport,
+    Watermark,
+    DailyRollup,
+]
+
+
+def unix(value: datetime) -> int:
+    return int(value.timestamp())
+
+
+def series(rows):
+    """Bucket key -> (active users, new users, messages, activities)"""
+    return {
+        row["date"]: (row["active_users"], row["new_users"], row["messages"], row["activities"])
+        for row in rows
+    }
+
+
+class TestActivityAnalytics:
+    """Test cases for get_activity_analytics"""
+
+    def setup_method(self):
+        self.db_service = SQLiteDatabaseService(ANALYTICS_MODELS)
+        self.rollups = RollupService.__new__(RollupService)
+        self.rollups.db_service = self.db_service
+
+        self.service = AnalyticsService.__new__(AnalyticsService)
+        self.service.db_service = self.db_service
+        self.service.rollup_service = self.rollups
+
+    def add(self, *rows):
+        with self.db_service.get_session() as db:
+            db.add_all(rows)
+            db.commit()
+
+    def add_march(self):
+        self.add(
+            User(id=1, created_at=datetime(2025, 3, 3, 9, 15), last_active=datetime(2025, 3, 5, 14)),
+            User(id=2, created_at=datetime(2025, 3, 3, 9, 45), last_active=datetime(2025, 3, 31, 23, 30)),
+            User(id=3, created_at=datetime(2025, 4, 1)),  # the end, excluded
+            Message(chat_id=1, content="a", timestamp=unix(datetime(2025, 3, 3, 9, 10))),
+            Message(chat_id=1, content="b", timestamp=unix(datetime(2025, 3, 3, 10, 59))),
+            IndMessage(ind_chat_id=1, content="d", timestamp=unix(datetime(2025, 3, 5, 14, 20))),
+            Activity(id=1, owner_id=1, created_at=datetime(2025, 3, 10)),
+        )
+
+    def test_hourly_buckets_use_one_grouped_query_per_table(self):
+        self.add_march()
+        statements = []
+        event.listen(
+            self.db_service.engine, "before_cursor_execute",
+            lambda *args: statements.append(args[2]),
+        )
+
+        rows = self.service.get_activity_analytics(
+            start=datetime(2025, 3, 3, 9, 30), end=datetime(2025, 3, 3, 12), granularity="hour"
+        )
+
+        # The start is truncated to its hour, so 09:10 and 09:15 still count
+        assert series(rows) == {
+            "2025-03-03 09:00": (0, 2, 1, 0),
+            "2025-03-03 10:00": (0, 0, 1, 0),
+            "2025-03-03 11:00": (0, 0, 0, 0),
+        }
+        assert rows[0]["day_name"] == "Monday"
+        assert len(statements) == 5
+
+    @pytest.mark.parametrize(
+        "granularity, expected",
+        [
+            ("week", {
+                "2025-03-03": (1, 2, 3, 0),
+                "2025-03-10": (0, 0, 0, 1),
+                "2025-03-17": (0, 0, 0, 0),
+                "2025-03-24": (0, 0, 0, 0),
+                "2025-03-31": (1, 0, 0, 0),
+            }),
+            ("month", {"2025-03": (2, 2, 3, 1)}),
+        ],
+    )
+    def test_coarse_buckets_are_zero_filled(self, granularity, expected):
+        """Before any rollup exists every bucket is counted live"""
+        self.add_march()
+
+        rows = self.service.get_activity_analytics(
+            start=date(2025, 3, 3), end=date(2025, 4, 1), granularity=granularity
+        )
+
+        assert series(rows) == expected
+
+    def test_days_cover_the_range_and_default_to_90(self):
+        rows = self.service.get_activity_analytics()
+
+        assert len(rows) == 90
+        assert rows[-1]["date"] == date.today().isoformat()
+        assert set(series(rows).values()) == {(0, 0, 0, 0)}
+
+        rows = self.service.get_activity_analytics(start=date(2024, 2, 27), end=date(2024, 3, 2))
+        assert [row["date"] for row in rows] == ["2024-02-27", "2024-02-28", "2024-02-29", "2024-03-01"]
+
+    def test_rollups_and_live_counts_agree(self, monkeypatch):
+        """Weeks summed from daily rollups match the same weeks counted live"""
+        monkeypatch.setattr(rollup_service, "ROLLUP_REFRESH_INTERVAL", 0)
+        today = datetime.combine(date.today(), datetime.min.time())
+        self.add(*(
+            row
+            for days in range(0, 40, 3)
+            for row in (
+                User(created_at=today - timedelta(days=days, hours=-9), last_active=today - timedelta(days=days // 2)),
+                Message(chat_id=1, content="m", timestamp=unix(today - timedelta(days=days, hours=-20))),
+                Activity(owner_id=1, created_at=today - timedelta(days=days, hours=-1)),
+            )
+        ))
+        start = today - timedelta(days=30)
+
+        live = self.service.get_activity_analytics(start=start, granularity="week")
+        self.rollups.backfill(10)  # rollups for the newest days, live before them
+        partial = self.service.get_activity_analytics(start=start, granularity="week")
+        self.rollups.backfill(60)
+        rolled = self.service.get_activity_analytics(start=start, granularity="week")
+
+        assert series(live) == series(partial) == series(rolled)
+        # The range starts at the Monday on or before `start`
+        first_week = bucket_start(start, "week")
+        created = [today - timedelta(days=days, hours=-9) for days in range(0, 40, 3)]
+        assert sum(row["new_users"] for row in live) == sum(day >= first_week for day in created)
+
+    @pytest.mark.parametrize(
+        "kwargs, message",
+        [
+            ({"granularity": "minute"}, "Invalid granularity"),
+            ({"start": date(2025, 3, 2), "end": date(2025, 3, 1)}, "Start date must be before"),
+            ({"start": date(2024, 1, 1), "end": date(2025, 1, 1), "granularity": "hour"}, "too large"),
+        ],
+    )
+    def test_rejects_bad_ranges(self, kwargs, message):
+        with pytest.raises(ValidationError, match=message):
+            self.service.get_activity_analytics(**kwargs)
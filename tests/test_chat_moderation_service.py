@@ -0,0 +1,134 @@
+"""Tests for chat listings and keyset message paging in ChatModerationService"""
+import pytest
+import streamlit
+from sqlalchemy import event
+
+from core.models import (
+    Activity,
+    ChatMeta,
+    ChatUserActivity,
+    IndChats,
+    IndMessage,
+    Message,
+    User,
+)
+from services.chat_moderation_service import ChatModerationService
+from tests.sqlite_db import SQLiteDatabaseService
+from utils.exceptions import ValidationError
+
+
+def count_statements(db_service):
+    statements = []
+    event.listen(
+        db_service.engine, "before_cursor_execute",
+        lambda *args: statements.append(args[2]),
+    )
+    return statements
+
+
+class TestChatListings:
+    """Test cases for get_activity_chats and get_individual_chats"""
+
+    def setup_method(self):
+        self.db_service = SQLiteDatabaseService(
+            [User, Activity, ChatMeta, ChatUserActivity, Message, IndChats, IndMessage]
+        )
+        with self.db_service.get_session() as db:
+            db.add_all([User(id=1, name="Ann"), User(id=2, name="Ben")])
+            db.add_all([Activity(id=1, city="Gent"), Activity(id=2, city="Brussel")])
+            db.add_all(
+                ChatMeta(id=i, activity_id=i if i < 3 else None, activity_name=f"a{i}", last_timestamp=1000 + i)
+                for i in range(1, 5)
+            )
+            db.add_all(
+                ChatUserActivity(chat_id=chat, user_id=user, active=active)
+                for chat, user, active in [(1, 1, True), (1, 2, False), (3, 1, True), (3, 2, True)]
+            )
+            db.add_all(Message(chat_id=chat, sender_id=1, content="m", timestamp=1) for chat in (1, 3, 3, 3))
+            db.add_all([
+                IndChats(id=1, activity_owner_id=1, receiver_id=2, activity_name="d1", last_timestamp=5),
+                IndChats(id=2, activity_owner_id=2, receiver_id=99, activity_name="d2", last_timestamp=9),
+                IndChats(id=3, activity_owner_id=1, receiver_id=2, last_message="x" * 120, last_timestamp=7),
+            ])
+            db.add_all(IndMessage(ind_chat_id=chat, sender_id=1, content="d", timestamp=1) for chat in (1, 1, 3))
+            db.commit()
+
+        self.service = ChatModerationService.__new__(ChatModerationService)
+        self.service.db_service = self.db_service
+
+    def test_activity_chat_counts_are_grouped_per_page(self, monkeypatch):
+        """The page, active member counts and message counts are three statements"""
+        monkeypatch.setattr(streamlit, "session_state", {})
+        statements = count_statements(self.db_service)
+
+        chats = self.service.get_activity_chats(limit=3)
+
+        assert [(c["id"], c["member_count"], c["message_count"]) for c in chats] == [
+            (4, 0, 0), (3, 2, 3), (2, 0, 0),
+        ]
+        assert (chats[2]["activity_city"], chats[0]["activity_city"]) == ("Brussel", None)
+        assert len(statements) == 3
+
+        older = self.service.get_activity_chats(limit=3, offset=3)
+        assert [(c["id"], c["member_count"], c["message_count"]) for c in older] == [(1, 1, 1)]
+
+    def test_individual_chat_counts_are_grouped_per_page(self):
+        statements = count_statements(self.db_service)
+
+        chats = self.service.get_individual_chats()
+
+        assert [(c["id"], c["message_count"]) for c in chats] == [(2, 0), (3, 1), (1, 2)]
+        assert (chats[0]["owner_name"], chats[0]["receiver_name"]) == ("Ben", "Unknown")
+        assert chats[1]["last_message"] == "x" * 100 + "..."
+        assert len(statements) == 2
+
+        statements.clear()
+        assert self.service.get_individual_chats(offset=5) == []
+        assert len(statements) == 1
+
+
+class TestChatMessagePage:
+    """Test cases for get_chat_message_page"""
+
+    def setup_method(self):
+        db_service = SQLiteDatabaseService([User, Message])
+        with db_service.get_session() as db:
+            db.add(User(id=1, name="Ann"))
+            # Three messages share each timestamp so paging must break ties on id
+            db.add_all(
+                Message(id=i, chat_id=7, sender_id=1, content=str(i), timestamp=1000 + i // 3)
+                for i in range(1, 26)
+            )
+            db.add(Message(id=99, chat_id=8, sender_id=1, content="other", timestamp=1001))
+            db.commit()
+
+        self.service = ChatModerationService.__new__(ChatModerationService)
+        self.service.db_service = db_service
+
+    def test_newest_page_first_then_older(self):
+        """Walking older cursors visits every message exactly once"""
+        page = self.service.get_chat_message_page(7, limit=10)
+        assert [m["id"] for m in page["messages"]] == list(range(16, 26))
+        assert page["has_older"] and not page["has_newer"]
+        assert page["messages"][0]["sender_name"] == "Ann"
+
+        seen = [m["id"] for m in page["messages"]]
+        while page["has_older"]:
+            page = self.service.get_chat_message_page(7, limit=10, before=page["older_cursor"])
+            seen = [m["id"] for m in page["messages"]] + seen
+
+        assert seen == list(range(1, 26))
+
+    def test_load_newer_from_older_page(self):
+        """An after cursor continues exactly where the page ended"""
+        newest = self.service.get_chat_message_page(7, limit=10)
+        older = self.service.get_chat_message_page(7, limit=10, before=newest["older_cursor"])
+        newer = self.service.get_chat_message_page(7, limit=10, after=older["newer_cursor"])
+
+        assert [m["id"] for m in newer["messages"]] == list(range(16, 26))
+        assert not newer["has_newer"]
+
+    def test_invalid_cursor(self):
+        """Malformed cursors are rejected"""
+        with pytest.raises(ValidationError):
+            self.service.get_chat_message_page(7, before="not-a-cursor")
@@ -0,0 +1,189 @@
+"""Tests for thread listings and the lazily loaded reply tree in CommunityForumService"""
+from datetime import datetime
+
+from sqlalchemy import event
+
+from core.models import (
+    Community,
+    CommunityThread,
+    CommunityThreadReply,
+    CommunityThreadReplyUpvote,
+    CommunityThreadUpvote,
+    User,
+)
+import services.community_forum_service as community_forum_service
+from services.community_forum_service import CommunityForumService
+from services.search_index import ForumSearchIndex
+from tests.sqlite_db import SQLiteDatabaseService
+
+# reply id -> (thread, parent); created_at follows the id
+REPLIES = {
+    1: (1, None),
+    2: (1, 1),
+    3: (1, 2),
+    4: (1, 3),
+    5: (1, 1),
+    6: (1, None),
+    7: (1, 999),  # parent deleted
+    8: (1, 9),  # 8 and 9 are each other's parent
+    9: (1, 8),
+    10: (1, 9),
+    11: (1, 11),  # its own parent
+    20: (2, None),
+    21: (2, 1),  # points into another thread
+}
+
+
+def count_statements(db_service):
+    statements = []
+    event.listen(
+        db_service.engine, "before_cursor_execute",
+        lambda *args: statements.append(args[2]),
+    )
+    return statements
+
+
+def ids(nodes):
+    return [node["id"] for node in nodes]
+
+
+class TestThreadListing:
+    """Test cases for get_threads"""
+
+    def setup_method(self):
+        self.db_service = SQLiteDatabaseService(
+            [User, Community, CommunityThread, CommunityThreadReply, CommunityThreadUpvote]
+        )
+        with self.db_service.get_session() as db:
+            db.add(User(id=1, name="Ann"))
+            db.add_all([Community(id=1, name="Gent"), Community(id=2, name="Antwerpen")])
+            db.add_all(
+                CommunityThread(
+                    id=thread_id,
+                    community_id=1 + thread_id % 2,
+                    owner_id=1 if thread_id < 4 else None,
+                    title=f"t{thread_id}",
+                    body="x" * 250 if thread_id == 1 else "short",
+                    last_updated=datetime(2025, 3, thread_id),
+                )
+                for thread_id in range(1, 6)
+            )
+            db.add_all(CommunityThreadReply(thread_id=t, owner_id=1) for t in (1, 1, 1, 3, 5, 5))
+            db.add_all(CommunityThreadUpvote(thread_id=t, user_id=1) for t in (1, 2, 2))
+            db.commit()
+
+        self.service = CommunityForumService.__new__(CommunityForumService)
+        self.service.db_service = self.db_service
+
+    def test_counts_are_grouped_per_page(self):
+        """The page, its reply counts and its upvote counts are three statements"""
+        statements = count_statements(self.db_service)
+
+        threads = self.service.get_threads(limit=3)
+
+        assert [(t["id"], t["reply_count"], t["upvote_count"]) for t in threads] == [
+            (5, 2, 0), (4, 0, 0), (3, 1, 0),
+        ]
+        assert (threads[0]["owner_name"], threads[0]["community_name"]) == ("Unknown", "Antwerpen")
+        assert len(statements) == 3
+
+        older = self.service.get_threads(limit=3, offset=3)
+        assert [(t["id"], t["reply_count"], t["upvote_count"]) for t in older] == [(2, 0, 2), (1, 3, 1)]
+        assert older[1]["body"] == "x" * 200 + "..."
+        assert older[1]["owner_name"] == "Ann"
+
+    def test_filtered_and_empty_pages(self):
+        threads = self.service.get_threads(community_id=1)
+        assert [(t["id"], t["reply_count"]) for t in threads] == [(4, 0), (2, 0)]
+
+        statements = count_statements(self.db_service)
+        assert self.service.get_threads(offset=10) == []
+        # No count queries for an empty page
+        assert len(statements) == 1
+
+    def test_search_flags_matches_beyond_the_cap(self, monkeypatch):
+        """Threads 2 to 5 say "short"; a cap below four flags the page"""
+        self.service.search_index = ForumSearchIndex(self.db_service, ":memory:")
+
+        monkeypatch.setattr(community_forum_service, "MAX_THREAD_SEARCH_MATCHES", 3)
+        page = self.service.get_thread_page(search="short")
+        assert page["search_truncated"] is True
+        assert len(page["threads"]) == 3
+
+        monkeypatch.setattr(community_forum_service, "MAX_THREAD_SEARCH_MATCHES", 4)
+        page = self.service.get_thread_page(search="short")
+        assert page["search_truncated"] is False
+        assert [t["id"] for t in page["threads"]] == [5, 4, 3, 2]
+        assert self.service.get_thread_page()["search_truncated"] is False
+
+
+class TestReplyTree:
+    """Test cases for get_thread_reply_tree"""
+
+    def setup_method(self):
+        self.db_service = SQLiteDatabaseService(
+            [User, CommunityThread, CommunityThreadReply, CommunityThreadReplyUpvote]
+        )
+        with self.db_service.get_session() as db:
+            db.add_all([User(id=1, name="Ann"), User(id=2, name="Ben")])
+            db.add_all([CommunityThread(id=1, body="t1"), CommunityThread(id=2, body="t2")])
+            db.add_all(
+                CommunityThreadReply(
+                    id=reply_id,
+                    thread_id=thread_id,
+                    parent_id=parent_id,
+                    owner_id=1 + reply_id % 2,
+                    body=f"r{reply_id}",
+                    created_at=datetime(2025, 3, 1, 12, reply_id),
+                )
+                for reply_id, (thread_id, parent_id) in REPLIES.items()
+            )
+            db.add_all(CommunityThreadReplyUpvote(user_id=u, reply_id=2) for u in (1, 2))
+            db.commit()
+
+        self.service = CommunityForumService.__new__(CommunityForumService)
+        self.service.db_service = self.db_service
+
+    def test_top_level_page_is_cut_at_the_depth_limit(self):
+        tree = self.service.get_thread_reply_tree(1, max_depth=2, limit=2)
+
+        assert (tree["total"], tree["has_more"]) == (5, True)
+        first, second = tree["replies"]
+        assert (first["id"], first["depth"], first["child_count"]) == (1, 1, 2)
+        assert ids(first["children"]) == [2, 5]
+        # Reply 2's own child is below the limit: counted, not loaded
+        assert (first["children"][0]["child_count"], first["children"][0]["children"]) == (1, [])
+        assert first["children"][0]["upvote_count"] == 2
+        assert first["children"][0]["parent_author"] == "Ben"
+        assert ids([second]) == [6]
+
+        rest = self.service.get_thread_reply_tree(1, max_depth=2, limit=10, offset=2)
+        assert ids(rest["replies"]) == [7, 8, 11]
+        assert rest["has_more"] is False
+
+    def test_expanding_a_branch_reads_only_that_branch(self):
+        """One statement per level plus the detail reads, whatever the thread size"""
+        statements = count_statements(self.db_service)
+
+        tree = self.service.get_thread_reply_tree(1, parent_id=2, max_depth=2)
+
+        assert ids(tree["replies"]) == [3]
+        assert ids(tree["replies"][0]["children"]) == [4]
+        assert tree["replies"][0]["children"][0]["depth"] == 2
+        # children of 2, children of 3, child counts of 4, rows, upvotes
+        assert len(statements) == 5
+
+    def test_reply_cycles_are_listed_instead_of_dropped(self):
+        """The cycle 8 <-> 9 shows up once at the top with 10 nested below"""
+        tree = self.service.get_thread_reply_tree(1)
+
+        assert ids(tree["replies"]) == [1, 6, 7, 8, 11]
+        cycle = tree["replies"][3]
+        assert ids(cycle["children"]) == [9]
+        assert ids(cycle["children"][0]["children"]) == [10]
+        assert tree["replies"][4]["children"] == []
+
+        # Opening the cycle lazily does not loop either
+        branch = self.service.get_thread_reply_tree(1, parent_id=9)
+        assert ids(branch["replies"]) == [8, 10]
+        assert branch["replies"][0]["children"] == []
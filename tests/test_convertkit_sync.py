@@ -0,0 +1,219 @@
+"""Tests for the diff-based ConvertKit sync against a local fake API"""
+import json
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from core.models import ConvertKitSyncState, User, Watermark
+from services.convertkit_service import ConvertKitService
+from services.convertkit_sync import ConvertKitClient, ConvertKitSync
+from tests.sqlite_db import SQLiteDatabaseService
+
+PAGE_SIZE = 50
+
+
+class FakeConvertKitHandler(BaseHTTPRequestHandler):
+    """Paged subscriber list, subscribe and update, with one 429 per endpoint"""
+
+    def _reply(self, status, payload=None, headers=None):
+        body = json.dumps(payload or {}).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _rate_limited(self, endpoint):
+        with self.server.lock:
+            self.server.calls[endpoint] += 1
+            if endpoint in self.server.throttled:
+                return False
+            self.server.throttled.add(endpoint)
+        self._reply(429, {"error": "Rate limit"}, {"Retry-After": "0"})
+        return True
+
+    def _body(self):
+        return json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+
+    def do_GET(self):
+        if self._rate_limited("list"):
+            return
+        page = int(parse_qs(urlparse(self.path).query)["page"][0])
+        subscribers = self.server.subscribers
+        chunk = subscribers[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+        self._reply(200, {
+            "total_subscribers": len(subscribers),
+            "page": page,
+            "total_pages": -(-len(subscribers) // PAGE_SIZE),
+            "subscribers": chunk,
+        })
+
+    def do_POST(self):
+        if self._rate_limited("subscribe"):
+            return
+        data = self._body()
+        with self.server.lock:
+            self.server.created.append((data["email"], data.get("fields", {}).get("language")))
+            subscriber_id = 1000 + len(self.server.created)
+        self._reply(200, {"subscription": {"id": 1, "subscriber": {"id": subscriber_id}}})
+
+    def do_PUT(self):
+        if self._rate_limited("update"):
+            return
+        data = self._body()
+        subscriber_id = int(self.path.rsplit("/", 1)[1])
+        with self.server.lock:
+            self.server.updated.append((subscriber_id, data.get("fields", {}).get("language")))
+            self.server.renamed.append((subscriber_id, data["first_name"]))
+        self._reply(200, {"subscriber": {"id": subscriber_id}})
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeConvertKitServer:
+    """Starts the fake API with 120 existing subscribers on a free port"""
+
+    def setup_method(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeConvertKitHandler)
+        self.server.lock = threading.Lock()
+        self.server.calls = {"list": 0, "subscribe": 0, "update": 0}
+        self.server.throttled = set()
+        self.server.created, self.server.updated, self.server.renamed = [], [], []
+        self.server.subscribers = [
+            {
+                "id": i,
+                "email_address": f"User{i}@Example.com",
+                "first_name": "User",
+                "fields": {"language": "nl" if i % 2 else "en"},
+            }
+            for i in range(120)
+        ]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self.client = ConvertKitClient(
+            "key", "secret", "42", base_url=self.base_url, max_workers=3, backoff_factor=0
+        )
+
+    def teardown_method(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class TestConvertKitSync(FakeConvertKitServer):
+    """Test cases for ConvertKitSync"""
+
+    def test_sends_only_the_diff(self):
+        """Existing subscribers are matched case-insensitively across pages"""
+        users = [
+            {"email": f"user{i}@example.com", "name": "User", "language": "nl" if i % 2 else "en"}
+            for i in range(100)
+        ]
+        users[10]["language"] = "fr"
+        users[11]["name"] = "Eleven"
+        users += [
+            {"email": "new@example.com", "name": "New", "language": "fr"},
+            {"email": "ghost@privaterelay.appleid.com", "name": "Ghost", "language": "en"},
+            {"email": "USER0@example.com ", "name": "Dup", "language": "fr"},
+        ]
+
+        progress = []
+        result = ConvertKitSync(self.client).run(users, lambda done, total: progress.append((done, total)))
+
+        assert self.server.created == [("new@example.com", "fr")]
+        assert sorted(self.server.updated) == [(10, "fr"), (11, "nl")]
+        assert sorted(self.server.renamed) == [(10, "User"), (11, "Eleven")]
+        assert result.to_dict() == {
+            "synced": 3,
+            "created": 1,
+            "updated": 2,
+            "unchanged": 98,
+            "skipped": 2,
+            "failed": 0,
+            "errors": {},
+        }
+        # 3 pages plus one rate-limited retry; no per-user lookups
+        assert self.server.calls["list"] == 4
+        assert progress[-1] == (3, 3)
+
+    def test_nothing_to_send(self):
+        """An up-to-date audience only costs the subscriber list"""
+        users = [{"email": f"user{i}@example.com", "language": None} for i in range(5)]
+
+        result = ConvertKitSync(self.client).run(users)
+
+        assert result.unchanged == 5
+        assert self.server.calls["subscribe"] == 0
+        assert self.server.calls["update"] == 0
+
+
+class TestIncrementalConvertKitSync(FakeConvertKitServer):
+    """Test cases for ConvertKitService.sync_changed_users"""
+
+    def setup_method(self):
+        super().setup_method()
+        self.db_service = SQLiteDatabaseService([User, Watermark, ConvertKitSyncState])
+        last_week = datetime.now() - timedelta(days=7)
+        with self.db_service.get_session() as db:
+            db.add_all(
+                User(
+                    id=i,
+                    name=f"User {i}",
+                    email=f"user{i}@example.com" if i < 4 else f"fresh{i}@example.com",
+                    language="nl" if i % 2 else "en",
+                    reg_complete=True,
+                    last_active=last_week,
+                )
+                for i in range(1, 7)
+            )
+            db.add(User(id=7, email="unregistered@example.com", reg_complete=False))
+            db.commit()
+
+        self.service = ConvertKitService.__new__(ConvertKitService)
+        self.service.api_key, self.service.api_secret, self.service.sequence_id = "key", "secret", "42"
+        self.service.db_service = self.db_service
+
+    def sync(self, monkeypatch):
+        monkeypatch.setattr(
+            "services.convertkit_service.ConvertKitClient",
+            lambda *args: ConvertKitClient(*args, base_url=self.base_url, backoff_factor=0),
+        )
+        return self.service.sync_changed_users()
+
+    def test_only_changed_users_are_sent(self, monkeypatch):
+        """Later runs skip unchanged users and the subscriber pull"""
+        first = self.sync(monkeypatch)
+
+        assert first["scanned"] == 6
+        # Users 1-3 exist in ConvertKit as "User" and get their names
+        assert (first["created"], first["updated"]) == (3, 3)
+        assert self.service.get_sync_status()["tracked"] == 6
+        list_calls = self.server.calls["list"]
+
+        assert self.sync(monkeypatch)["scanned"] == 0
+
+        with self.db_service.get_session() as db:
+            user = db.query(User).filter(User.id == 2).first()
+            user.language, user.last_active = "fr", datetime.now()
+            db.query(User).filter(User.id == 3).update({User.last_active: datetime.now()})
+            db.query(User).filter(User.id == 1).update({User.name: "Renamed", User.last_active: datetime.now()})
+            db.add(User(id=8, name="New", email="new@example.com", language="en", reg_complete=True))
+            db.commit()
+
+        self.server.updated.clear()
+        self.server.renamed.clear()
+        third = self.sync(monkeypatch)
+
+        assert (third["scanned"], third["changed"]) == (4, 3)
+        assert (third["created"], third["updated"]) == (1, 2)
+        assert sorted(self.server.updated) == [(1, "nl"), (2, "fr")]
+        # A name change alone is sent too
+        assert sorted(self.server.renamed) == [(1, "Renamed"), (2, "User 2")]
+        assert self.server.created[-1] == ("new@example.com", "en")
+        # Incremental runs use stored subscriber ids, not the list endpoint
+        assert self.server.calls["list"] == list_calls
@@ -0,0 +1,61 @@
+"""Tests for the shared engine registry"""
+from unittest.mock import patch
+
+import pytest
+
+from services.database_service import DatabaseService, engine_registry
+
+DB_ENV = {
+    "DB_USER": "admin",
+    "DB_PASSWORD": "secret",
+    "DB_NAME": "platform",
+    "DB_HOST": "db.internal",
+    "DB_PORT": "3306",
+    "INSTANCE_CONNECTION_NAME": "",
+}
+
+
+class TestEngineRegistry:
+    """Test cases for engine sharing across DatabaseService instances"""
+
+    def setup_method(self):
+        engine_registry.dispose_all()
+
+    def teardown_method(self):
+        engine_registry.dispose_all()
+
+    def test_services_share_one_engine(self):
+        """Services built with the same config reuse the same engine"""
+        with patch.dict("os.environ", DB_ENV):
+            first = DatabaseService()
+            second = DatabaseService()
+
+        assert first.engine is second.engine
+        assert first.SessionLocal is second.SessionLocal
+        assert len(DatabaseService.get_pool_stats()) == 1
+
+    def test_different_config_gets_own_engine(self):
+        """A different database name yields a separate engine"""
+        with patch.dict("os.environ", DB_ENV):
+            first = DatabaseService()
+        with patch.dict("os.environ", {**DB_ENV, "DB_NAME": "analytics"}):
+            second = DatabaseService()
+
+        assert first.engine is not second.engine
+        assert len(DatabaseService.get_pool_stats()) == 2
+
+    def test_pool_stats_hide_password(self):
+        """Pool statistics identify the engine without leaking credentials"""
+        with patch.dict("os.environ", DB_ENV):
+            DatabaseService()
+
+        stats = DatabaseService.get_pool_stats()[0]
+        assert stats["name"] == "admin@db.internal:3306/platform"
+        assert stats["checked_out"] == 0
+        assert "secret" not in str(stats)
+
+    def test_missing_config_raises(self):
+        """Missing credentials raise ValueError"""
+        with patch.dict("os.environ", {**DB_ENV, "DB_PASSWORD": ""}):
+            with pytest.raises(ValueError):
+                DatabaseService()
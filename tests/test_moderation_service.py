@@ -0,0 +1,226 @@
+"""Tests for the inboxes and bulk actions in ModerationService"""
+import json
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event, text
+
+import services.moderation_service as moderation_service
+from core.models import DeletedUser, IndChatMembers, IndChats, IndMessage, User, UserReport
+from core.schema import get_table_columns, invalidate_table_columns
+from services.moderation_service import ModerationService
+from tests.sqlite_db import SQLiteDatabaseService
+from utils.exceptions import ValidationError
+
+
+class TestReportPage:
+    """Test cases for get_report_page"""
+
+    def setup_method(self):
+        self.db_service = SQLiteDatabaseService([User, UserReport])
+        with self.db_service.get_session() as db:
+            db.add_all(User(id=i, name=f"Reporter {i}") for i in range(1, 6))
+            db.add_all([User(id=10, name="Alice"), User(id=11, name="Bob"), User(id=12, name="Malice")])
+            # Alice x4, Bob x2, Malice x3, user 13 (no user row) x2, user 14 x1
+            reports = [(10, r) for r in (1, 2, 3, 4)] + [(11, 1), (11, 2)]
+            reports += [(12, 3), (12, 4), (12, 5), (13, 1), (13, 5), (14, 2)]
+            db.add_all(UserReport(reported_id=reported, reporter_id=reporter) for reported, reporter in reports)
+            db.commit()
+
+        self.service = ModerationService.__new__(ModerationService)
+        self.service.use_direct_db = True
+        self.service.db_service = self.db_service
+
+    def test_page_is_built_in_two_statements(self):
+        """Page, total and reporters for every row come from two queries"""
+        statements = []
+        event.listen(
+            self.db_service.engine, "before_cursor_execute",
+            lambda *args: statements.append(args[2]),
+        )
+
+        page = self.service.get_report_page(limit=2)
+
+        assert len(statements) == 2
+        assert [r["reported_user_id"] for r in page["reports"]] == ["10", "12"]
+        assert page["reports"][1]["reporters"] == ["Reporter 3", "Reporter 4", "Reporter 5"]
+        assert (page["total"], page["has_more"]) == (4, True)
+
+        last = self.service.get_report_page(limit=2, offset=2)
+        assert [r["reported_user"] for r in last["reports"]] == ["Bob", "User 13"]
+        assert not last["has_more"]
+
+    def test_search_by_name_or_id(self):
+        """Names match by substring, digits also match the exact user ID"""
+        by_name = self.service.get_report_page(search="alice")
+        assert [r["reported_user"] for r in by_name["reports"]] == ["Alice", "Malice"]
+
+        by_id = self.service.get_report_page(search="13")
+        assert [r["reported_user_id"] for r in by_id["reports"]] == ["13"]
+
+        assert self.service.get_report_page(search="14")["total"] == 0
+
+
+class TestFeedbackPage:
+    """Test cases for get_feedback_page"""
+
+    def setup_method(self):
+        self.db_service = SQLiteDatabaseService([User])
+        with self.db_service.get_session() as db:
+            # Shaped like the production table, not the Feedback model
+            db.execute(text(
+                "CREATE TABLE feedback (id INTEGER PRIMARY KEY, user_id INTEGER, "
+                "feedback TEXT, rating INTEGER, created_at DATETIME)"
+            ))
+            db.add_all([User(id=1, name="Ann"), User(id=2, name="Ben")])
+            ratings = [5, None, 1, 3, 0, 1, 5, None, 2, 1]
+            for i, rating in enumerate(ratings, start=1):
+                db.execute(
+                    text("INSERT INTO feedback VALUES (:id, :user_id, :feedback, :rating, :created_at)"),
+                    {
+                        "id": i,
+                        "user_id": 1 if i % 2 else 2,
+                        "feedback": "Love the app" if i == 4 else f"Feedback {i}",
+                        "rating": rating,
+                        "created_at": datetime(2025, 1, i),
+                    },
+                )
+            db.commit()
+
+        self.service = ModerationService.__new__(ModerationService)
+        self.service.use_direct_db = True
+        self.service.db_service = self.db_service
+
+    def teardown_method(self):
+        invalidate_table_columns(self.db_service.engine)
+
+    def walk(self, **kwargs):
+        ids, cursor = [], None
+        while True:
+            page = self.service.get_feedback_page(limit=3, cursor=cursor, **kwargs)
+            ids += [f["id"] for f in page["feedback"]]
+            if not page["has_more"]:
+                return ids
+            cursor = page["next_cursor"]
+
+    def test_keyset_pages_keep_rating_order(self):
+        """Lowest rating first, unrated last, newest first within a rating"""
+        assert self.walk() == [10, 6, 3, 9, 4, 7, 1, 8, 5, 2]
+        assert self.walk(sort="date") == list(range(10, 0, -1))
+
+        first = self.service.get_feedback_page(limit=1)["feedback"][0]
+        assert (first["user_name"], first["timestamp"]) == ("Ben", datetime(2025, 1, 10))
+
+    def test_search_and_rating_filters(self):
+        """Filters run in SQL and combine with paging"""
+        assert self.walk(search="love") == [4]
+        assert self.walk(search="ben", ratings=[1]) == [10, 6]
+        assert self.walk(ratings=[0, 5]) == [7, 1, 8, 5, 2]
+
+    def test_columns_are_cached_until_invalidated(self):
+        """Introspection happens once; invalidation picks up new columns"""
+        engine = self.db_service.engine
+        self.service.get_feedback_page()
+        assert "updated_at" not in get_table_columns(engine, "feedback")
+
+        with engine.begin() as connection:
+            connection.execute(text("ALTER TABLE feedback ADD COLUMN updated_at DATETIME"))
+        assert "updated_at" not in get_table_columns(engine, "feedback")
+
+        invalidate_table_columns(engine, "feedback")
+        assert "updated_at" in get_table_columns(engine, "feedback")
+
+
+class TestBulkMessage:
+    """Test cases for send_bulk_message"""
+
+    def setup_method(self):
+        self.db_service = SQLiteDatabaseService([User, IndChats, IndChatMembers, IndMessage])
+        with self.db_service.get_session() as db:
+            db.add_all(User(id=i, name=f"User {i}") for i in range(1, 8))
+            # Admin-started chat with 2, user-started chat with 3
+            db.add(IndChats(id=50, activity_owner_id=1, receiver_id=2))
+            db.add(IndChats(id=51, activity_owner_id=3, receiver_id=1))
+            db.commit()
+
+        self.service = ModerationService.__new__(ModerationService)
+        self.service.use_direct_db = True
+        self.service.db_service = self.db_service
+
+    def test_reuses_chats_and_creates_the_rest(self, monkeypatch):
+        """Missing chats get both memberships; every message lands once"""
+        monkeypatch.setattr(moderation_service, "BULK_MESSAGE_CHUNK", 3)
+        commits = []
+        event.listen(self.db_service.engine, "commit", lambda conn: commits.append(1))
+
+        result = self.service.send_bulk_message(
+            [2, 3, 4, 5, 6, 99, 1, 4], "Hello <b>there</b>",
+            action_type="navigation", action_text="Open", action_data={"screen": "Browse"},
+        )
+
+        assert result == {"sent": 5, "chats_created": 3, "skipped": 3}
+        assert len(commits) == 2
+
+        with self.db_service.get_session() as db:
+            chats = {c.receiver_id if c.activity_owner_id == 1 else c.activity_owner_id: c for c in db.query(IndChats)}
+            assert chats[2].id == 50 and chats[3].id == 51
+            assert {chats[u].last_message for u in (2, 3, 4, 5, 6)} == {"Hello &lt;b&gt;there&lt;/b&gt;"}
+
+            members = {(m.ind_chat_id, m.user_id) for m in db.query(IndChatMembers)}
+            assert members == {(chats[u].id, member) for u in (4, 5, 6) for member in (1, u)}
+
+            messages = db.query(IndMessage).all()
+            assert sorted(m.ind_chat_id for m in messages) == sorted(chats[u].id for u in (2, 3, 4, 5, 6))
+            assert {(m.sender_id, m.action_type, m.action_text) for m in messages} == {(1, "navigation", "Open")}
+            assert json.loads(messages[0].action_data) == {"screen": "Browse"}
+
+
+class TestBulkBan:
+    """Test cases for get_ban_candidates and bulk_permanent_ban"""
+
+    def setup_method(self):
+        self.db_service = SQLiteDatabaseService([User, UserReport, DeletedUser])
+        with self.db_service.get_session() as db:
+            db.add_all(
+                User(id=i, name=f"Spam {i}", email=f"spam{i}@example.com", phone=f"+31{i}")
+                for i in range(2, 8)
+            )
+            db.add_all(UserReport(reporter_id=7, reported_id=r) for r in (3, 3, 4))
+            db.commit()
+
+        self.service = ModerationService.__new__(ModerationService)
+        self.service.use_direct_db = True
+        self.service.db_service = self.db_service
+
+    def test_candidates_keep_input_order(self):
+        """Known users come back with report counts, unknown IDs separately"""
+        candidates = self.service.get_ban_candidates([4, 99, 3, 4])
+
+        assert [(u["id"], u["report_count"]) for u in candidates["users"]] == [(4, 1), (3, 2)]
+        assert candidates["missing"] == [99]
+
+    def test_bans_in_chunks_with_one_audit_record_each(self, monkeypatch):
+        """Rows are copied to deleted_users and removed chunk by chunk"""
+        monkeypatch.setattr(moderation_service, "BULK_BAN_CHUNK", 2)
+        audits = []
+        monkeypatch.setattr(
+            moderation_service.AuditLogger, "log_action",
+            lambda action, details, success=True: audits.append((action, details)),
+        )
+
+        result = self.service.bulk_permanent_ban([2, 3, 99, 5, 6], "Spam wave <script>")
+
+        assert result == {"banned": 4, "missing": [99]}
+        assert [d["banned_user_ids"] for a, d in audits if a == "USERS_BANNED"] == [[2, 3], [5], [6]]
+
+        with self.db_service.get_session() as db:
+            assert sorted(u.id for u in db.query(User)) == [4, 7]
+            deleted = {d.user_id: d for d in db.query(DeletedUser)}
+            assert sorted(deleted) == [2, 3, 5, 6]
+            assert (deleted[5].email, deleted[5].phone) == ("spam5@example.com", "+315")
+            assert deleted[5].reason == "Spam wave &lt;script&gt;"
+
+    def test_rejects_the_admin_account(self):
+        """The admin sender can never be part of a bulk ban"""
+        with pytest.raises(ValidationError):
+            self.service.bulk_permanent_ban([1, 2], "Spam")
@@ -0,0 +1,152 @@
+"""Tests for durable notification jobs and their resumable worker"""
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import services.notification_jobs as notification_jobs
+from core.models import NotificationJob, User
+from services.notification_jobs import NotificationJobWorker
+from services.notification_service import NotificationService
+from services.push_delivery import DeliveryResult
+from services.segment_index import UserSegmentIndex
+from tests.sqlite_db import SQLiteDatabaseService
+
+
+class ProcessDied(BaseException):
+    """Stands in for the container being killed mid-send"""
+
+
+class FakePushClient:
+    """Sends each message as its own batch; `after_send` runs before on_batch"""
+
+    def __init__(self, die_on_call=None, after_send=None):
+        self.tokens = []
+        self.calls = 0
+        self.die_on_call = die_on_call
+        self.after_send = after_send
+
+    def deliver(self, messages, on_batch=None):
+        self.calls += 1
+        if self.calls == self.die_on_call:
+            raise ProcessDied()
+        result = DeliveryResult()
+        for message in messages:
+            self.tokens.append(message["to"])
+            result.sent += 1
+            if self.after_send:
+                self.after_send(message)
+            if on_batch:
+                batch = DeliveryResult()
+                batch.sent = 1
+                on_batch(batch)
+        return result
+
+    def close(self):
+        pass
+
+
+class TestNotificationJobWorker:
+    """Test cases for NotificationJobWorker"""
+
+    def setup_method(self):
+        self.db_service = SQLiteDatabaseService([User, NotificationJob])
+        with self.db_service.get_session() as db:
+            db.add_all(User(id=i, notif_token=f"token-{i}", language="en") for i in range(1, 11))
+            db.add(
+                NotificationJob(
+                    id=1, title="Hi", body="Body", filters=json.dumps({"language": ["en"]}), total=10
+                )
+            )
+            db.commit()
+
+        service = NotificationService.__new__(NotificationService)
+        service.db_service = self.db_service
+        service.segment_index = UserSegmentIndex(self.db_service)
+        self.token_source = service._fetch_push_tokens
+
+    def worker(self, client):
+        return NotificationJobWorker(self.db_service, self.token_source, lambda: client)
+
+    def job(self):
+        with self.db_service.get_session() as db:
+            return db.query(NotificationJob).filter(NotificationJob.id == 1).first()
+
+    def test_job_runs_to_completion_in_chunks(self, monkeypatch):
+        """Every recipient is sent once and the cursor ends on the last user"""
+        monkeypatch.setattr(notification_jobs, "JOB_CHUNK_SIZE", 3)
+        client = FakePushClient()
+        worker = self.worker(client)
+
+        assert worker.claim_next() == 1
+        worker.process(1)
+
+        job = self.job()
+        assert job.status == "completed"
+        assert (job.sent, job.failed, job.cursor_user_id) == (10, 0, 10)
+        assert client.tokens == [f"token-{i}" for i in range(1, 11)]
+
+    def test_abandoned_job_resumes_from_cursor(self, monkeypatch):
+        """After a crash another worker takes over once the lease expires"""
+        monkeypatch.setattr(notification_jobs, "JOB_CHUNK_SIZE", 4)
+        first = self.worker(FakePushClient(die_on_call=2))
+        assert first.claim_next() == 1
+        with pytest.raises(ProcessDied):
+            first.process(1)
+
+        second_client = FakePushClient()
+        second = self.worker(second_client)
+        assert second.claim_next() is None
+
+        with self.db_service.get_session() as db:
+            db.query(NotificationJob).update({"heartbeat_at": datetime.now() - timedelta(hours=1)})
+            db.commit()
+
+        assert second.claim_next() == 1
+        second.process(1)
+
+        job = self.job()
+        assert job.status == "completed"
+        assert job.sent == 10
+        assert second_client.tokens == [f"token-{i}" for i in range(5, 11)]
+
+    def test_heartbeat_is_refreshed_within_a_chunk(self, monkeypatch):
+        """A chunk that outlasts the lease keeps renewing it between batches"""
+        monkeypatch.setattr(notification_jobs, "JOB_HEARTBEAT_SECONDS", 0)
+        heartbeats = []
+
+        def expire_lease(message):
+            # Each batch "takes" an hour; only the heartbeat keeps the lease alive
+            with self.db_service.get_session() as db:
+                heartbeats.append(db.query(NotificationJob.heartbeat_at).scalar())
+                db.query(NotificationJob).update({"heartbeat_at": datetime.now() - timedelta(hours=1)})
+                db.commit()
+
+        worker = self.worker(FakePushClient(after_send=expire_lease))
+        assert worker.claim_next() == 1
+        worker.process(1)
+
+        assert self.job().status == "completed"
+        # Every batch after the first finds the lease renewed by the previous one
+        stale = datetime.now() - timedelta(minutes=30)
+        assert len(heartbeats) == 10
+        assert all(beat > stale for beat in heartbeats[1:])
+
+    def test_lost_lease_stops_the_chunk(self, monkeypatch):
+        """Once another worker owns the job the rest of the chunk is not sent"""
+        monkeypatch.setattr(notification_jobs, "JOB_HEARTBEAT_SECONDS", 0)
+
+        def take_over(message):
+            if message["to"] == "token-3":
+                with self.db_service.get_session() as db:
+                    db.query(NotificationJob).update({"lease_owner": "other-worker"})
+                    db.commit()
+
+        client = FakePushClient(after_send=take_over)
+        worker = self.worker(client)
+        assert worker.claim_next() == 1
+        worker.process(1)
+
+        job = self.job()
+        assert client.tokens == ["token-1", "token-2", "token-3"]
+        assert (job.status, job.lease_owner, job.sent) == ("running", "other-worker", 0)
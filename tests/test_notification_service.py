@@ -0,0 +1,151 @@
+"""Tests for recipient streaming in NotificationService and its ConvertKit callers"""
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import event
+
+from core.models import User
+from services.notification_service import NotificationService
+from services.segment_index import UserSegmentIndex
+from tests.sqlite_db import SQLiteDatabaseService
+from ui.tabs import convertkit_tab
+
+# Odd ids speak English; every third user has no token and every fifth no email
+ENGLISH = [i for i in range(1, 31) if i % 2]
+WITH_TOKEN = [i for i in ENGLISH if i % 3]
+
+
+def build_service():
+    db_service = SQLiteDatabaseService([User])
+    with db_service.get_session() as db:
+        db.add_all(
+            User(
+                id=i,
+                name=f"User {i}",
+                email=f"user{i}@example.com" if i % 5 else None,
+                language="en" if i % 2 else "nl",
+                reg_complete=True,
+                notif_token=f"token-{i}" if i % 3 else None,
+            )
+            for i in range(1, 31)
+        )
+        db.commit()
+
+    service = NotificationService.__new__(NotificationService)
+    service.db_service = db_service
+    service.segment_index = UserSegmentIndex(db_service)
+    service.segment_index.refresh(force=True)
+    return service
+
+
+class TestIterRecipients:
+    """Test cases for the keyset chunks of iter_recipients"""
+
+    def setup_method(self):
+        self.service = build_service()
+
+    def ids(self, **kwargs):
+        return [row[0] for row in self.service.iter_recipients({"language": ["en"]}, **kwargs)]
+
+    @pytest.mark.parametrize("chunk_size", [1, 3, 9, 10, 1000])
+    def test_chunk_edges_neither_skip_nor_repeat(self, chunk_size):
+        """Chunks that end exactly on, before or past the last match"""
+        assert self.ids(chunk_size=chunk_size) == WITH_TOKEN
+        assert self.ids(chunk_size=chunk_size, require_token=False) == ENGLISH
+
+    @pytest.mark.parametrize("after_id", [0, 5, 6, 9, 29, 30])
+    def test_after_id_is_exclusive(self, after_id):
+        assert self.ids(after_id=after_id, chunk_size=2) == [i for i in WITH_TOKEN if i > after_id]
+
+    @pytest.mark.parametrize("limit, chunk_size", [(1, 4), (4, 4), (5, 2), (50, 4)])
+    def test_limit_spans_chunks(self, limit, chunk_size):
+        assert self.ids(limit=limit, chunk_size=chunk_size) == WITH_TOKEN[:limit]
+
+    def test_filters_limit_is_the_default(self):
+        rows = list(self.service.iter_recipients({"language": ["en"], "limit": 3}, chunk_size=2))
+        assert [row[0] for row in rows] == WITH_TOKEN[:3]
+
+        rows = list(self.service.iter_recipients({"language": ["en"], "limit": 3}, limit=5))
+        assert len(rows) == 5
+
+    def test_one_statement_per_chunk(self):
+        """A limit that ends on a chunk edge does not read a further chunk"""
+        statements = []
+        event.listen(
+            self.service.db_service.engine, "before_cursor_execute",
+            lambda *args: statements.append(args[2]),
+        )
+
+        assert self.ids(limit=8, chunk_size=4) == WITH_TOKEN[:8]
+        assert len(statements) == 2
+
+        statements.clear()
+        assert self.ids(chunk_size=5) == WITH_TOKEN
+        # Two full chunks, then the open-ended tail comes back empty
+        assert len(statements) == 3
+
+    def test_only_the_requested_fields_with_id_first(self):
+        row = next(self.service.iter_recipients({}, fields=("email", "id")))
+        assert tuple(row) == (1, "user1@example.com")
+
+
+class FakeStreamlit:
+    """Records what a tab writes instead of rendering it"""
+
+    def __init__(self, notification_service, convertkit_service=None):
+        self.session_state = SimpleNamespace(
+            notification_service=notification_service, convertkit_service=convertkit_service
+        )
+        self.calls = []
+
+    def __getattr__(self, name):
+        if name == "progress":
+            return lambda *args, **kwargs: SimpleNamespace(progress=lambda *a, **k: None, empty=lambda: None)
+        return lambda *args, **kwargs: self.calls.append((name, args))
+
+    def called(self, name):
+        return [args for call, args in self.calls if call == name]
+
+
+class FakeConvertKitService:
+    def __init__(self):
+        self.users = None
+
+    def bulk_sync_users(self, users, on_progress=None):
+        self.users = users
+        on_progress(len(users), len(users))
+        return {"synced": len(users), "created": len(users), "updated": 0, "unchanged": 0, "failed": 0}
+
+
+class TestConvertKitCallers:
+    """Test cases for the ConvertKit tab's preview and sync"""
+
+    def setup_method(self):
+        self.service = build_service()
+
+    def test_preview_shows_the_first_ten_matches(self, monkeypatch):
+        st = FakeStreamlit(self.service)
+        monkeypatch.setattr(convertkit_tab, "st", st)
+
+        convertkit_tab._preview_sync_users(["en"], 12)
+
+        assert st.called("error") == []
+        assert st.called("write") == [("**Found 12 users to sync**",)]
+        (table,) = st.called("table")[0]
+        assert [row["ID"] for row in table] == ENGLISH[:10]
+        assert table[2]["Email"] == "N/A"
+        assert st.called("caption") == [("Showing first 10 of 12 users",)]
+
+    def test_sync_sends_every_match_with_an_email(self, monkeypatch):
+        convertkit = FakeConvertKitService()
+        st = FakeStreamlit(self.service, convertkit)
+        monkeypatch.setattr(convertkit_tab, "st", st)
+
+        convertkit_tab._sync_users_to_convertkit(["en"], 13)
+
+        assert st.called("error") == []
+        # Tokens are not required, the limit counts users without an email
+        assert [user["email"] for user in convertkit.users] == [
+            f"user{i}@example.com" for i in ENGLISH[:13] if i % 5
+        ]
+        assert convertkit.users[0] == {"email": "user1@example.com", "name": "User 1", "language": "en"}
@@ -0,0 +1,111 @@
+"""Tests for batched Expo push delivery against a local stub server"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from services.push_delivery import ExpoPushClient, build_push_message
+
+
+class StubExpoHandler(BaseHTTPRequestHandler):
+    """Answers like Expo: one ticket per message, errors for 'bad' tokens"""
+
+    def do_POST(self):
+        messages = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.batches.append(len(messages))
+
+        if self.path == "/throttled" and not self.server.throttled:
+            self.server.throttled = True
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if self.path == "/busy":
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if self.path == "/down":
+            self.send_response(500)
+            self.end_headers()
+            return
+
+        tickets = [
+            {"status": "error", "details": {"error": "DeviceNotRegistered"}}
+            if "bad" in message["to"]
+            else {"status": "ok", "id": message["to"]}
+            for message in messages
+        ]
+        payload = json.dumps({"data": tickets}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestExpoPushClient:
+    """Test cases for ExpoPushClient"""
+
+    def setup_method(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubExpoHandler)
+        self.server.batches = []
+        self.server.throttled = False
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def teardown_method(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_batches_of_100_and_ticket_aggregation(self):
+        """250 messages go out as 100/100/50 and tickets are tallied"""
+        tokens = (f"ExponentPushToken[{'bad' if i % 50 == 0 else i}]" for i in range(250))
+        messages = (build_push_message(token, "Hi", "Body", {}) for token in tokens)
+
+        client = ExpoPushClient(url=f"{self.base_url}/send", max_workers=3)
+        result = client.deliver(messages)
+        client.close()
+
+        assert sorted(self.server.batches) == [50, 100, 100]
+        assert result.to_dict() == {
+            "sent": 245,
+            "failed": 5,
+            "errors": {"DeviceNotRegistered": 5},
+            "invalid_tokens": 5,
+        }
+
+    def test_failed_request_counts_whole_batch(self):
+        """A non-200 response fails every message in the batch"""
+        messages = [build_push_message(f"token-{i}", "Hi", "Body", {}) for i in range(120)]
+
+        client = ExpoPushClient(url=f"{self.base_url}/down", max_workers=2)
+        result = client.deliver(messages)
+        client.close()
+
+        assert result.sent == 0
+        assert result.failed == 120
+        assert result.errors == {"HTTP500": 120}
+
+    def test_only_rate_limits_are_retried(self):
+        """A 429 is retried; a 5xx is recorded once, since Expo may have queued the batch"""
+        messages = [build_push_message(f"token-{i}", "Hi", "Body", {}) for i in range(10)]
+
+        client = ExpoPushClient(url=f"{self.base_url}/throttled", max_workers=1)
+        result = client.deliver(messages)
+        assert self.server.batches == [10, 10]
+        assert result.sent == 10
+
+        self.server.batches = []
+        client.url = f"{self.base_url}/busy"
+        result = client.deliver(messages)
+        client.close()
+
+        assert self.server.batches == [10]
+        assert result.failed == 10
+        assert result.errors == {"HTTP503": 10}
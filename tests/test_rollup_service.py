@@ -0,0 +1,161 @@
+"""Tests for the daily analytics rollups and their watermarks"""
+from datetime import date, datetime, timedelta
+
+import services.rollup_service as rollup_service
+from core.models import (
+    Activity,
+    CommunityThread,
+    CommunityThreadReply,
+    DailyRollup,
+    IndMessage,
+    Message,
+    User,
+    UserReport,
+    Watermark,
+)
+from services.analytics_service import AnalyticsService
+from services.rollup_service import FIRST_DAY, MESSAGE_ID_FLOOR, REPORT_ID, RollupService
+from services.watermarks import get_watermark, set_watermark
+from tests.sqlite_db import SQLiteDatabaseService
+
+ROLLUP_MODELS = [
+    User,
+    Message,
+    IndMessage,
+    Activity,
+    CommunityThread,
+    CommunityThreadReply,
+    UserReport,
+    Watermark,
+    DailyRollup,
+]
+
+
+def days_ago(days: int, hour: int = 12) -> datetime:
+    return datetime.combine(date.today() - timedelta(days=days), datetime.min.time()).replace(hour=hour)
+
+
+class TestRollupService:
+    """Test cases for RollupService"""
+
+    def setup_method(self):
+        self.db_service = SQLiteDatabaseService(ROLLUP_MODELS)
+        with self.db_service.get_session() as db:
+            db.add_all(
+                [
+                    User(id=1, created_at=days_ago(20), last_active=days_ago(0)),
+                    User(id=2, created_at=days_ago(7), last_active=days_ago(1)),
+                    User(id=3, created_at=days_ago(1), last_active=days_ago(1)),
+                    Message(id=10, chat_id=1, content="old", timestamp=int(days_ago(8).timestamp())),
+                    Message(id=11, chat_id=1, content="a", timestamp=int(days_ago(1).timestamp())),
+                    Message(id=12, chat_id=1, content="b", timestamp=int(days_ago(0).timestamp())),
+                    IndMessage(id=5, ind_chat_id=1, content="dm", timestamp=int(days_ago(0).timestamp())),
+                    UserReport(id=1, reporter_id=1, reported_id=2),
+                    UserReport(id=2, reporter_id=3, reported_id=2),
+                ]
+            )
+            db.commit()
+
+        self.service = RollupService.__new__(RollupService)
+        self.service.db_service = self.db_service
+
+    def rollups(self):
+        with self.db_service.get_session() as db:
+            return {row.day: row for row in db.query(DailyRollup).order_by(DailyRollup.day)}
+
+    def test_first_refresh_covers_only_the_open_days(self):
+        """No backfill on the request path, and old reports land on no day"""
+        assert self.service.refresh(force=True)
+
+        rows = self.rollups()
+        today = date.today()
+        assert sorted(rows) == [today - timedelta(days=2), today - timedelta(days=1), today]
+        assert self.service.get_first_day() == today - timedelta(days=2)
+        assert rows[today].group_messages == 1
+        assert rows[today].direct_messages == 1
+        assert rows[today - timedelta(days=1)].new_users == 1
+        assert sum(row.reports for row in rows.values()) == 0
+
+        with self.db_service.get_session() as db:
+            assert get_watermark(db, REPORT_ID).position == 2
+            # The id floor is the first message inside the open window
+            assert get_watermark(db, MESSAGE_ID_FLOOR).position == 11
+
+    def test_new_reports_go_to_today_and_the_total_stays_live(self, monkeypatch):
+        monkeypatch.setattr(rollup_service, "ROLLUP_REFRESH_INTERVAL", 0)
+        self.service.refresh(force=True)
+        with self.db_service.get_session() as db:
+            db.add(UserReport(id=3, reporter_id=1, reported_id=3))
+            db.commit()
+
+        counters = self.service.get_platform_counters()
+        assert counters == {"messages_today": 2, "reports_total": 3}
+        assert self.rollups()[date.today()].reports == 1
+
+        # A dismissed report leaves the total even though its day keeps it
+        with self.db_service.get_session() as db:
+            db.query(UserReport).filter(UserReport.id == 1).delete()
+            db.commit()
+        assert self.service.get_platform_counters()["reports_total"] == 2
+
+    def test_backfill_extends_the_rollups_a_chunk_at_a_time(self, monkeypatch):
+        monkeypatch.setattr(rollup_service, "ROLLUP_REFRESH_INTERVAL", 0)
+        monkeypatch.setattr(rollup_service, "ROLLUP_BACKFILL_CHUNK", 4)
+
+        assert self.service.backfill(12) == 9
+        assert self.service.backfill(12) == 0
+
+        rows = self.rollups()
+        assert len(rows) == 12
+        assert self.service.get_first_day() == date.today() - timedelta(days=11)
+        assert rows[date.today() - timedelta(days=7)].new_users == 1
+        assert rows[date.today() - timedelta(days=8)].group_messages == 1
+
+    def test_closed_days_are_not_rescanned(self, monkeypatch):
+        """Rows that appear late on a closed day wait for a recompute"""
+        monkeypatch.setattr(rollup_service, "ROLLUP_REFRESH_INTERVAL", 0)
+        self.service.backfill(10)
+        with self.db_service.get_session() as db:
+            db.add_all([User(id=4, created_at=days_ago(7)), User(id=5, created_at=days_ago(0))])
+            db.commit()
+
+        self.service.refresh(force=True)
+
+        rows = self.rollups()
+        assert rows[date.today() - timedelta(days=7)].new_users == 1
+        assert rows[date.today()].new_users == 1
+
+    def test_analytics_counts_days_before_the_rollups_live(self, monkeypatch):
+        """A range older than the backfill is not zero-filled"""
+        monkeypatch.setattr(rollup_service, "ROLLUP_REFRESH_INTERVAL", 0)
+        analytics = AnalyticsService.__new__(AnalyticsService)
+        analytics.db_service = self.db_service
+        analytics.rollup_service = self.service
+
+        start = datetime.combine(date.today() - timedelta(days=9), datetime.min.time())
+        result = {row["date"]: row for row in analytics.get_activity_analytics(start=start)}
+
+        assert len(result) == 10
+        assert result[(date.today() - timedelta(days=7)).isoformat()]["new_users"] == 1
+        assert result[(date.today() - timedelta(days=8)).isoformat()]["messages"] == 1
+        assert result[date.today().isoformat()]["messages"] == 2
+        assert sum(row["active_users"] for row in result.values()) == 3
+
+
+class TestWatermarks:
+    """Test cases for services.watermarks"""
+
+    def test_set_creates_then_updates_only_given_fields(self):
+        db_service = SQLiteDatabaseService([Watermark])
+        marked = datetime(2025, 3, 1)
+        with db_service.get_session() as db:
+            assert get_watermark(db, FIRST_DAY) is None
+            set_watermark(db, FIRST_DAY, position=5, marked_at=marked)
+            db.commit()
+
+            set_watermark(db, FIRST_DAY, position=9)
+            db.commit()
+
+            watermark = get_watermark(db, FIRST_DAY)
+            assert (watermark.position, watermark.marked_at) == (9, marked)
+            assert watermark.updated_at is not None
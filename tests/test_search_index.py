@@ -0,0 +1,122 @@
+"""Tests for the SQLite full-text search indexes"""
+import pytest
+
+from datetime import datetime
+
+import services.search_index as search_index
+from core.models import CommunityThread, CommunityThreadReply, IndMessage, Message
+from services.search_index import (
+    ForumSearchIndex,
+    MessageSearchIndex,
+    build_match_query,
+)
+from tests.sqlite_db import SQLiteDatabaseService
+from utils.exceptions import ValidationError
+
+
+class TestBuildMatchQuery:
+    """Test cases for build_match_query"""
+
+    def test_phrases_prefixes_and_operators(self):
+        """Phrases stay together, prefixes keep *, operators become words"""
+        assert build_match_query('"au lait" caf* OR') == '"au lait" "caf"* "OR"'
+
+    def test_rejects_queries_without_words(self):
+        """Punctuation alone is not a query"""
+        with pytest.raises(ValidationError):
+            build_match_query('"" * (')
+
+
+class TestMessageSearchIndex:
+    """Test cases for MessageSearchIndex"""
+
+    def setup_method(self):
+        self.db_service = SQLiteDatabaseService([Message, IndMessage])
+        with self.db_service.get_session() as db:
+            db.add_all(
+                [
+                    Message(id=1, chat_id=1, content="Rendez-vous au café", timestamp=100),
+                    Message(id=2, chat_id=1, content="cafe closed today", timestamp=200),
+                    IndMessage(id=1, ind_chat_id=3, content="cafeteria menu", timestamp=300),
+                ]
+            )
+            db.commit()
+        self.index = MessageSearchIndex(self.db_service, ":memory:")
+        self.index.sync(force=True)
+
+    def test_accent_insensitive_and_prefix(self):
+        """Accents are folded and prefix terms reach longer words"""
+        hits, _ = self.index.query("cafe", limit=10)
+        assert {(h["kind"], h["message_id"]) for h in hits} == {("activity", 1), ("activity", 2)}
+
+        hits, _ = self.index.query("caf*", limit=10, order="newest")
+        assert [(h["kind"], h["message_id"]) for h in hits] == [
+            ("individual", 1),
+            ("activity", 2),
+            ("activity", 1),
+        ]
+
+    def test_cursor_paging_and_incremental_sync(self):
+        """Pages do not overlap and new rows are indexed from the watermark"""
+        first, cursor = self.index.query("caf*", limit=2)
+        second, end = self.index.query("caf*", limit=2, cursor=cursor)
+        assert len(first) == 2 and len(second) == 1 and end is None
+        assert not {h["rowid"] for h in first} & {h["rowid"] for h in second}
+
+        with self.db_service.get_session() as db:
+            db.add(Message(id=3, chat_id=1, content="new cafe", timestamp=400))
+            db.commit()
+        assert self.index.sync(force=True)
+
+        hits, _ = self.index.query("new", limit=10)
+        assert [h["message_id"] for h in hits] == [3]
+
+
+class TestForumSearchIndex:
+    """Test cases for ForumSearchIndex"""
+
+    def test_title_matches_rank_first_and_removal(self):
+        """Title hits outrank body hits; removed threads take their replies along"""
+        db_service = SQLiteDatabaseService([CommunityThread, CommunityThreadReply])
+        with db_service.get_session() as db:
+            db.add_all(
+                [
+                    CommunityThread(id=1, title="Weekend plans", body="after the fête", last_updated=datetime(2026, 1, 1)),
+                    CommunityThread(id=2, title="Fête de la musique", body="who joins?", last_updated=datetime(2026, 1, 2)),
+                    CommunityThreadReply(id=1, thread_id=2, body="fete fete"),
+                ]
+            )
+            db.commit()
+        index = ForumSearchIndex(db_service, ":memory:")
+        index.sync(force=True)
+
+        hits, _ = index.query("fete", limit=10)
+        assert (hits[0]["kind"], hits[0]["item_id"]) == ("thread", 2)
+        assert "**Fête**" in hits[0]["snippet"]
+
+        index.remove_thread(2, [1])
+        hits, _ = index.query("fete", limit=10)
+        assert [(h["kind"], h["item_id"]) for h in hits] == [("thread", 1)]
+
+    def test_edits_sharing_a_second_are_all_reindexed(self, monkeypatch):
+        """Batches cut inside one last_updated second resume on the thread id"""
+        monkeypatch.setattr(search_index, "SEARCH_SYNC_BATCH", 1)
+        db_service = SQLiteDatabaseService([CommunityThread, CommunityThreadReply])
+        with db_service.get_session() as db:
+            db.add_all(
+                CommunityThread(id=i, title=f"draft {i}", body="", last_updated=datetime(2026, 1, 1))
+                for i in (1, 2, 3)
+            )
+            db.commit()
+        index = ForumSearchIndex(db_service, ":memory:")
+        index.sync(force=True)
+
+        with db_service.get_session() as db:
+            db.query(CommunityThread).update(
+                {"title": "final", "last_updated": datetime(2026, 1, 2, 9, 30)}
+            )
+            db.commit()
+        index.sync(force=True)
+
+        hits, _ = index.query("final", limit=10)
+        assert sorted(h["item_id"] for h in hits) == [1, 2, 3]
@@ -24,6 +24,13 @@ class TestSecurityValidator:
         assert self.validator.validate_user_id("0") is False
         assert self.validator.validate_user_id("9999999999") is False
 
+    def test_parse_user_ids(self):
+        """Test parsing a pasted list of user IDs"""
+        ids, invalid = self.validator.parse_user_ids("12, 7\n12 abc;0  99")
+        assert ids == [12, 7, 99]
+        assert invalid == ["abc", "0"]
+        assert self.validator.parse_user_ids("") == ([], [])
+
     def test_validate_email_valid(self):
         """Test valid email validation"""
         assert self.validator.validate_email("test@example.com") is True
@@ -0,0 +1,75 @@
+"""Tests for the conditional-aggregation stats engine"""
+from concurrent.futures import ThreadPoolExecutor
+
+import utils.concurrency as concurrency
+from core.models import CommunityThread, CommunityThreadReply
+from services.stats_engine import StatsEngine
+from tests.sqlite_db import SQLiteDatabaseService
+
+
+class TestStatsEngine:
+    """Test cases for StatsEngine"""
+
+    def setup_method(self):
+        self.db_service = SQLiteDatabaseService([CommunityThread, CommunityThreadReply])
+        with self.db_service.get_session() as db:
+            db.add_all(
+                [
+                    CommunityThread(id=1, body="a", is_reported=True),
+                    CommunityThread(id=2, body="b", is_reported=False),
+                    CommunityThread(id=3, body="c", is_reported=True),
+                    CommunityThreadReply(id=1, thread_id=1, body="r"),
+                ]
+            )
+            db.commit()
+        self.engine = StatsEngine(self.db_service)
+
+    def test_counts_and_conditional_sums_per_table(self):
+        """Each table's metrics come back from one statement"""
+        stats = self.engine.compute(
+            {
+                CommunityThread: {
+                    "threads": None,
+                    "reported_threads": CommunityThread.is_reported == True,
+                },
+                CommunityThreadReply: {
+                    "replies": None,
+                    "reported_replies": CommunityThreadReply.is_reported == True,
+                },
+            }
+        )
+
+        assert stats == {
+            "threads": 3,
+            "reported_threads": 2,
+            "replies": 1,
+            "reported_replies": 0,
+        }
+
+    def test_empty_table_sums_to_zero(self):
+        """Conditional sums over no rows are zero, not None"""
+        with self.db_service.get_session() as db:
+            db.query(CommunityThreadReply).delete()
+            db.commit()
+
+        stats = self.engine.compute(
+            {CommunityThreadReply: {"reported": CommunityThreadReply.is_reported == True}}
+        )
+
+        assert stats == {"reported": 0}
+
+    def test_tasks_join_a_callers_fan_out(self, monkeypatch):
+        """Panels merged into one fan-out finish even with a single worker"""
+        monkeypatch.setattr(concurrency, "_executor", ThreadPoolExecutor(max_workers=1))
+        tasks = self.engine.tasks(
+            {
+                CommunityThread: {"threads": None},
+                CommunityThreadReply: {"replies": None},
+            }
+        )
+
+        results, failures = concurrency.fan_out({**tasks, "other": lambda: "x"}, timeout=5)
+
+        assert failures == {}
+        assert StatsEngine.merge(results, tasks) == {"threads": 3, "replies": 1}
+        assert results["other"] == "x"
@@ -0,0 +1,72 @@
+"""Tests for the shared time bucketing helpers"""
+from datetime import date, datetime
+
+from core.models import User
+from tests.sqlite_db import SQLiteDatabaseService
+from utils.time_buckets import (
+    as_datetime,
+    bucket_key,
+    bucket_start,
+    count_by_bucket,
+    day_range,
+    iter_buckets,
+)
+
+
+class TestTimeBuckets:
+    """Test cases for utils.time_buckets"""
+
+    def test_bucket_start_per_granularity(self):
+        value = datetime(2025, 3, 5, 14, 37, 12)  # a Wednesday
+
+        assert bucket_start(value, "hour") == datetime(2025, 3, 5, 14)
+        assert bucket_start(value, "day") == datetime(2025, 3, 5)
+        assert bucket_start(value, "week") == datetime(2025, 3, 3)
+        assert bucket_start(value, "month") == datetime(2025, 3, 1)
+
+    def test_iter_buckets_is_end_exclusive_and_crosses_years(self):
+        """The first bucket is truncated; the end bucket is left out"""
+        assert iter_buckets(datetime(2024, 11, 15), datetime(2025, 2, 1), "month") == [
+            datetime(2024, 11, 1),
+            datetime(2024, 12, 1),
+            datetime(2025, 1, 1),
+        ]
+        assert iter_buckets(datetime(2025, 3, 1, 22), datetime(2025, 3, 2), "hour") == [
+            datetime(2025, 3, 1, 22),
+            datetime(2025, 3, 1, 23),
+        ]
+        assert iter_buckets(datetime(2025, 3, 1), datetime(2025, 3, 1), "day") == []
+
+    def test_keys_and_day_ranges(self):
+        assert as_datetime(date(2025, 3, 5)) == datetime(2025, 3, 5)
+        assert as_datetime("2025-03-05") == datetime(2025, 3, 5)
+        assert bucket_key(date(2025, 3, 5), "month") == "2025-03"
+        assert bucket_key(datetime(2025, 3, 5, 9, 30), "hour") == "2025-03-05 09:00"
+        assert day_range(date(2025, 2, 27), date(2025, 3, 2)) == [
+            date(2025, 2, 27),
+            date(2025, 2, 28),
+            date(2025, 3, 1),
+        ]
+
+    def test_count_by_bucket_matches_python_keys(self):
+        """SQL bucket keys line up with bucket_key, and the range is half-open"""
+        db_service = SQLiteDatabaseService([User])
+        with db_service.get_session() as db:
+            db.add_all(
+                [
+                    User(id=1, last_active=datetime(2025, 3, 2, 23, 59)),  # Sunday
+                    User(id=2, last_active=datetime(2025, 3, 3, 0, 0)),  # Monday
+                    User(id=3, last_active=datetime(2025, 3, 9, 12)),
+                    User(id=4, last_active=datetime(2025, 3, 10)),  # the end, excluded
+                ]
+            )
+            db.commit()
+
+            weeks = count_by_bucket(
+                db, User.last_active, datetime(2025, 3, 1), datetime(2025, 3, 10), "week"
+            )
+
+        assert weeks == {
+            bucket_key(datetime(2025, 2, 24), "week"): 1,
+            bucket_key(datetime(2025, 3, 3), "week"): 2,
+        }
@@ -0,0 +1,193 @@
+"""Tests for the typeahead user prefix index"""
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import event
+
+import services.user_prefix_index as user_prefix_index
+import services.user_service as user_service
+from core.models import User
+from services.user_prefix_index import UserPrefixIndex, fold, user_keys
+from services.user_service import UserService
+from tests.sqlite_db import SQLiteDatabaseService
+
+
+class TestUserPrefixIndex:
+    """Test cases for UserPrefixIndex"""
+
+    def setup_method(self):
+        self.db_service = SQLiteDatabaseService([User])
+        with self.db_service.get_session() as db:
+            db.add_all([
+                User(id=1, name="Anna Jansen", email="anna@example.com", phone="+32 470 12 34 56",
+                     last_active=datetime(2025, 3, 1)),
+                User(id=2, name="Zoë Ångström", email="zoe@example.com", last_active=datetime(2025, 3, 5)),
+                User(id=3, name="Jan", email="jan.peeters@example.com", phone="0470 99 88 77",
+                     last_active=datetime(2025, 1, 1)),
+                User(id=4, name="Janneke", email="j@example.com", last_active=datetime(2025, 3, 9)),
+                User(id=12, name=None, email="anon@example.com"),
+            ])
+            db.commit()
+
+        self.index = UserPrefixIndex(self.db_service)
+        self.index.refresh(force=True)
+
+    def add(self, *users):
+        with self.db_service.get_session() as db:
+            db.add_all(users)
+            db.commit()
+        self.index.refresh(force=True)
+
+    def ids(self, text, limit=10):
+        return [match["id"] for match in self.index.search(text, limit)]
+
+    def test_keys_are_folded(self):
+        assert fold("  Zoë   ÅNGSTRÖM ") == "zoe angstrom"
+        assert user_keys("Anna Jansen", "Anna@Example.com", "+32 470") == [
+            ("anna jansen", 0), ("jansen", 0), ("anna@example.com", 1), ("32470", 2)
+        ]
+
+    def test_matches_any_name_word_email_or_phone(self):
+        """Accent- and case-insensitive prefixes over every searchable field"""
+        assert self.ids("ANGS") == [2]
+        assert self.ids("zoe ang") == [2]
+        assert self.ids("anna@") == [1]
+        assert self.ids("+32 470 12") == [1]
+        assert self.ids("0470") == [3]
+        assert self.ids("xyz") == []
+        assert self.ids("   ") == []
+
+    def test_ranking(self):
+        """Exact keys, then names over emails, then recent activity"""
+        # "jan" is Jan's whole name; Janneke and Jansen only start with it
+        assert self.ids("jan") == [3, 4, 1]
+        assert self.ids("jan", limit=2) == [3, 4]
+        # A numeric query also finds the user with that id
+        assert self.ids("12") == [12]
+        assert self.index.search("12")[0]["matched"] == "id"
+        assert self.index.search("12")[0]["name"] == "User 12"
+
+    def test_incremental_refresh(self):
+        """New users are added and recently active users are re-keyed"""
+        with self.db_service.get_session() as db:
+            db.add(User(id=13, name="Jérôme", last_active=datetime(2025, 3, 10)))
+            user = db.query(User).filter(User.id == 1).first()
+            user.name, user.last_active = "Anna Peeters", datetime(2025, 3, 11)
+            db.commit()
+
+        self.index.refresh(force=True)
+
+        assert self.ids("jero") == [13]
+        assert self.ids("jansen") == []
+        assert self.ids("peeters") == [1]
+        assert len(self.index) == 6
+
+    def test_only_phone_like_queries_match_phone_digits(self):
+        """Digits inside an email or name query do not pull in phone matches"""
+        self.add(User(id=14, name="Bob", phone="2 555 01", last_active=datetime(2025, 3, 12)))
+
+        assert self.ids("2 555") == [14]
+        assert self.ids("anna2") == []
+
+    def test_last_active_bump_advances_the_watermark(self, monkeypatch):
+        """Users whose keys did not change are not re-read by every refresh"""
+        with self.db_service.get_session() as db:
+            db.query(User).filter(User.id == 3).update({User.last_active: datetime(2025, 4, 1)})
+            db.commit()
+        self.index.refresh(force=True)
+
+        assert self.index._max_last_active == int(datetime(2025, 4, 1).timestamp())
+
+        # Before the fix users 3 and 4 were both re-read and forced a reload
+        reloads = []
+        monkeypatch.setattr(user_prefix_index, "TYPEAHEAD_MAX_PATCH", 1)
+        monkeypatch.setattr(self.index, "_reload", lambda: reloads.append(1))
+        self.index.refresh(force=True)
+        assert reloads == []
+
+    def test_search_is_fast_at_scale(self):
+        """Top matches in well under 5 ms with 100k users indexed"""
+        with self.db_service.get_session() as db:
+            db.execute(
+                User.__table__.insert(),
+                [
+                    {"id": i, "name": f"User{i % 997} Name{i}", "email": f"u{i}@example.com"}
+                    for i in range(100, 100100)
+                ],
+            )
+            db.commit()
+        self.index.refresh(force=True)
+
+        started = time.perf_counter()
+        for text in ("u", "user5", "name4242", "u99999@", "nobody"):
+            self.index.search(text)
+        assert (time.perf_counter() - started) / 5 < 0.005
+
+    def test_short_prefixes_rank_by_recency_not_alphabet(self, monkeypatch):
+        """One- and two-letter queries find the most recently active matches"""
+        monkeypatch.setattr(user_prefix_index, "TYPEAHEAD_SCAN_LIMIT", 3)
+        with self.db_service.get_session() as db:
+            db.add_all(
+                User(id=20 + day, name=name, last_active=datetime(2025, 4, day))
+                for day, name in enumerate(["Aaron", "Abby", "Adam", "Alex", "Amy"], start=1)
+            )
+            db.commit()
+        # Scanning alphabetically would stop at Aaron, Abby and Adam
+        self.index = UserPrefixIndex(self.db_service)
+        self.index.refresh(force=True)
+
+        assert self.ids("a", limit=3) == [25, 24, 23]
+        assert self.ids("ab", limit=3) == [22]
+
+        # A last_active bump moves a user to the front of the candidates
+        with self.db_service.get_session() as db:
+            db.query(User).filter(User.id == 21).update({User.last_active: datetime(2025, 5, 1)})
+            db.commit()
+        self.index.refresh(force=True)
+
+        assert self.ids("a", limit=2) == [21, 25]
+
+    def test_searches_read_the_last_snapshot_during_a_reload(self, monkeypatch):
+        """A running reload neither blocks searches nor shows a half-built index"""
+        loading, release = threading.Event(), threading.Event()
+        load = self.index._load
+
+        def slow_load():
+            loading.set()
+            release.wait(5)
+            return load()
+
+        monkeypatch.setattr(self.index, "_load", slow_load)
+        monkeypatch.setattr(user_prefix_index, "TYPEAHEAD_REBUILD_INTERVAL", 0)
+        with self.db_service.get_session() as db:
+            db.add(User(id=15, name="Janssens", last_active=datetime(2025, 3, 20)))
+            db.commit()
+
+        refresh = threading.Thread(target=self.index.refresh, kwargs={"force": True})
+        refresh.start()
+        try:
+            assert loading.wait(5)
+            started = time.perf_counter()
+            assert self.ids("jan") == [3, 4, 1]
+            assert time.perf_counter() - started < 0.5
+        finally:
+            release.set()
+            refresh.join(5)
+
+        assert self.ids("jan") == [3, 15, 4, 1]
+
+    def test_search_users_never_refreshes(self, monkeypatch):
+        """The request path only reads the snapshot the worker built"""
+        monkeypatch.setattr(user_service, "get_user_prefix_index", lambda db_service: self.index)
+        service = UserService.__new__(UserService)
+        service.db_service = self.db_service
+        statements = []
+        event.listen(
+            self.db_service.engine, "before_cursor_execute",
+            lambda *args: statements.append(args[2]),
+        )
+
+        assert [match["id"] for match in service.search_users("anna")] == [1]
+        assert service.is_typeahead_loaded()
+        assert statements == []
@@ -0,0 +1,295 @@
+"""Tests for profiles, content counters and activity history in UserService"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+import services.user_counters as user_counters
+import services.user_service as user_service
+import utils.concurrency as concurrency
+from core.models import (
+    Activity,
+    ActivityJoiner,
+    CommunityThread,
+    CommunityThreadReply,
+    IndMessage,
+    Message,
+    User,
+    UserContentCounter,
+    UserReport,
+    Watermark,
+)
+from services.user_counters import COUNTER_COLUMNS, UserCounterService
+from services.user_service import UserService
+from tests.sqlite_db import SQLiteDatabaseService
+from utils.exceptions import ValidationError
+
+COUNTED_MODELS = [
+    User, UserReport, IndMessage, Message, Activity, ActivityJoiner,
+    CommunityThread, CommunityThreadReply, Watermark, UserContentCounter,
+]
+
+
+class TestUserActivities:
+    """Test cases for get_user_activities and get_user_activity_page"""
+
+    def setup_method(self):
+        self.db_service = SQLiteDatabaseService([User, Activity, ActivityJoiner])
+        with self.db_service.get_session() as db:
+            db.add_all([User(id=1, name="Ann"), User(id=2, name="Ben")])
+            same_day = datetime(2025, 3, 1, 18, 0)
+            db.add_all([
+                Activity(id=1, owner_id=2, name="Old", date=datetime(2024, 1, 1)),
+                Activity(id=2, owner_id=1, name="Hosted and joined", date=same_day, place="Park"),
+                Activity(id=3, owner_id=2, name="Same day", date=same_day, min_age=18, max_age=30),
+                Activity(id=4, owner_id=2, name="Undated"),
+                Activity(id=5, owner_id=1, name="Newest", date=datetime(2025, 6, 1), question1="Why?"),
+                Activity(id=6, owner_id=2, name="Not joined", date=datetime(2025, 7, 1)),
+            ])
+            db.add_all(ActivityJoiner(activity_id=a, user_id=1) for a in (1, 2, 3, 4))
+            db.commit()
+
+        self.service = UserService.__new__(UserService)
+        self.service.db_service = self.db_service
+
+    def test_pages_are_merged_and_ordered_in_sql(self):
+        """One statement per page; hosted wins over joined, undated last"""
+        statements = []
+        event.listen(
+            self.db_service.engine, "before_cursor_execute",
+            lambda *args: statements.append(args[2]),
+        )
+
+        pages, totals, cursor = [], [], None
+        while True:
+            page = self.service.get_user_activity_page(1, limit=2, cursor=cursor)
+            pages.append([a["activity_id"] for a in page["activities"]])
+            totals.append(page["total"])
+            if not page["has_more"]:
+                break
+            cursor = page["next_cursor"]
+
+        assert pages == [[5, 3], [2, 1], [4]]
+        # The first page carries the total from the same statement
+        assert totals == [5, None, None]
+        assert len(statements) == 3
+        assert self.service.get_user_activity_page(3)["total"] == 0
+
+        activities = {a["activity_id"]: a for a in self.service.get_user_activities(1)}
+        assert (activities[2]["status"], activities[2]["place"]) == ("Host", "Park")
+        assert (activities[3]["status"], activities[3]["min_age"]) == ("Joined", 18)
+        assert activities[5]["question1"] == "Why?"
+        assert activities[4]["date"] == "Unknown"
+
+    def test_rejects_a_malformed_cursor(self):
+        with pytest.raises(ValidationError):
+            self.service.get_user_activity_page(1, cursor="2025-03-01:2")
+
+
+class TestUserActivityMessages:
+    """Test cases for get_user_activity_messages"""
+
+    def setup_method(self):
+        self.db_service = SQLiteDatabaseService([User, Activity, ActivityJoiner, Message])
+        with self.db_service.get_session() as db:
+            db.add_all([User(id=1, name="Ann"), User(id=2, name="Ben")])
+            db.add_all([Activity(id=10, owner_id=2), Activity(id=20, owner_id=1), Activity(id=30, owner_id=2)])
+            db.add(ActivityJoiner(activity_id=10, user_id=1))
+            messages = [(10, 1, 1000 + i) for i in range(8)]  # more than the limit
+            messages += [(20, 1, 500), (10, 2, 2000), (30, 1, 900)]  # other sender, left chat
+            db.add_all(
+                Message(chat_id=chat, sender_id=sender, content=f"m{ts}", timestamp=ts)
+                for chat, sender, ts in messages
+            )
+            db.commit()
+
+        self.service = UserService.__new__(UserService)
+        self.service.db_service = self.db_service
+
+    def test_newest_five_per_activity_in_one_statement(self):
+        """Joined and hosted activities come back from a single query"""
+        statements = []
+        event.listen(
+            self.db_service.engine, "before_cursor_execute",
+            lambda *args: statements.append(args[2]),
+        )
+
+        messages = self.service.get_user_activity_messages(1)
+
+        assert len(statements) == 1
+        assert sorted(messages) == [10, 20]
+        assert [m["content"] for m in messages[10]] == ["m1007", "m1006", "m1005", "m1004", "m1003"]
+        assert [m["content"] for m in messages[20]] == ["m500"]
+
+
+class TestUserProfile:
+    """Test cases for the concurrent profile loader behind get_user"""
+
+    def setup_method(self):
+        self.db_service = SQLiteDatabaseService(COUNTED_MODELS)
+        with self.db_service.get_session() as db:
+            db.add(User(id=1, name="Ann", email="ann@example.com"))
+            db.add_all(UserReport(reporter_id=r, reported_id=1) for r in (2, 3))
+            db.add_all(IndMessage(ind_chat_id=7, sender_id=1, content=f"d{ts}", timestamp=ts) for ts in (1, 5, 7))
+            db.add_all(Message(chat_id=9, sender_id=1, content=f"a{ts}", timestamp=ts) for ts in range(2, 20, 2))
+            db.commit()
+
+        self.service = UserService.__new__(UserService)
+        self.service.db_service = self.db_service
+        self.service.counters = UserCounterService(self.db_service)
+        # Sessions share one SQLite connection, so the first (writing) refresh runs alone
+        self.service.counters.refresh()
+
+    def test_merges_the_concurrent_sub_queries(self, monkeypatch):
+        """Counters and the newest messages of both chat kinds are combined"""
+        monkeypatch.setattr(user_service.AuditLogger, "log_action", lambda *args, **kwargs: None)
+
+        profile = self.service.get_user("user_id", "1")
+
+        assert (profile["report_count"], profile["message_count"]) == (2, 12)
+        assert [m["content"] for m in profile["recent_messages"]] == (
+            ["a18", "a16", "a14", "a12", "a10", "a8", "d7", "a6", "d5", "a4"]
+        )
+        assert profile["incomplete"] == []
+
+    def test_counts_are_live_until_reconciled(self):
+        """Before the first reconcile the header counts come from live COUNTs"""
+        service = UserService.__new__(UserService)
+        service.db_service = self.db_service
+        service.counters = UserCounterService(SQLiteDatabaseService(COUNTED_MODELS))
+
+        profile = service.get_user_from_report("1")
+
+        assert profile["incomplete"] == []
+        assert (profile["message_count"], profile["report_count"]) == (12, 2)
+        # The other counters only exist once reconciled
+        assert profile["counters"] is None
+
+    def test_slow_sub_query_leaves_a_partial_profile(self, monkeypatch):
+        """A sub-query past the deadline is dropped, the rest is returned"""
+        release = threading.Event()
+        monkeypatch.setattr(user_service, "PROFILE_DEADLINE_SECONDS", 0.2)
+        monkeypatch.setattr(
+            UserCounterService, "get_counters", lambda self, user_id: release.wait(5) and {}
+        )
+
+        try:
+            started = time.monotonic()
+            profile = self.service.get_user_from_report("1")
+            assert time.monotonic() - started < 2
+        finally:
+            release.set()
+
+        assert profile["incomplete"] == ["counters"]
+        assert (profile["message_count"], profile["report_count"]) == (None, None)
+        assert len(profile["recent_messages"]) == 10
+
+    def test_busy_shared_pool_does_not_delay_profiles(self, monkeypatch):
+        """Profiles run on their own pool, so queueing elsewhere costs no deadline"""
+        release = threading.Event()
+        shared = ThreadPoolExecutor(max_workers=1)
+        monkeypatch.setattr(concurrency, "_executor", shared)
+        monkeypatch.setattr(user_service, "PROFILE_DEADLINE_SECONDS", 0.5)
+        shared.submit(release.wait, 5)
+
+        try:
+            profile = self.service.get_user_from_report("1")
+        finally:
+            release.set()
+            shared.shutdown()
+
+        assert profile["incomplete"] == []
+        assert len(profile["recent_messages"]) == 10
+
+
+class TestUserCounters:
+    """Test cases for UserCounterService"""
+
+    def setup_method(self):
+        self.db_service = SQLiteDatabaseService(COUNTED_MODELS)
+        with self.db_service.get_session() as db:
+            db.add_all(User(id=i, name=f"User {i}") for i in (1, 2, 3))
+            db.add_all(Message(chat_id=9, sender_id=s, content="m", timestamp=1) for s in (1, 1, 2))
+            db.add_all([Activity(id=10, owner_id=1), Activity(id=11, owner_id=2)])
+            db.add_all([ActivityJoiner(activity_id=11, user_id=1), ActivityJoiner(activity_id=10, user_id=3)])
+            db.add(UserReport(reporter_id=2, reported_id=3))
+            db.commit()
+
+        self.service = UserCounterService(self.db_service)
+
+    def add(self, *rows):
+        with self.db_service.get_session() as db:
+            db.add_all(rows)
+            db.commit()
+
+    def test_counts_new_rows_incrementally(self):
+        """The first refresh reconciles; later ones only count rows above the watermarks"""
+        assert self.service.get_counters(1) is None
+        assert self.service.refresh()
+        assert self.service.get_counters(1) == {
+            "messages": 2, "direct_messages": 0, "reports_received": 0, "threads": 0,
+            "replies": 0, "activities_hosted": 1, "activities_joined": 1,
+        }
+
+        self.add(
+            Message(chat_id=9, sender_id=1, content="m", timestamp=2),
+            IndMessage(ind_chat_id=7, sender_id=3, content="d", timestamp=2),
+            CommunityThread(id=1, owner_id=3),
+            CommunityThreadReply(thread_id=1, owner_id=2),
+            CommunityThreadReply(thread_id=1, owner_id=None),
+            UserReport(reporter_id=1, reported_id=3),
+        )
+        statements = []
+        event.listen(
+            self.db_service.engine, "before_cursor_execute",
+            lambda *args: statements.append(args[2]),
+        )
+        self.service.refresh()
+
+        assert not any("activity_joiners" in s for s in statements)
+        assert self.service.get_counters(1)["messages"] == 3
+        assert self.service.get_counters(2)["replies"] == 1
+        three = self.service.get_counters(3)
+        assert (three["direct_messages"], three["threads"], three["reports_received"]) == (1, 1, 2)
+
+        # Nothing new: the same rows are never counted twice
+        self.service.refresh()
+        assert self.service.get_counters(1)["messages"] == 3
+        assert self.service.get_counters(99) == dict.fromkeys(COUNTER_COLUMNS, 0)
+
+    def test_refresh_reconciles_when_due(self, monkeypatch):
+        """Deleted rows only leave the counters once a reconcile is due"""
+        self.service.refresh()
+        with self.db_service.get_session() as db:
+            db.query(Message).filter(Message.sender_id == 1).delete()
+            db.commit()
+
+        assert not self.service.refresh()
+        assert self.service.get_counters(1)["messages"] == 2
+
+        monkeypatch.setattr(user_counters, "COUNTER_RECONCILE_INTERVAL", 0)
+        assert self.service.refresh()
+        assert self.service.get_counters(1)["messages"] == 0
+
+    def test_reconcile_picks_up_deletes_and_joins(self, monkeypatch):
+        """Recounts run in user chunks and drop counters of deleted users"""
+        monkeypatch.setattr(user_counters, "COUNTER_RECONCILE_CHUNK", 2)
+        self.service.refresh()
+
+        with self.db_service.get_session() as db:
+            db.query(Message).filter(Message.sender_id == 2).delete()
+            db.query(User).filter(User.id == 3).delete()
+            db.add(ActivityJoiner(activity_id=10, user_id=2))
+            db.commit()
+        self.add(Message(chat_id=9, sender_id=2, content="m", timestamp=3))
+
+        self.service.reconcile()
+
+        assert self.service.get_counters(2)["messages"] == 1
+        assert self.service.get_counters(2)["activities_joined"] == 1
+        with self.db_service.get_session() as db:
+            assert [c.user_id for c in db.query(UserContentCounter).order_by(UserContentCounter.user_id)] == [1, 2]
+        assert self.service.get_status()["reconciled_at"] is not None